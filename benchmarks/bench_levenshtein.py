@@ -0,0 +1,103 @@
+"""
+Microbenchmark for the edit distance used by calculate_similarity.
+
+Compares the old full-matrix implementation with count_corrector.distance,
+with and without a distance cutoff, on pairs of long file names.
+
+Usage:
+    python benchmarks/bench_levenshtein.py [--pairs 2000] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from count_corrector.distance import levenshtein  # noqa: E402
+
+WORDS = ["quarterly", "financial", "report", "project", "meeting", "notes", "final",
+         "draft", "summary", "holiday", "photos", "backup", "invoice", "customer",
+         "archive", "version", "review", "budget", "presentation", "2023", "2024"]
+
+
+def full_matrix_levenshtein(a, b):
+    """The original nested implementation from calculate_similarity"""
+    if a == b: return 0
+    if not a: return len(b)
+    if not b: return len(a)
+
+    matrix = [[0 for _ in range(len(b) + 1)] for _ in range(len(a) + 1)]
+    for i in range(len(a) + 1):
+        matrix[i][0] = i
+    for j in range(len(b) + 1):
+        matrix[0][j] = j
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i-1] == b[j-1] else 1
+            matrix[i][j] = min(
+                matrix[i-1][j] + 1,
+                matrix[i][j-1] + 1,
+                matrix[i-1][j-1] + cost
+            )
+    return matrix[len(a)][len(b)]
+
+
+def long_name(rnd):
+    """Build a long file name like 'budget_report_2024_final_v3.xlsx'"""
+    words = rnd.sample(WORDS, rnd.randint(4, 7))
+    return "_".join(words) + f"_v{rnd.randint(1, 9)}" + rnd.choice([".xlsx", ".docx", ".pdf", ""])
+
+
+def make_pairs(count, seed=0):
+    """Half near-duplicate pairs (a few typos), half unrelated pairs"""
+    rnd = random.Random(seed)
+    pairs = []
+    for index in range(count):
+        a = long_name(rnd)
+        if index % 2:
+            b = list(a)
+            for _ in range(rnd.randint(1, 3)):
+                b[rnd.randrange(len(b))] = rnd.choice("abcdefghij")
+            b = "".join(b)
+        else:
+            b = long_name(rnd)
+        pairs.append((a.lower(), b.lower()))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pairs", type=int, default=2000, help="number of name pairs")
+    parser.add_argument("--repeat", type=int, default=3, help="timing repetitions (best is kept)")
+    args = parser.parse_args()
+
+    pairs = make_pairs(args.pairs)
+    average = sum(len(a) + len(b) for a, b in pairs) / (2 * len(pairs))
+    # Cutoff as used for a mid-range threshold: a quarter of the longer name
+    cutoffs = [max(len(a), len(b)) // 4 for a, b in pairs]
+
+    # All implementations must agree before timing them
+    for (a, b), cutoff in zip(pairs, cutoffs):
+        expected = full_matrix_levenshtein(a, b)
+        assert levenshtein(a, b) == expected
+        assert levenshtein(a, b, cutoff) == min(expected, cutoff + 1)
+
+    cases = [
+        ("full matrix (old)", lambda: [full_matrix_levenshtein(a, b) for a, b in pairs]),
+        ("bit-parallel", lambda: [levenshtein(a, b) for a, b in pairs]),
+        ("bit-parallel + cutoff", lambda: [levenshtein(a, b, c) for (a, b), c in zip(pairs, cutoffs)]),
+    ]
+
+    print(f"{len(pairs)} pairs, average name length {average:.1f}")
+    baseline = None
+    for label, run in cases:
+        best = min(timeit.repeat(run, number=1, repeat=args.repeat))
+        baseline = baseline or best
+        per_pair = best / len(pairs) * 1e6
+        print(f"{label:<24} {best * 1000:9.1f} ms  {per_pair:8.2f} us/pair  {baseline / best:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
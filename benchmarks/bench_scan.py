@@ -0,0 +1,249 @@
+"""
+Benchmark suite for the scanning hot paths.
+
+For every size, a synthetic listing (see synthetic.py) is generated and
+these steps are timed separately:
+
+- calculate_similarity: scoring name pairs, half of them near duplicates
+- scan_for_similar: grouping the whole listing (from disk with --disk)
+- scan_for_changes: building the cluster index, then applying a batch of
+  created and deleted names to it
+- ui_model: turning the groups into results view rows, first from scratch
+  and then as a diff after the batch of changes
+
+Each step reports its time, throughput and, unless --no-memory is given, the
+peak memory it allocated (measured in a second, traced run so tracing does
+not slow down the timed one). The report is written as JSON.
+
+The q-gram index (the default --method) only pays off at high thresholds.
+Its bounds come from the characters two names share, and at the default
+0.35 most names share enough of them: on 3,000 synthetic names (rate 0.2,
+seed 0, every pair scored for the similarity graph) it keeps 42% of the
+4.5M pairs and the scan takes 203s against 248s for the exhaustive one.
+At 0.6 it keeps 2% (16s against 46s) and at 0.8 under 0.1% (6s against
+29s). The pairs it drops at 0.35 are the ones the scorer's own bounds
+reject cheaply; the time goes into the pairs both have to score in full.
+
+Building the cluster index scores every candidate pair once (in name order,
+see graph.ordered_pair), one name at a time, so at large sizes it can be
+left out with --steps.
+
+Usage:
+    python benchmarks/bench_scan.py [--sizes 1000,10000,100000,1000000] [--rate 0.2]
+                                    [--method qgram] [-j 1] [--disk] [-o report.json]
+                                    [--steps calculate_similarity,scan_for_similar,ui_model]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from count_corrector.clusters import ClusterIndex  # noqa: E402
+from count_corrector.engine import (  # noqa: E402
+    DEFAULT_THRESHOLD,
+    SCAN_METHODS,
+    SIMILARITY_VERSION,
+    calculate_similarity,
+    find_similar_groups,
+    scan_directory,
+)
+from count_corrector.rows import diff_results  # noqa: E402
+
+from synthetic import VARIANTS, generate_names, near_duplicate, write_tree  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+STEPS = ("calculate_similarity", "scan_for_similar", "scan_for_changes", "ui_model")
+
+
+def measure(run, trace_memory):
+    """Time run() once; with trace_memory run it again to find its peak allocation"""
+    start = time.perf_counter()
+    result = run()
+    seconds = time.perf_counter() - start
+    peak = None
+    if trace_memory:
+        tracemalloc.start()
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def step_report(seconds, count, unit, peak):
+    return {
+        "seconds": round(seconds, 6),
+        unit: count,
+        f"{unit}_per_second": round(count / seconds, 1) if seconds > 0 else None,
+        "peak_bytes": peak,
+    }
+
+
+def make_pairs(names, count, seed=0):
+    """Half near-duplicate pairs, half random pairs of names"""
+    rnd = random.Random(seed)
+    pairs = []
+    for index in range(count):
+        name = rnd.choice(names)
+        if index % 2:
+            pairs.append((name, near_duplicate(rnd, name, rnd.choice(VARIANTS))))
+        else:
+            pairs.append((name, rnd.choice(names)))
+    return pairs
+
+
+def make_changes(names, count, seed=0):
+    """Names to delete and names to create for one batch of changes"""
+    rnd = random.Random(seed)
+    deleted = rnd.sample(names, min(count, len(names)))
+    existing = {name.lower() for name in names}
+    created = []
+    while len(created) < count:
+        name = near_duplicate(rnd, rnd.choice(names), rnd.choice(VARIANTS))
+        if name.lower() not in existing:
+            existing.add(name.lower())
+            created.append(name)
+    return deleted, created
+
+
+def groups_needed(args):
+    return "scan_for_similar" in args.steps or "ui_model" in args.steps
+
+
+def bench_size(size, args):
+    names = generate_names(size, args.rate, args.seed)
+    steps = {}
+    trace = not args.no_memory
+
+    # calculate_similarity on its own
+    if "calculate_similarity" in args.steps:
+        pairs = make_pairs(names, min(args.pairs, 10 * size), args.seed)
+        _, seconds, peak = measure(lambda: [calculate_similarity(a, b) for a, b in pairs], trace)
+        steps["calculate_similarity"] = step_report(seconds, len(pairs), "pairs", peak)
+
+    # Full scan, from a real directory listing with --disk
+    directory = os.path.join(args.workdir, f"entries_{size}")
+    if args.disk and groups_needed(args):
+        write_tree(directory, names)
+        scan = lambda: scan_directory(directory, args.threshold, args.method, None, args.workers)
+    else:
+        scan = lambda: find_similar_groups(names, args.threshold, args.method, None, args.workers)
+    groups = None
+    if groups_needed(args):
+        groups, seconds, peak = measure(scan, trace)
+        steps["scan_for_similar"] = step_report(seconds, size, "items", peak)
+        steps["scan_for_similar"]["groups"] = len(groups)
+        steps["scan_for_similar"]["grouped_items"] = sum(len(group) for group in groups)
+
+    # Incremental updates: the cluster index is built once, then a batch is applied
+    changed_groups = None
+    if "scan_for_changes" in args.steps:
+        clusters, seconds, peak = measure(lambda: ClusterIndex(args.threshold, names=names), trace)
+        steps["cluster_index_build"] = step_report(seconds, size, "items", peak)
+        deleted, created = make_changes(names, args.changes, args.seed)
+
+        def apply_changes():
+            for name in deleted:
+                clusters.remove(name)
+            for name in created:
+                clusters.add(name)
+            result = clusters.groups()
+            # Undo the batch so the traced run starts from the same state
+            for name in created:
+                clusters.remove(name)
+            for name in deleted:
+                clusters.add(name)
+            return result
+
+        changed_groups, seconds, peak = measure(apply_changes, trace)
+        steps["scan_for_changes"] = step_report(seconds, len(deleted) + len(created), "changes", peak)
+
+    # Groups to results view rows, from scratch and as a diff
+    if "ui_model" in args.steps:
+        base = os.path.abspath(directory)
+        diff, seconds, peak = measure(lambda: diff_results({}, groups, base), trace)
+        steps["ui_model"] = step_report(seconds, len(diff.children), "groups", peak)
+        if changed_groups is not None:
+            _, seconds, peak = measure(lambda: diff_results(diff.children, changed_groups, base), trace)
+            steps["ui_model_diff"] = step_report(seconds, len(changed_groups), "groups", peak)
+
+    if args.disk:
+        shutil.rmtree(directory, ignore_errors=True)
+    return {"size": size, "rate": args.rate, "steps": steps}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000",
+                        help="comma separated listing sizes (default: %(default)s; "
+                             "the full suite is 1000,10000,100000,1000000)")
+    parser.add_argument("--rate", type=float, default=0.2, help="share of near duplicates")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--method", choices=SCAN_METHODS, default="qgram")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="scan processes")
+    parser.add_argument("--pairs", type=int, default=20000,
+                        help="pairs scored by the calculate_similarity step")
+    parser.add_argument("--changes", type=int, default=100,
+                        help="names deleted and created by the scan_for_changes step")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--disk", action="store_true",
+                        help="write each listing to a temporary directory and scan it from disk")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the traced runs that measure peak memory")
+    parser.add_argument("--steps", default=",".join(STEPS),
+                        help="comma separated steps to run (default: all of %(default)s)")
+    parser.add_argument("-o", "--output", metavar="FILE", help="write the JSON report to FILE")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    args.steps = {step.strip() for step in args.steps.split(",") if step.strip()}
+    unknown = args.steps.difference(STEPS)
+    if unknown:
+        parser.error(f"unknown steps: {', '.join(sorted(unknown))}")
+    args.workdir = tempfile.mkdtemp(prefix="count_corrector_bench_")
+    try:
+        results = []
+        for size in sizes:
+            print(f"Benchmarking {size} entries...", file=sys.stderr)
+            results.append(bench_size(size, args))
+    finally:
+        shutil.rmtree(args.workdir, ignore_errors=True)
+
+    report = {
+        "similarity_version": SIMILARITY_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "threshold": args.threshold,
+        "method": args.method,
+        "workers": args.workers,
+        "disk": args.disk,
+        "steps": sorted(args.steps),
+        "results": results,
+    }
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        report["peak_rss_bytes"] = maxrss if sys.platform == "darwin" else maxrss * 1024
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
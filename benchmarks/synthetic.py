@@ -0,0 +1,120 @@
+"""
+Synthetic directory listings for benchmarks.
+
+Generates realistic folder and file names where a controlled share of the
+names are near duplicates of another name, in the ways they show up in real
+download and share folders: a number appended to a prefix ("Report" and
+"Report2"), a one-letter typo ("Cursor" and "Kursor"), a dropped space
+("Project 1" and "Project1") and copies ("notes.txt" and "notes_copy.txt").
+
+The names can be used in memory or written to disk as empty files and
+folders.
+
+Usage:
+    python benchmarks/synthetic.py DIRECTORY [--count 10000] [--rate 0.2] [--seed 0]
+"""
+import argparse
+import os
+import random
+
+WORDS = ["quarterly", "financial", "report", "project", "meeting", "notes", "final",
+         "draft", "summary", "holiday", "photos", "backup", "invoice", "customer",
+         "archive", "version", "review", "budget", "presentation", "cursor", "design",
+         "contract", "scan", "receipt", "music", "video", "export", "setup", "data",
+         "client", "travel", "family", "school", "thesis", "chapter", "slides"]
+
+# Made up words keep unrelated names as different as they are in real folders
+SYLLABLES = ["ka", "lo", "mi", "ter", "ban", "sol", "ri", "vex", "du", "pan", "gor", "el",
+             "tu", "qui", "nor", "sa", "fen", "lu", "dro", "mak", "zi", "po", "hal", "ven"]
+
+EXTENSIONS = ["", "", "", ".pdf", ".docx", ".xlsx", ".txt", ".jpg", ".png", ".mp3", ".zip"]
+
+# Kinds of near duplicates, picked with equal probability
+VARIANTS = ("digits", "typo", "space", "copy")
+
+
+def word(rnd):
+    """A common word, or more often a made up one"""
+    if rnd.random() < 0.3:
+        return rnd.choice(WORDS)
+    return "".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4)))
+
+
+def base_name(rnd, serial):
+    """A fresh name such as 'Budget Kalover 2023.xlsx'; serial keeps it unique"""
+    words = [text.capitalize() if rnd.random() < 0.5 else text
+             for text in (word(rnd) for _ in range(rnd.randint(1, 3)))]
+    separator = rnd.choice([" ", "_", "-", ""])
+    stem = separator.join(words) + f"{separator}{serial}"
+    return stem + rnd.choice(EXTENSIONS)
+
+
+def near_duplicate(rnd, name, variant):
+    """A near duplicate of name of the given kind"""
+    stem, ext = os.path.splitext(name)
+    if variant == "digits":
+        return f"{stem}{rnd.randint(2, 99)}{ext}"
+    if variant == "typo":
+        letters = [index for index, char in enumerate(stem) if char.isalpha()]
+        if letters:
+            index = rnd.choice(letters)
+            replacement = rnd.choice([char for char in "abcdefghijklmnopqrstuvwxyz"
+                                      if char != stem[index].lower()])
+            return stem[:index] + replacement + stem[index + 1:] + ext
+        return stem + "x" + ext
+    if variant == "space":
+        if " " in stem:
+            return stem.replace(" ", "", 1) + ext
+        return stem.replace("_", " ", 1) + ext if "_" in stem else stem + " 1" + ext
+    return f"{stem}_copy{ext}"
+
+
+def generate_names(count, rate=0.2, seed=0):
+    """
+    Return count distinct names where about rate of them are near duplicates
+    of an earlier name. The result is shuffled, like a real listing.
+    """
+    rnd = random.Random(seed)
+    names = []
+    seen = set()
+    serial = 0
+    while len(names) < count:
+        if names and rnd.random() < rate:
+            name = near_duplicate(rnd, rnd.choice(names), rnd.choice(VARIANTS))
+        else:
+            serial += 1
+            name = base_name(rnd, serial)
+        # Names that only differ in case are the same entry on some file systems
+        if name.lower() not in seen and name.strip():
+            seen.add(name.lower())
+            names.append(name)
+    rnd.shuffle(names)
+    return names
+
+
+def write_tree(directory, names):
+    """Create every name in directory, as an empty file if it has an extension, else as a folder"""
+    os.makedirs(directory, exist_ok=True)
+    for name in names:
+        path = os.path.join(directory, name)
+        if os.path.splitext(name)[1]:
+            open(path, "wb").close()
+        else:
+            os.makedirs(path, exist_ok=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory", help="directory to create the names in")
+    parser.add_argument("--count", type=int, default=10000, help="number of names")
+    parser.add_argument("--rate", type=float, default=0.2, help="share of near duplicates")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    names = generate_names(args.count, args.rate, args.seed)
+    write_tree(args.directory, names)
+    print(f"Created {len(names)} entries in {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
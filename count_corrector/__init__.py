@@ -0,0 +1,30 @@
+"""
+Count Corrector - find and merge similarly named folders and files.
+
+The scanning engine does not depend on tkinter or watchdog, so the package can
+be imported (and run with ``python -m count_corrector``) on headless machines.
+"""
+from .engine import (
+    BOUND_PATHS,
+    DEFAULT_THRESHOLD,
+    SCAN_METHODS,
+    SIMILARITY_PATHS,
+    SIMILARITY_VERSION,
+    calculate_similarity,
+    find_similar_groups,
+    iter_directories,
+    iter_similar_groups,
+    iter_tree_groups,
+    list_items,
+    scan_directory,
+    scan_tree,
+    score_with_bounds,
+    score_with_path,
+    update_groups,
+)
+from .cache import ScoreCache
+from .duplicates import find_duplicate_groups, iter_duplicate_groups
+from .graph import DEFAULT_LINKAGE, LINKAGES, SimilarityGraph, update_graph
+from .names import NameTable
+from .roots import MonitoredRoot, ScanScheduler
+from .stats import ScanStats
@@ -0,0 +1,143 @@
+"""
+Similarity score cache.
+
+Rescans mostly compare names that have not changed since the last scan, so
+their scores are kept in a bounded LRU cache that can be saved to disk and
+loaded again on the next start.
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+from .engine import SIMILARITY_VERSION, calculate_similarity
+
+# Default memory limit for the cached scores
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Rough per-entry overhead of the OrderedDict slot, key tuple and float
+ENTRY_OVERHEAD = 200
+
+
+def default_cache_dir():
+    """Return the per-user directory used for cache files"""
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        return os.path.join(base, "CountCorrector")
+    if sys.platform == "darwin":
+        return os.path.join(os.path.expanduser("~"), "Library", "Caches", "CountCorrector")
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "count_corrector")
+
+
+def default_cache_path():
+    """Return the default file the score cache is saved to"""
+    return os.path.join(default_cache_dir(), "scores.json")
+
+
+class ScoreCache:
+    """
+    Bounded LRU cache of calculate_similarity scores.
+
+    Entries are keyed by the lowercased (normalized) name pair in calling
+    order, since calculate_similarity only looks at the lowercased names and
+    is not guaranteed to be symmetric. The cache belongs to one version of the
+    scoring algorithm; a saved cache from another version is ignored on load.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, path=None, version=SIMILARITY_VERSION):
+        self.max_bytes = max_bytes
+        self.path = path
+        self.version = version
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def entry_size(key):
+        """Approximate memory used by one entry"""
+        return ENTRY_OVERHEAD + len(key[0]) + len(key[1])
+
+    def get(self, key):
+        """Return the cached score for a normalized pair, or None"""
+        with self.lock:
+            score = self.entries.get(key)
+            if score is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return score
+
+    def put(self, key, score):
+        """Store the score for a normalized pair, evicting old entries if needed"""
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+            else:
+                self.size += self.entry_size(key)
+            self.entries[key] = score
+            while self.size > self.max_bytes and self.entries:
+                old_key, _ = self.entries.popitem(last=False)
+                self.size -= self.entry_size(old_key)
+
+    def score(self, str1, str2):
+        """Return calculate_similarity(str1, str2), computing it only on a cache miss"""
+        key = (str1.lower(), str2.lower())
+        score = self.get(key)
+        if score is None:
+            score = calculate_similarity(str1, str2)
+            self.put(key, score)
+        return score
+
+    def clear(self):
+        """Remove all cached scores"""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def load(self, path=None):
+        """Load saved scores from disk. Missing, broken or outdated files are ignored."""
+        path = path or self.path
+        if not path or not os.path.isfile(path):
+            return False
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if not isinstance(data, dict) or data.get("version") != self.version:
+            return False
+        try:
+            scores = [(str(name1), str(name2), float(score)) for name1, name2, score in data.get("scores", [])]
+        except (TypeError, ValueError):
+            return False
+        for name1, name2, score in scores:
+            self.put((name1, name2), score)
+        return True
+
+    def save(self, path=None):
+        """Save the cached scores to disk (oldest first, so LRU order survives)"""
+        path = path or self.path
+        if not path:
+            return
+        with self.lock:
+            scores = [[key[0], key[1], score] for key, score in self.entries.items()]
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file first so a crash never leaves a half written cache
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": self.version, "scores": scores}, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
@@ -0,0 +1,424 @@
+"""
+Candidate generation for the similarity scan.
+
+Instead of scoring every name against every other name, these helpers only
+return the names that could possibly reach the similarity threshold. The
+bounds used here are derived from calculate_similarity itself, so a scan that
+only scores candidates finds exactly the same groups as the exhaustive scan.
+"""
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+
+# Small tolerance so float rounding never makes a bound too strict
+EPSILON = 1e-9
+
+
+def length_compatible(len1, len2):
+    """Whether two lengths survive the length rejection in calculate_similarity"""
+    return abs(len1 - len2) <= min(len1, len2) // 2
+
+
+def length_window(length):
+    """Return the (lowest, highest) partner lengths that are length compatible"""
+    lowest = length
+    while lowest > 1 and length_compatible(length, lowest - 1):
+        lowest -= 1
+    return lowest, length + length // 2
+
+
+def max_edit_distance(len1, len2, threshold):
+    """
+    Largest edit distance a pair with these lengths can have and still reach
+    threshold, or -1 if no pair with these lengths can reach it.
+    Every branch of calculate_similarity is bounded by the edit distance d:
+    the basic ratio is at most 1 - d/(len1+len2) and the position and edit
+    ratios are at most 1 - d/max(len1, len2).
+    """
+    total = len1 + len2
+    longest = max(len1, len2)
+    t = threshold - EPSILON
+    for d in range(longest, -1, -1):
+        basic_bound = 1 - d / total
+        ratio_bound = 1 - d / longest
+        # Quick acceptance of a basic ratio above 0.8
+        if basic_bound > 0.8 and basic_bound >= t:
+            return d
+        # Equal length with 1-2 differences, or a prefix with up to 5 extra characters
+        if d <= 5 and t <= 0.8:
+            return d
+        # Weighted final ratio
+        if basic_bound * 0.3 + ratio_bound * 0.7 >= t:
+            return d
+    return -1
+
+
+def min_common_chars(len1, len2, threshold):
+    """
+    Smallest number of shared characters (counted with multiplicity) a pair
+    with these lengths needs to reach threshold, or None if it never can.
+    With C shared characters the basic ratio is at most 2C/(len1+len2) and the
+    position and edit ratios are at most C/max(len1, len2).
+    """
+    total = len1 + len2
+    longest = max(len1, len2)
+    shortest = min(len1, len2)
+    t = threshold - EPSILON
+    for common in range(shortest + 1):
+        basic_bound = 2 * common / total
+        ratio_bound = common / longest
+        # Quick acceptance of a basic ratio above 0.8
+        if basic_bound > 0.8 and basic_bound >= t:
+            return common
+        # Equal length with 1-2 differences, or a prefix with up to 5 extra characters
+        if common >= shortest - 2 and (t <= 0.7 or (t <= 0.8 and basic_bound >= t)):
+            return common
+        # Weighted final ratio
+        if basic_bound * 0.3 + ratio_bound * 0.7 >= t:
+            return common
+    return None
+
+
+def digit_suffix_start(name):
+    """Index where the trailing run of digits in name starts (len(name) if none)"""
+    start = len(name)
+    while start > 0 and name[start - 1].isdigit():
+        start -= 1
+    return start
+
+
+class PrefixDigitLookup:
+    """
+    Finds the "prefix plus numbers" partners of a name, e.g. "wow" and "wow01".
+    These pairs always score 0.9 whatever their lengths, so they are looked up
+    separately from the length and q-gram based candidates.
+    """
+
+    def __init__(self, folded_names):
+        # Folded name -> ids with exactly that folded name
+        self.by_name = defaultdict(list)
+        # Prefix -> ids of names that are the prefix followed by digits
+        self.by_prefix = defaultdict(list)
+        self.suffix_starts = []
+        for index, name in enumerate(folded_names):
+            self.by_name[name].append(index)
+            start = digit_suffix_start(name)
+            self.suffix_starts.append(start)
+            for cut in range(max(start, 1), len(name)):
+                self.by_prefix[name[:cut]].append(index)
+        self.folded_names = folded_names
+
+    def partners(self, index):
+        """Return the ids of names that pair with this one as prefix plus digits"""
+        name = self.folded_names[index]
+        found = list(self.by_prefix.get(name, ()))
+        for cut in range(max(self.suffix_starts[index], 1), len(name)):
+            found.extend(self.by_name.get(name[:cut], ()))
+        return found
+
+
+class LengthIndex:
+    """
+    Names sorted by length, used to find candidate pairs.
+
+    calculate_similarity returns 0.0 for any pair whose lengths differ by
+    more than half the shorter length, unless it is a prefix plus digits pair.
+    So every candidate is either inside the seed's length window, found with
+    two binary searches over the sorted lengths, or comes from the prefix
+    lookup.
+    """
+
+    def __init__(self, names):
+        folded = [name.lower() for name in names]
+        self.lengths = [len(name) for name in folded]
+        self.order = sorted(range(len(folded)), key=self.lengths.__getitem__)
+        self.sorted_lengths = [self.lengths[index] for index in self.order]
+        self.prefix_lookup = PrefixDigitLookup(folded)
+
+    def candidates(self, index):
+        """Return the sorted ids of all length compatible and prefix plus digits names"""
+        lowest_len, highest_len = length_window(self.lengths[index])
+        start = bisect_left(self.sorted_lengths, lowest_len)
+        end = bisect_right(self.sorted_lengths, highest_len)
+        found = set(self.order[start:end])
+        found.update(self.prefix_lookup.partners(index))
+        found.discard(index)
+        return sorted(found)
+
+
+class QGramIndex:
+    """
+    Inverted index of character q-grams used to find candidate pairs.
+
+    Each name is turned into a set of (q-gram, occurrence) tokens so that the
+    size of a set intersection equals the number of q-grams two names share,
+    counted with multiplicity. A pair can only reach the threshold if it shares
+    at least a length dependent number of tokens (see min_common_chars and
+    max_edit_distance), so only a prefix of each token set, ordered from
+    rarest to most common token, has to be indexed (prefix filtering).
+
+    q=1 (single characters) gives the tightest bounds at the low thresholds
+    the app uses. Longer q-grams are padded and bounded via the edit distance.
+    Shared characters are a weak bound at low thresholds, though: at 0.35
+    most names of a listing share enough of them, and the index mainly
+    speeds up high thresholds (see benchmarks/bench_scan.py).
+    """
+
+    def __init__(self, names, threshold, q=1):
+        self.threshold = threshold
+        self.q = q
+        folded = [name.lower() for name in names]
+        self.lengths = [len(name) for name in folded]
+        self.prefix_lookup = PrefixDigitLookup(folded)
+        self._required = {}
+
+        # Tokenize and order tokens globally from rarest to most common
+        token_lists = [self._tokenize(name) for name in folded]
+        frequency = Counter(token for tokens in token_lists for token in tokens)
+        order = {token: rank for rank, token in enumerate(
+            sorted(frequency, key=lambda token: (frequency[token], token)))}
+        self.token_sets = []
+        self.postings = defaultdict(list)
+        self.by_length = defaultdict(list)
+        # Names whose bound is too weak to prune anything are always
+        # candidates for the names in their length window
+        self.unbounded = defaultdict(list)
+        for index, tokens in enumerate(token_lists):
+            ranked = sorted(order[token] for token in tokens)
+            self.token_sets.append(frozenset(ranked))
+            self.by_length[self.lengths[index]].append(index)
+            needed = self._lowest_required(self.lengths[index])
+            if needed is None:
+                continue
+            if needed <= 0:
+                self.unbounded[self.lengths[index]].append(index)
+                continue
+            for token in ranked[:len(ranked) - needed + 1]:
+                self.postings[token].append(index)
+
+    def _tokenize(self, name):
+        """Turn a folded name into its (q-gram, occurrence) tokens"""
+        if self.q > 1:
+            pad = "\0" * (self.q - 1)
+            name = pad + name + pad
+        seen = Counter()
+        tokens = []
+        for start in range(len(name) - self.q + 1):
+            gram = name[start:start + self.q]
+            seen[gram] += 1
+            tokens.append((gram, seen[gram]))
+        return tokens
+
+    def required_shared(self, len1, len2):
+        """Minimum tokens a pair with these lengths must share (None if impossible)"""
+        key = (len1, len2) if len1 <= len2 else (len2, len1)
+        if key not in self._required:
+            distance = max_edit_distance(len1, len2, self.threshold)
+            if distance < 0:
+                needed = None
+            else:
+                # Each edit destroys at most q of the padded q-grams
+                needed = max(len1, len2) + self.q - 1 - self.q * distance
+                if self.q == 1:
+                    needed = max(needed, min_common_chars(len1, len2, self.threshold) or 0)
+            self._required[key] = needed
+        return self._required[key]
+
+    def _lowest_required(self, length):
+        """Smallest required overlap over all length compatible partners"""
+        lowest_len, highest_len = length_window(length)
+        needed = [self.required_shared(length, other)
+                  for other in range(lowest_len, highest_len + 1)]
+        needed = [value for value in needed if value is not None]
+        return min(needed) if needed else None
+
+    def candidates(self, index):
+        """Return the sorted ids of all names that may be similar to this one"""
+        length = self.lengths[index]
+        tokens = self.token_sets[index]
+        found = set(self.prefix_lookup.partners(index))
+
+        lowest_len, highest_len = length_window(length)
+        needed_here = self._lowest_required(length)
+        probe = set()
+        if needed_here is not None and needed_here <= 0:
+            # No pruning possible, take every length compatible name
+            for other_length in range(lowest_len, highest_len + 1):
+                probe.update(self.by_length.get(other_length, ()))
+        else:
+            for other_length in range(lowest_len, highest_len + 1):
+                probe.update(self.unbounded.get(other_length, ()))
+            if needed_here is not None:
+                for token in sorted(tokens)[:len(tokens) - needed_here + 1]:
+                    probe.update(self.postings.get(token, ()))
+
+        # Required overlap for every length compatible partner length
+        required = {}
+        for other_length in range(lowest_len, highest_len + 1):
+            needed = self.required_shared(length, other_length)
+            if needed is not None:
+                required[other_length] = needed
+
+        lengths = self.lengths
+        token_sets = self.token_sets
+        for other in probe:
+            needed = required.get(lengths[other])
+            if needed is not None and len(tokens & token_sets[other]) >= needed:
+                found.add(other)
+
+        found.discard(index)
+        return sorted(found)
+
+
+class NameIndex:
+    """
+    Candidate index that names can be added to and removed from one at a time.
+
+    It uses the same single character tokens, bounds and prefix filtering as
+    QGramIndex. Prefix filtering works with any fixed token order, so tokens
+    seen for the first time are simply ranked after all known ones and the
+    names already indexed never have to be touched again. Ranking the initial
+    names' tokens from rarest to most common keeps the postings short.
+    """
+
+    def __init__(self, threshold, names=()):
+        self.threshold = threshold
+        self.names = {}  # Indexed name -> (folded name, token set)
+        self.by_length = defaultdict(set)
+        self.unbounded = defaultdict(set)
+        self.postings = defaultdict(set)
+        self.by_folded = defaultdict(set)
+        self.by_prefix = defaultdict(set)
+        self._required = {}
+        frequency = Counter(token for name in names for token in self._tokenize(name.lower()))
+        self.ranks = {token: rank for rank, token in enumerate(
+            sorted(frequency, key=lambda token: (frequency[token], token)))}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.names
+
+    @staticmethod
+    def _tokenize(folded):
+        seen = Counter()
+        tokens = []
+        for char in folded:
+            seen[char] += 1
+            tokens.append((char, seen[char]))
+        return tokens
+
+    def _ranked(self, folded):
+        ranked = []
+        for token in self._tokenize(folded):
+            rank = self.ranks.get(token)
+            if rank is None:
+                rank = self.ranks[token] = len(self.ranks)
+            ranked.append(rank)
+        ranked.sort()
+        return ranked
+
+    def required_shared(self, len1, len2):
+        """Minimum characters a pair with these lengths must share (None if impossible)"""
+        key = (len1, len2) if len1 <= len2 else (len2, len1)
+        if key not in self._required:
+            distance = max_edit_distance(len1, len2, self.threshold)
+            if distance < 0:
+                needed = None
+            else:
+                needed = max(max(len1, len2) - distance, min_common_chars(len1, len2, self.threshold) or 0)
+            self._required[key] = needed
+        return self._required[key]
+
+    def _lowest_required(self, length):
+        lowest_len, highest_len = length_window(length)
+        needed = [self.required_shared(length, other)
+                  for other in range(lowest_len, highest_len + 1)]
+        needed = [value for value in needed if value is not None]
+        return min(needed) if needed else None
+
+    def _prefix_keys(self, folded):
+        """Prefixes under which folded is found as a "prefix plus digits" name"""
+        return [folded[:cut] for cut in range(max(digit_suffix_start(folded), 1), len(folded))]
+
+    def add(self, name):
+        """Index a name (adding a name twice has no effect)"""
+        if name in self.names:
+            return
+        folded = name.lower()
+        ranked = self._ranked(folded)
+        self.names[name] = (folded, frozenset(ranked))
+        length = len(folded)
+        self.by_length[length].add(name)
+        self.by_folded[folded].add(name)
+        for prefix in self._prefix_keys(folded):
+            self.by_prefix[prefix].add(name)
+        needed = self._lowest_required(length)
+        if needed is None:
+            return
+        if needed <= 0:
+            self.unbounded[length].add(name)
+            return
+        for rank in ranked[:len(ranked) - needed + 1]:
+            self.postings[rank].add(name)
+
+    def remove(self, name):
+        """Remove a name from the index (unknown names are ignored)"""
+        entry = self.names.pop(name, None)
+        if entry is None:
+            return
+        folded, tokens = entry
+        length = len(folded)
+        self.by_length[length].discard(name)
+        self.by_folded[folded].discard(name)
+        self.unbounded[length].discard(name)
+        for prefix in self._prefix_keys(folded):
+            self.by_prefix[prefix].discard(name)
+        for rank in tokens:
+            postings = self.postings.get(rank)
+            if postings is not None:
+                postings.discard(name)
+
+    def candidates(self, name):
+        """Return the indexed names that may be similar to name (in either order)"""
+        folded = name.lower()
+        length = len(folded)
+        lowest_len, highest_len = length_window(length)
+        if self.threshold <= 0:
+            found = set(self.names)
+            found.discard(name)
+            return found
+
+        # Prefix plus digits partners score 0.9 whatever their lengths
+        found = set(self.by_prefix.get(folded, ()))
+        for prefix in self._prefix_keys(folded):
+            found.update(self.by_folded.get(prefix, ()))
+
+        ranked = self._ranked(folded)
+        needed_here = self._lowest_required(length)
+        probe = set()
+        if needed_here is not None and needed_here <= 0:
+            for other_length in range(lowest_len, highest_len + 1):
+                probe.update(self.by_length.get(other_length, ()))
+        else:
+            for other_length in range(lowest_len, highest_len + 1):
+                probe.update(self.unbounded.get(other_length, ()))
+            if needed_here is not None:
+                for rank in ranked[:len(ranked) - needed_here + 1]:
+                    probe.update(self.postings.get(rank, ()))
+
+        required = {}
+        for other_length in range(lowest_len, highest_len + 1):
+            needed = self.required_shared(length, other_length)
+            if needed is not None:
+                required[other_length] = needed
+
+        tokens = frozenset(ranked)
+        for other in probe:
+            other_folded, other_tokens = self.names[other]
+            needed = required.get(len(other_folded))
+            if needed is not None and len(tokens & other_tokens) >= needed:
+                found.add(other)
+
+        found.discard(name)
+        return found
@@ -0,0 +1,151 @@
+"""
+Command line interface for batch scanning.
+
+Example:
+    python -m count_corrector /srv/share1 /srv/share2 --format json -o groups.json
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+
+from . import vectorized
+from .cache import DEFAULT_MAX_BYTES, ScoreCache
+from .duplicates import find_duplicate_groups
+from .engine import DEFAULT_THRESHOLD, SCAN_METHODS, scan_directory, scan_tree
+from .graph import DEFAULT_LINKAGE, LINKAGES
+from .index import ScanIndex, scan_with_index
+from .stats import ScanStats
+
+
+def build_parser():
+    """Create the argument parser for the command line interface"""
+    parser = argparse.ArgumentParser(
+        prog="count_corrector",
+        description="Find groups of similarly named folders and files.",
+    )
+    parser.add_argument("directories", nargs="+", metavar="DIRECTORY",
+                        help="directory to scan (any number can be given)")
+    parser.add_argument("-t", "--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"similarity threshold between 0 and 1 (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument("-o", "--output", metavar="FILE",
+                        help="write the groups to FILE instead of stdout")
+    parser.add_argument("-f", "--format", choices=("text", "json"), default="text",
+                        help="output format (default: text)")
+    parser.add_argument("-m", "--method", choices=SCAN_METHODS, default="qgram",
+                        help="how pairs are chosen for scoring; 'exhaustive' scores every "
+                             "pair and is meant for verification (default: qgram)")
+    parser.add_argument("-l", "--linkage", choices=LINKAGES + ("greedy",), default=DEFAULT_LINKAGE,
+                        help="how groups are formed from the similar pairs: 'single' every "
+                             "chain of similar names, 'complete' groups names that are all "
+                             "similar to each other, 'average' names that are similar on "
+                             "average and 'greedy' is the old grouping, which depends on the "
+                             "listing order (default: %(default)s)")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="scan every subdirectory too; names are compared within "
+                             "their own directory and reported as relative paths")
+    parser.add_argument("-d", "--duplicates", action="store_true",
+                        help="group files with identical content instead of similar names")
+    parser.add_argument("-j", "--workers", type=int, default=1, metavar="N",
+                        help="score pairs on N processes, 0 for one per CPU (default: 1); "
+                             "small directories are always scanned serially")
+    parser.add_argument("--cache", metavar="FILE",
+                        help="load similarity scores from FILE and save them back after the "
+                             "scan, so later runs only score new names")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        metavar="MB", help="memory limit of the score cache in MB (default: %(default)s)")
+    parser.add_argument("--index", metavar="FILE",
+                        help="keep each directory's listing and groups in the SQLite database "
+                             "FILE, so later runs only rescore entries that changed")
+    parser.add_argument("--stats", metavar="FILE",
+                        help="write the time of each scan phase and the number of pairs "
+                             "scored and rejected per directory to FILE as JSON")
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+                        help="log progress to stderr (-vv for debug output)")
+    return parser
+
+
+def write_text(results, out):
+    """Write scan results as plain text, one group per block"""
+    for directory, groups in results.items():
+        out.write(f"{directory}: {len(groups)} groups\n")
+        for group in groups:
+            out.write(f"  Similar to '{group[0]}':\n")
+            for item in group:
+                out.write(f"    {item}\n")
+
+
+def write_json(results, out):
+    """Write scan results as a JSON object mapping each directory to its groups"""
+    json.dump(results, out, indent=2, ensure_ascii=False)
+    out.write("\n")
+
+
+def main(argv=None):
+    """Scan every given directory and write the groups. Returns the exit code."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.method == "numpy" and not vectorized.available():
+        parser.error("the numpy method needs NumPy, install it with: pip install numpy")
+    if args.index and (args.recursive or args.duplicates):
+        parser.error("--index cannot be combined with --recursive or --duplicates")
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG if args.verbose > 1 else logging.INFO,
+                            format="%(levelname)s %(name)s: %(message)s")
+
+    cache = None
+    if args.cache:
+        cache = ScoreCache(max_bytes=args.cache_size * 1024 * 1024, path=args.cache)
+        cache.load()
+    index = ScanIndex(args.index) if args.index else None
+    linkage = None if args.linkage == "greedy" else args.linkage
+
+    results = {}
+    all_stats = {}
+    failed = False
+    for directory in args.directories:
+        if not os.path.isdir(directory):
+            print(f"Error: not a directory: {directory}", file=sys.stderr)
+            failed = True
+            continue
+        stats = all_stats[directory] = ScanStats(directory) if args.stats else None
+        try:
+            if args.duplicates:
+                results[directory] = find_duplicate_groups(directory, args.recursive)
+            elif index is not None:
+                results[directory], _ = scan_with_index(index, directory, args.threshold,
+                                                        args.method, cache, args.workers or None,
+                                                        stats, linkage)
+            else:
+                scan = scan_tree if args.recursive else scan_directory
+                results[directory] = scan(directory, args.threshold, args.method, cache,
+                                          args.workers or None, stats, linkage)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Error scanning {directory}: {e}", file=sys.stderr)
+            failed = True
+
+    if cache is not None:
+        try:
+            cache.save()
+        except OSError as e:
+            print(f"Error saving score cache: {e}", file=sys.stderr)
+
+    if args.stats:
+        try:
+            with open(args.stats, "w", encoding="utf-8") as out:
+                json.dump({directory: stats.to_dict() for directory, stats in all_stats.items()},
+                          out, indent=2, ensure_ascii=False)
+                out.write("\n")
+        except OSError as e:
+            print(f"Error writing statistics: {e}", file=sys.stderr)
+
+    writer = write_json if args.format == "json" else write_text
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            writer(results, out)
+    else:
+        writer(results, sys.stdout)
+
+    return 1 if failed else 0
@@ -0,0 +1,340 @@
+"""
+Incrementally maintained clusters of similar names.
+
+ClusterIndex keeps the similarity graph of a directory listing (which names
+are similar to which) together with its connected components, so a single
+created, deleted or renamed entry can be handled by scoring only that
+entry against its candidates instead of rebuilding the groups from scratch.
+"""
+from .candidates import NameIndex
+from .engine import DEFAULT_THRESHOLD, make_scorer
+from .graph import SimilarityGraph, name_order_key, ordered_pair
+from .names import NameTable
+
+
+class ClusterIndex:
+    """
+    Connected components of the similarity graph of a set of names.
+
+    Two names are neighbors when their score reaches the threshold; like in
+    a SimilarityGraph, a pair is scored in name order (see ordered_pair).
+    The components are those of the edges that reach level (by default the
+    threshold), so an index built down to a low threshold still keeps the
+    components at the level groups are derived at, which chain far less.
+    Each name has the id of its component and each id a set of members;
+    joining two components relabels the smaller one, so adding a name costs
+    its candidate comparisons and a few relabelings. Removing a name
+    searches its former component from each of its neighbors in turn, one
+    step at a time, and stops once a single search is left: only the parts
+    split off are walked, not the rest of the component. Nothing is scored.
+
+    The components only depend on the current set of names, not on the order
+    of the operations that led to it. groups() lists every component with
+    more than one name, with names and groups in the order they were added.
+
+    Neighbors are kept with the weight of their edge (their score), so the
+    index converts to and from a SimilarityGraph
+    without scoring anything: from_graph() starts from a graph built by a
+    full scan and graph() returns the current one.
+
+    groups(linkage, threshold) derives the groups of each component from its
+    own part of the graph and keeps them, so after an update only the
+    components add() or remove() touched are clustered again. keep_groups()
+    hands it the groups a scan already derived from the whole graph.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, cache=None, names=(), stats=None, level=None):
+        self.threshold = threshold
+        self.level = threshold if level is None else max(level, threshold)
+        self.cache = cache
+        self.table = NameTable()
+        self.score = make_scorer(threshold, cache, stats, self.table)
+        self.candidates = NameIndex(threshold, names)
+        self.neighbors = {}  # name -> {similar name: edge weight}
+        self.component = {}  # name -> id of its component
+        self.members = {}  # component id -> set of names in it
+        self.next_id = 0
+        self.order = {}  # name -> position, keeps the output stable
+        self.next_position = 0
+        self.grouping = None  # (linkage, threshold) of the groups kept in component_groups
+        self.component_groups = {}  # component id -> groups of its component (if it has two names or more)
+        self.pending_groups = None  # (groups, linkage, threshold) handed to keep_groups, not sorted in yet
+        for name in names:
+            self.add(name)
+
+    @classmethod
+    def from_graph(cls, graph, cache=None, stats=None, level=None):
+        """Return the index of a SimilarityGraph's names and edges, without scoring any pair"""
+        clusters = cls(graph.threshold, cache, stats=stats, level=level)
+        clusters.candidates = NameIndex(graph.threshold, graph.names)
+        names = graph.names
+        for node, name in enumerate(names):
+            clusters.candidates.add(name)
+            clusters.neighbors[name] = {names[other]: weight
+                                        for other, weight in graph.adjacency[node].items()}
+            clusters.order[name] = node
+        clusters.next_position = len(names)
+        clusters.relink(clusters.level)
+        return clusters
+
+    def graph(self):
+        """Return the current SimilarityGraph of the names"""
+        edges = ((name, other, weight) for name, neighbors in self.neighbors.items()
+                 for other, weight in neighbors.items())
+        return SimilarityGraph.from_edges(self.neighbors, edges, self.threshold)
+
+    def set_stats(self, stats):
+        """Count the pairs scored from now on in a ScanStats (None to stop counting)"""
+        self.score = make_scorer(self.threshold, self.cache, stats, self.table)
+
+    def __len__(self):
+        return len(self.neighbors)
+
+    def __contains__(self, name):
+        return name in self.neighbors
+
+    def weight(self, name1, name2):
+        """Edge weight of two names, or None if they are not neighbors in the similarity graph"""
+        weight = self.score(*ordered_pair(name1, name2))
+        return weight if weight >= self.threshold else None
+
+    def similar(self, name1, name2):
+        """Whether two names are neighbors in the similarity graph"""
+        return self.weight(name1, name2) is not None
+
+    def find(self, name):
+        """Return the id of the component containing name"""
+        self._sort_pending_groups()
+        return self.component[name]
+
+    def _new_component(self, names):
+        component_id = self.next_id
+        self.next_id += 1
+        for name in names:
+            self.component[name] = component_id
+        self.members[component_id] = set(names)
+        return component_id
+
+    def _join(self, id1, id2):
+        """Join two components, relabeling the smaller one. Returns the id of the result."""
+        if id1 == id2:
+            return id1
+        if len(self.members[id1]) < len(self.members[id2]):
+            id1, id2 = id2, id1
+        moved = self.members.pop(id2)
+        for name in moved:
+            self.component[name] = id1
+        self.members[id1].update(moved)
+        self.component_groups.pop(id1, None)
+        self.component_groups.pop(id2, None)
+        return id1
+
+    def relink(self, level):
+        """Track the components of the edges that reach level (at least the threshold) from now on"""
+        self.level = max(level, self.threshold)
+        self.component = {}
+        self.members = {}
+        self.grouping = None
+        self.component_groups = {}
+        neighbors = self.neighbors
+        for start in neighbors:
+            if start in self.component:
+                continue
+            members = [start]
+            self.component[start] = None
+            for current in members:
+                for other, weight in neighbors[current].items():
+                    if weight >= self.level and other not in self.component:
+                        self.component[other] = None
+                        members.append(other)
+            self._new_component(members)
+
+    def add(self, name):
+        """Add a name, scoring it only against its candidates. Returns the id of its component."""
+        self._sort_pending_groups()
+        if name in self.neighbors:
+            return self.component[name]
+        found = {}
+        for other in self.candidates.candidates(name):
+            if other in self.neighbors:
+                weight = self.weight(name, other)
+                if weight is not None:
+                    found[other] = weight
+        self.candidates.add(name)
+        self.neighbors[name] = found
+        self.order[name] = self.next_position
+        self.next_position += 1
+        component_id = self._new_component([name])
+        for other, weight in found.items():
+            self.neighbors[other][name] = weight
+            if weight >= self.level:
+                component_id = self._join(component_id, self.component[other])
+        return component_id
+
+    def remove(self, name):
+        """
+        Remove a name and split its component where it was the only link.
+        Returns the ids of the components its former members now belong to.
+        """
+        self._sort_pending_groups()
+        if name not in self.neighbors:
+            return []
+        component_id = self.component.pop(name)
+        members = self.members[component_id]
+        members.discard(name)
+        self.component_groups.pop(component_id, None)
+        starts = []
+        for other, weight in self.neighbors.pop(name).items():
+            del self.neighbors[other][name]
+            if weight >= self.level:
+                starts.append(other)
+        self.candidates.remove(name)
+        self.table.discard(name)
+        del self.order[name]
+        if not members:
+            del self.members[component_id]
+            return []
+        return [component_id] + [self._new_component(part) for part in self._split_off(starts)]
+
+    def _split_off(self, starts):
+        """
+        Return the parts of a component that are no longer connected to the
+        rest of it, given the names that were linked to a removed name.
+
+        A search starts from each of them and they take turns expanding one
+        name each. A search that reaches a name another one found joins it;
+        one that runs out of names has found a part of its own. The search
+        left last is connected to everything not found yet, so it never
+        has to finish and the cost follows the size of the parts split off.
+        """
+        level = self.level
+        neighbors = self.neighbors
+        owner = {}  # name -> the search that found it
+        found = {}  # search -> names it found
+        pending = {}  # search -> names it still has to expand
+        joined = {}  # search -> the search it joined
+        for start in starts:
+            if start not in owner:
+                owner[start] = start
+                found[start] = [start]
+                pending[start] = [start]
+
+        def search_of(name):
+            search = owner[name]
+            while search in joined:
+                search = joined[search]
+            return search
+
+        parts = []
+        while len(pending) > 1:
+            for search in list(pending):
+                if len(pending) < 2:
+                    break
+                if search not in pending:
+                    continue  # Joined another search during this turn
+                current = pending[search].pop()
+                for other, weight in neighbors[current].items():
+                    if weight < level:
+                        continue
+                    if other not in owner:
+                        owner[other] = search
+                        found[search].append(other)
+                        pending[search].append(other)
+                        continue
+                    met = search_of(other)
+                    if met != search:
+                        # Keep the larger search, the other one joins it
+                        if len(found[met]) > len(found[search]):
+                            search, met = met, search
+                        joined[met] = search
+                        found[search].extend(found.pop(met))
+                        pending[search].extend(pending.pop(met))
+                if not pending.get(search, True):
+                    del pending[search]
+                    parts.append(found.pop(search))
+        for part in parts:
+            self.members[self.component[part[0]]].difference_update(part)
+        return parts
+
+    def rename(self, old_name, new_name):
+        """Handle a renamed entry. Returns the id of the new name's component."""
+        self.remove(old_name)
+        return self.add(new_name)
+
+    def group_of(self, name):
+        """Return the group containing name (just [name] if it has no neighbors)"""
+        return sorted(self.members[self.find(name)], key=self.order.__getitem__)
+
+    def groups(self, linkage=None, threshold=None):
+        """
+        Return every component at threshold (by default the level) with at
+        least two names, in a stable order. With a linkage the groups of
+        graph().groups(linkage, threshold) are returned instead, which are in
+        name order; only the components changed since the last call (or
+        keep_groups) with the same linkage and threshold are clustered again.
+        """
+        self._sort_pending_groups()
+        if linkage is not None:
+            kept = self._kept_groups(linkage, threshold)
+            groups = []
+            for component_id, members in self.members.items():
+                if len(members) < 2:
+                    continue
+                found = kept.get(component_id)
+                if found is None:
+                    found = kept[component_id] = self._component_groups(members, linkage, self.level)
+                groups.extend(found)
+            groups.sort(key=lambda group: name_order_key(group[0]))
+            return groups
+        if threshold is not None and max(threshold, self.threshold) != self.level:
+            self.relink(threshold)
+        groups = [sorted(members, key=self.order.__getitem__)
+                  for members in self.members.values() if len(members) > 1]
+        groups.sort(key=lambda group: self.order[group[0]])
+        return groups
+
+    def keep_groups(self, groups, linkage, threshold=None):
+        """
+        Keep groups already derived for linkage and threshold from the
+        current graph (e.g. by the scan the index was made from), so groups()
+        starts from them. They are only sorted into components by the next
+        call that reads or changes the index, so this is cheap wherever it
+        is called from.
+        """
+        self.pending_groups = (groups, linkage, threshold)
+
+    def _sort_pending_groups(self):
+        """Sort the groups handed to keep_groups into their components"""
+        if self.pending_groups is None:
+            return
+        groups, linkage, threshold = self.pending_groups
+        self.pending_groups = None
+        kept = self._kept_groups(linkage, threshold)
+        kept.clear()
+        for component_id, members in self.members.items():
+            if len(members) > 1:
+                kept[component_id] = []
+        for group in groups:
+            kept[self.component[group[0]]].append(group)
+
+    def _kept_groups(self, linkage, threshold):
+        """
+        The kept groups by component id, forgotten if linkage or threshold
+        changed. The components are tracked at threshold from now on.
+        """
+        threshold = self.level if threshold is None else max(threshold, self.threshold)
+        if threshold != self.level:
+            self.relink(threshold)
+        if self.grouping != (linkage, threshold):
+            self.grouping = (linkage, threshold)
+            self.component_groups = {}
+        return self.component_groups
+
+    def _component_groups(self, members, linkage, threshold):
+        """Groups of one component, from the part of the graph it spans at threshold"""
+        if linkage == "single":
+            return [sorted(members, key=name_order_key)]
+        neighbors = self.neighbors
+        edges = [(name, other, weight) for name in members
+                 for other, weight in neighbors[name].items() if weight >= threshold]
+        return SimilarityGraph.from_edges(members, edges, threshold).groups(linkage, threshold)
@@ -0,0 +1,61 @@
+"""
+Edit distance used by calculate_similarity for longer names.
+
+The distance is computed with Myers' bit-parallel algorithm (in Hyyrö's
+formulation for the global Levenshtein distance). Python integers are used as
+bit vectors, so each character of the second string costs a handful of integer
+operations instead of a full row of the dynamic programming matrix, and only
+the current column of the matrix is ever kept.
+"""
+
+
+def levenshtein(a, b, max_distance=None):
+    """
+    Return the Levenshtein distance between a and b.
+
+    If max_distance is given the computation stops as soon as the distance is
+    known to be larger, and max_distance + 1 is returned instead.
+    """
+    if a == b:
+        return 0
+    # Use the shorter string as the bit vector pattern
+    if len(a) > len(b):
+        a, b = b, a
+    m, n = len(a), len(b)
+    limit = n if max_distance is None else max_distance
+
+    # The length difference alone already needs that many edits
+    if n - m > limit:
+        return limit + 1
+    if not m:
+        return n
+
+    # Bit mask of the positions where each character occurs in the pattern
+    peq = {}
+    for i, char in enumerate(a):
+        peq[char] = peq.get(char, 0) | (1 << i)
+
+    mask = (1 << m) - 1
+    high_bit = 1 << (m - 1)
+    positive = mask  # Vertical +1 deltas
+    negative = 0     # Vertical -1 deltas
+    score = m
+    for j, char in enumerate(b):
+        eq = peq.get(char, 0)
+        xv = eq | negative
+        xh = (((eq & positive) + positive) ^ positive) | eq
+        ph = negative | (~(xh | positive) & mask)
+        mh = positive & xh
+        if ph & high_bit:
+            score += 1
+        elif mh & high_bit:
+            score -= 1
+        # Each remaining character can lower the score by at most one
+        if score - (n - j - 1) > limit:
+            return limit + 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        positive = mh | (~(xv | ph) & mask)
+        negative = ph & xv
+
+    return score if score <= limit else limit + 1
@@ -0,0 +1,163 @@
+"""
+Exact duplicate detection.
+
+Finds files with identical content, whatever their names. To read as little
+as possible, candidates are narrowed down in stages:
+
+1. Files are bucketed by size (from the directory listing, nothing is read).
+2. Files that share a size are bucketed by a hash of their first and last
+   blocks, which tells most different files apart.
+3. Only files that still match are hashed completely.
+
+Hashing runs on a thread pool with large buffered reads; hashlib releases
+the GIL while hashing, so several files are read and hashed at once.
+"""
+import hashlib
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from .engine import is_item, iter_directories
+
+# Bytes hashed at the start and at the end of a file in the second stage
+EDGE_BLOCK_SIZE = 64 * 1024
+
+# Read buffer for full content hashes
+READ_BUFFER_SIZE = 1024 * 1024
+
+# Threads hashing files at once; reading is I/O bound, so more than the CPU count helps
+DEFAULT_HASH_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+
+def iter_files(directory, recursive=False):
+    """
+    Yield (relative_path, size, file_id) for every regular file under
+    directory. file_id is (st_dev, st_ino), or None where the platform does
+    not report it, and is used to skip extra hard links to the same file.
+    """
+    if recursive:
+        directories = (relative for relative, _ in iter_directories(directory))
+    else:
+        directories = [""]
+    for relative in directories:
+        path = os.path.join(directory, relative) if relative else directory
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if not is_item(entry) or not entry.is_file():
+                            continue
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    file_id = (stat.st_dev, stat.st_ino) if stat.st_ino else None
+                    name = os.path.join(relative, entry.name) if relative else entry.name
+                    yield name, stat.st_size, file_id
+        except OSError:
+            if not relative:
+                raise
+
+
+def edge_hash(path, size):
+    """Hash of the first and last EDGE_BLOCK_SIZE bytes (the whole file if it is small)"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        digest.update(f.read(EDGE_BLOCK_SIZE))
+        if size > EDGE_BLOCK_SIZE:
+            f.seek(max(EDGE_BLOCK_SIZE, size - EDGE_BLOCK_SIZE))
+            digest.update(f.read(EDGE_BLOCK_SIZE))
+    return digest.hexdigest()
+
+
+def full_hash(path):
+    """Hash of the whole content of a file"""
+    digest = hashlib.blake2b()
+    buffer = bytearray(READ_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            digest.update(view[:count])
+    return digest.hexdigest()
+
+
+def _hash_buckets(buckets, hasher, executor, cancel=None, progress=None):
+    """
+    Split each bucket (a list of (name, path, size)) by hasher(path, size).
+    Yields the resulting sub-buckets with more than one file, in order.
+    Files that cannot be read are left out.
+    """
+    def safe_hash(entry):
+        try:
+            return hasher(entry[1], entry[2])
+        except OSError:
+            return None
+
+    # Submit everything first so the pool stays busy while results are collected
+    pending = [(bucket, [executor.submit(safe_hash, entry) for entry in bucket])
+               for bucket in buckets]
+    total = sum(len(bucket) for bucket in buckets)
+    done = 0
+    for bucket, futures in pending:
+        if cancel is not None and cancel.is_set():
+            for _, rest in pending:
+                for future in rest:
+                    future.cancel()
+            return
+        split = defaultdict(list)
+        for entry, future in zip(bucket, futures):
+            digest = future.result()
+            if digest is not None:
+                split[digest].append(entry)
+        done += len(bucket)
+        if progress is not None:
+            progress(done, total)
+        for sub_bucket in split.values():
+            if len(sub_bucket) > 1:
+                yield sub_bucket
+
+
+def iter_duplicate_groups(directory, recursive=False, workers=None, cancel=None, progress=None):
+    """
+    Yield groups of files with identical content under directory, as lists
+    of paths relative to directory sorted by name. Empty files are ignored.
+    Groups of larger files come first, as their duplicates waste the most
+    space. progress, if given, is called as progress(files_done, files_total)
+    during each hashing stage.
+    """
+    by_size = defaultdict(list)
+    seen_ids = set()
+    for name, size, file_id in iter_files(directory, recursive):
+        if cancel is not None and cancel.is_set():
+            return
+        if size == 0:
+            continue
+        if file_id is not None:
+            # Hard links to the same file are not duplicates
+            if file_id in seen_ids:
+                continue
+            seen_ids.add(file_id)
+        by_size[size].append((name, os.path.join(directory, name), size))
+
+    buckets = [by_size[size] for size in sorted(by_size, reverse=True) if len(by_size[size]) > 1]
+
+    with ThreadPoolExecutor(max_workers=workers or DEFAULT_HASH_WORKERS) as executor:
+        candidates = list(_hash_buckets(buckets, edge_hash, executor, cancel, progress))
+
+        # Small files were read completely by the edge hash already
+        large = [bucket for bucket in candidates if bucket[0][2] > 2 * EDGE_BLOCK_SIZE]
+        small = [bucket for bucket in candidates if bucket[0][2] <= 2 * EDGE_BLOCK_SIZE]
+        groups = _hash_buckets(large, lambda path, size: full_hash(path), executor, cancel, progress)
+        for group in groups:
+            yield sorted(name for name, _, _ in group)
+        if cancel is not None and cancel.is_set():
+            return
+        for group in small:
+            yield sorted(name for name, _, _ in group)
+
+
+def find_duplicate_groups(directory, recursive=False, workers=None):
+    """Return the groups of files with identical content (see iter_duplicate_groups)"""
+    return list(iter_duplicate_groups(directory, recursive, workers))
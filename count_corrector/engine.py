@@ -0,0 +1,647 @@
+"""
+Scanning engine for Count Corrector.
+
+Holds the name similarity and grouping logic without any tkinter or watchdog
+dependency, so it can be used from the Tk app, the command line (see
+``python -m count_corrector``) or any other script.
+"""
+import logging
+import os
+import time
+from collections import Counter
+from difflib import SequenceMatcher
+
+from .candidates import LengthIndex, QGramIndex
+from .distance import levenshtein
+from .stats import CACHED, GROUPING, INDEXING, LISTING, SCORING, PhaseClock, timed
+
+logger = logging.getLogger(__name__)
+
+# Default similarity threshold used by the app and the command line
+DEFAULT_THRESHOLD = 0.35
+
+# Bump whenever calculate_similarity can return different scores, so saved
+# score caches from older versions are not reused
+SIMILARITY_VERSION = 1
+
+# Ways find_similar_groups can pick the pairs it scores
+SCAN_METHODS = ("qgram", "length", "numpy", "exhaustive")
+
+# Below this many items a scan always runs serially
+PARALLEL_MIN_ITEMS = 2000
+
+# Seeds between cancel checks and progress callbacks during a scan
+PROGRESS_INTERVAL = 100
+
+# Ways score_with_path can decide a score, in the order they are tried
+PATH_PREFIX_DIGITS = "prefix_digits"  # "wow" and "wow01", always 0.9
+PATH_LENGTH_REJECT = "length_reject"  # lengths too different, always 0.0
+PATH_RATIO_ACCEPT = "ratio_accept"  # SequenceMatcher ratio above 0.8
+PATH_LENGTH_PENALTY = "length_penalty"
+PATH_SAME_LENGTH = "same_length"  # one or two characters replaced
+PATH_SUBSTRING = "substring"  # a short suffix added
+PATH_EDIT_CUTOFF = "edit_cutoff"  # weighted score, edit distance skipped as it cannot reach the threshold
+PATH_WEIGHTED = "weighted"  # weighted score of all measures
+SIMILARITY_PATHS = (PATH_PREFIX_DIGITS, PATH_LENGTH_REJECT, PATH_RATIO_ACCEPT, PATH_LENGTH_PENALTY,
+                    PATH_SAME_LENGTH, PATH_SUBSTRING, PATH_EDIT_CUTOFF, PATH_WEIGHTED)
+
+# Upper bounds score_with_bounds tries before scoring a pair, in this order;
+# each is the path of the pairs it rejects
+PATH_REAL_QUICK_BOUND = "real_quick_bound"  # from the lengths (SequenceMatcher.real_quick_ratio)
+PATH_QUICK_BOUND = "quick_bound"  # from the shared characters (SequenceMatcher.quick_ratio)
+PATH_POSITION_BOUND = "position_bound"  # from the characters in the same positions
+BOUND_PATHS = (PATH_REAL_QUICK_BOUND, PATH_QUICK_BOUND, PATH_POSITION_BOUND)
+
+# A bound only rejects a pair if it is this far below the threshold, so float
+# rounding never rejects a pair that reaches it
+BOUND_EPSILON = 1e-9
+
+
+def final_ratio_for(basic_ratio, position_ratio, max_len, edit_distance):
+    """Weighted final ratio of calculate_similarity for a given edit distance"""
+    edit_ratio = 1 - (edit_distance / max_len)
+    return (basic_ratio * 0.3) + (position_ratio * 0.3) + (edit_ratio * 0.4)
+
+
+def edit_distance_cutoff(basic_ratio, position_ratio, max_len, threshold):
+    """
+    Largest edit distance for which the weighted final ratio still reaches
+    threshold. Returns None if every distance does and -1 if none does.
+    """
+    if final_ratio_for(basic_ratio, position_ratio, max_len, max_len) >= threshold:
+        return None
+    if final_ratio_for(basic_ratio, position_ratio, max_len, 0) < threshold:
+        return -1
+    # The ratio only goes down as the distance goes up, so binary search it
+    low, high = 0, max_len
+    while high - low > 1:
+        middle = (low + high) // 2
+        if final_ratio_for(basic_ratio, position_ratio, max_len, middle) >= threshold:
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+def calculate_similarity(str1, str2, threshold=None):
+    """
+    Calculate similarity between two strings with improved algorithm.
+    Focus on letter-by-letter similarity rather than loose pattern matching.
+    Optimized for speed and accuracy for cases like "wow" and "wow01".
+
+    If threshold is given, the edit distance of long names is only computed
+    as far as needed to tell whether the pair can reach it. Scores at or
+    above threshold are exact; scores below it are only guaranteed to stay
+    below it.
+    """
+    return score_with_path(str1, str2, threshold)[0]
+
+
+def score_with_path(str1, str2, threshold=None):
+    """
+    Return (score, path): the score of calculate_similarity and which of the
+    SIMILARITY_PATHS decided it, so scans can count how often each fast
+    path is taken.
+    """
+    # Convert to lowercase for case-insensitive comparison
+    return score_folded(str1.lower(), str2.lower(), threshold)
+
+
+def is_prefix_plus_numbers(a, b):
+    """Whether one name is the other with digits appended, like wow and wow01"""
+    # Find which string might be the prefix
+    shorter, longer = (a, b) if len(a) <= len(b) else (b, a)
+
+    # Check if longer starts with shorter
+    if longer.startswith(shorter):
+        # Check if the remaining part is just digits
+        suffix = longer[len(shorter):]
+        if suffix and suffix.isdigit():
+            return True
+    return False
+
+
+def score_folded(s1, s2, threshold=None, ratio=None, prefix_digits=None):
+    """
+    score_with_path for two names that are already lowercase. ratio, if
+    given, is called to get SequenceMatcher(None, s1, s2).ratio() (e.g. from
+    a matcher that is reused), and prefix_digits is the result of
+    is_prefix_plus_numbers(s1, s2) if the caller already knows it.
+    """
+    # If one string is a prefix of another plus numbers, consider them very similar
+    if prefix_digits is None:
+        prefix_digits = is_prefix_plus_numbers(s1, s2)
+    if prefix_digits:
+        return 0.9, PATH_PREFIX_DIGITS  # High similarity score
+
+    # Quick rejection for very different lengths (except for prefix+number case which we already handled)
+    if abs(len(s1) - len(s2)) > min(len(s1), len(s2)) // 2:
+        return 0.0, PATH_LENGTH_REJECT
+
+    # Get the basic similarity ratio
+    basic_ratio = ratio() if ratio is not None else SequenceMatcher(None, s1, s2).ratio()
+
+    # Quick acceptance for very similar strings
+    if basic_ratio > 0.8:
+        return basic_ratio, PATH_RATIO_ACCEPT
+
+    # Calculate letter position similarity
+    min_len = min(len(s1), len(s2))
+    max_len = max(len(s1), len(s2))
+
+    # If lengths are very different, reduce similarity
+    length_difference = abs(len(s1) - len(s2))
+    if length_difference > min_len // 2:
+        return basic_ratio * 0.7, PATH_LENGTH_PENALTY  # Penalize significantly different lengths
+
+    # Count matching characters in the same positions
+    position_matches = sum(1 for i in range(min_len) if i < len(s1) and i < len(s2) and s1[i] == s2[i])
+    position_ratio = position_matches / max_len if max_len > 0 else 0
+
+    # Calculate normalized edit distance (0-1 range)
+    path = PATH_WEIGHTED
+    # Use direct comparison for short strings, otherwise use edit distance
+    if max_len < 10:  # For short strings, we can do simple comparison
+        diff_chars = sum(1 for i in range(min_len) if s1[i] != s2[i])
+        edit_ratio = 1.0 - (diff_chars + length_difference) / max(max_len, 1)
+    else:
+        # Calculate edit distance (Levenshtein distance)
+        # This measures how many single-character edits are needed to change one string into the other
+        try:
+            max_distance = None
+            if threshold is not None:
+                max_distance = edit_distance_cutoff(basic_ratio, position_ratio, max_len, threshold)
+            if max_distance == -1:
+                # The weighted ratio cannot reach the threshold whatever the distance is
+                edit_distance = max_len
+                path = PATH_EDIT_CUTOFF
+            else:
+                edit_distance = levenshtein(s1, s2, max_distance)
+            edit_ratio = 1 - (edit_distance / max(len(s1), len(s2)))
+        except Exception:  # Fall back if there's any issue
+            edit_ratio = basic_ratio
+
+    # Special case: Exact same string with just a few characters different
+    if len(s1) == len(s2):
+        diff_chars = sum(1 for i in range(len(s1)) if s1[i] != s2[i])
+        # Only boost if just 1-2 character differences in reasonably sized strings
+        if diff_chars <= 2 and len(s1) >= 4:
+            return max(basic_ratio, 0.7), PATH_SAME_LENGTH
+
+    # Special case: One string is almost a complete substring of the other
+    # This helps with cases like "filename" and "filename1" or "file" and "file_old"
+    if len(s1) < len(s2) and s2.startswith(s1) and len(s2) - len(s1) <= 5:
+        return max(0.7, basic_ratio), PATH_SUBSTRING
+    elif len(s2) < len(s1) and s1.startswith(s2) and len(s1) - len(s2) <= 5:
+        return max(0.7, basic_ratio), PATH_SUBSTRING
+
+    # Weigh the different metrics (experimentally determined)
+    # Give more weight to edit distance which catches cursor/kursor type matches better
+    final_ratio = (basic_ratio * 0.3) + (position_ratio * 0.3) + (edit_ratio * 0.4)
+
+    # The threshold should filter out matches like "Cursor" and "Curolos"
+    return final_ratio, path
+
+
+def score_bound(basic_bound, position_bound, edit_bound, boosted):
+    """
+    Upper bound on the score of a pair, from upper bounds on its
+    SequenceMatcher, position and edit ratios. boosted tells whether the
+    same length or substring special case may apply (they score at least 0.7).
+    """
+    bound = max(basic_bound, 0.3 * basic_bound + 0.3 * position_bound + 0.4 * edit_bound)
+    return max(bound, 0.7) if boosted else bound
+
+
+def shared_characters(s1, s2):
+    """Number of characters two strings have in common, counting repeats"""
+    return sum((Counter(s1) & Counter(s2)).values())
+
+
+def score_with_bounds(str1, str2, threshold):
+    """
+    Return (score, path) like score_with_path(str1, str2, threshold), but
+    try cheap upper bounds on the score first and stop as soon as one shows
+    the pair cannot reach threshold. A rejected pair gets that bound (which
+    is below threshold) as its score and the BOUND_PATHS entry of the bound
+    as its path. Which pairs reach threshold, and their scores, are exactly
+    those of calculate_similarity.
+    """
+    return score_folded_with_bounds(str1.lower(), str2.lower(), threshold)
+
+
+def score_folded_with_bounds(s1, s2, threshold, shared=None, ratio=None, prefix_digits=None):
+    """
+    score_with_bounds for two names that are already lowercase. shared, if
+    given, is called to get shared_characters(s1, s2) (e.g. from character
+    histograms computed once per name); ratio and prefix_digits are passed
+    on to score_folded.
+    """
+    if prefix_digits is None:
+        prefix_digits = is_prefix_plus_numbers(s1, s2)
+    len1, len2 = len(s1), len(s2)
+    min_len, max_len = min(len1, len2), max(len1, len2)
+    if prefix_digits or abs(len1 - len2) > min_len // 2 or max_len == 0:
+        return score_folded(s1, s2, threshold, ratio, prefix_digits)
+    limit = threshold - BOUND_EPSILON
+
+    # A short suffix added always scores at least 0.7, see score_folded
+    if len1 < len2:
+        substring = s2.startswith(s1) and len2 - len1 <= 5
+    else:
+        substring = len2 < len1 and s1.startswith(s2) and len1 - len2 <= 5
+    same_length = len1 == len2 and len1 >= 4
+
+    # Lengths only: at most min_len characters are shared. Both the position
+    # ratio and the edit ratio are at most shared characters / max_len (the
+    # edit distance is at least max_len minus the shared characters)
+    bound = score_bound(2.0 * min_len / (len1 + len2), min_len / max_len, min_len / max_len,
+                        substring or same_length)
+    if bound < limit:
+        return bound, PATH_REAL_QUICK_BOUND
+
+    # Shared characters; one or two replaced characters leave at least len - 2
+    common = shared() if shared is not None else shared_characters(s1, s2)
+    bound = score_bound(2.0 * common / (len1 + len2), common / max_len, common / max_len,
+                        substring or (same_length and common >= len1 - 2))
+    if bound < limit:
+        return bound, PATH_QUICK_BOUND
+
+    # Characters in the same positions; for short names the edit ratio is
+    # exactly the position ratio
+    position_matches = sum(1 for i in range(min_len) if s1[i] == s2[i])
+    position_ratio = position_matches / max_len
+    edit_bound = position_ratio if max_len < 10 else common / max_len
+    bound = score_bound(2.0 * common / (len1 + len2), position_ratio, edit_bound,
+                        substring or (same_length and position_matches >= len1 - 2))
+    if bound < limit:
+        return bound, PATH_POSITION_BOUND
+
+    return score_folded(s1, s2, threshold, ratio, prefix_digits)
+
+
+def make_scorer(threshold, cache=None, stats=None, table=None):
+    """
+    Return the function used to score pairs during a scan.
+    With a ScoreCache the exact scores are looked up or stored in it,
+    otherwise pairs are scored with score_with_bounds, so pairs that cannot
+    reach the threshold are rejected as early as possible.
+    With a ScanStats every pair is counted by the path that decided it and
+    the time spent scoring is recorded; without one nothing is counted.
+    Names are prepared once in a NameTable (a new one unless table is given).
+    """
+    from .names import NameTable
+    if table is None:
+        table = NameTable()
+    record = table.record
+    score_records = table.score_records
+    bounded_records = table.bounded_records
+
+    if stats is None:
+        if cache is None:
+            return lambda str1, str2: bounded_records(record(str1), record(str2), threshold)[0]
+
+        def cached_score(str1, str2):
+            record1, record2 = record(str1), record(str2)
+            key = (record1.folded, record2.folded)
+            value = cache.get(key)
+            if value is None:
+                # Cached scores must be exact, so the threshold is not used
+                value = score_records(record1, record2)[0]
+                cache.put(key, value)
+            return value
+
+        return cached_score
+
+    clock = time.perf_counter
+
+    def score(str1, str2):
+        start = clock()
+        record1, record2 = record(str1), record(str2)
+        if cache is not None:
+            key = (record1.folded, record2.folded)
+            value = cache.get(key)
+            if value is not None:
+                stats.count_pair(CACHED, value < threshold)
+                stats.add_time(SCORING, clock() - start)
+                return value
+            # Cached scores must be exact, so the threshold is not used
+            value, path = score_records(record1, record2)
+            cache.put(key, value)
+        else:
+            value, path = bounded_records(record1, record2, threshold)
+        stats.count_pair(path, value < threshold)
+        stats.add_time(SCORING, clock() - start)
+        return value
+
+    return score
+
+
+def is_item(entry):
+    """Whether a DirEntry is a folder or file (following symlinks, like os.path.isdir/isfile)"""
+    try:
+        return entry.is_dir() or entry.is_file()
+    except OSError:
+        return False
+
+
+def list_items(directory):
+    """
+    Return the names of all folders and files directly inside directory.
+    os.scandir provides the entry types along with the names, so no extra
+    stat call is needed per entry on most platforms.
+    """
+    with os.scandir(directory) as entries:
+        return [entry.name for entry in entries if is_item(entry)]
+
+
+def iter_directories(root):
+    """
+    Walk the whole tree under root, yielding (relative_dir, names) for each
+    directory as soon as it has been listed; relative_dir is "" for root.
+    Only the directories still waiting to be listed are kept in memory.
+    Symlinked folders are listed as items but not descended into, and
+    subdirectories that cannot be read are skipped.
+    """
+    pending = [""]
+    while pending:
+        relative = pending.pop()
+        path = os.path.join(root, relative) if relative else root
+        names = []
+        subdirs = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if not is_item(entry):
+                        continue
+                    names.append(entry.name)
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(os.path.join(relative, entry.name))
+                    except OSError:
+                        pass
+        except OSError:
+            if not relative:
+                raise
+            continue
+
+        yield relative, names
+        # Visit subdirectories in listing order
+        pending.extend(reversed(subdirs))
+
+
+def make_candidate_index(items, threshold, method):
+    """Build the candidate index for a scan method (None means every pair is scored)"""
+    if method not in SCAN_METHODS:
+        raise ValueError(f"Unknown scan method: {method}")
+
+    # Every pair reaches a threshold of zero, so there is nothing to prune
+    if method == "qgram" and threshold > 0:
+        return QGramIndex(items, threshold)
+    if method == "length" and threshold > 0:
+        return LengthIndex(items)
+    return None
+
+
+def find_similar_groups(items, threshold=DEFAULT_THRESHOLD, method="qgram", cache=None,
+                        workers=1, stats=None, linkage=None):
+    """Return the list of groups of similar items (see iter_similar_groups)"""
+    return list(iter_similar_groups(items, threshold, method, cache, workers, stats=stats,
+                                    linkage=linkage))
+
+
+def iter_similar_groups(items, threshold=DEFAULT_THRESHOLD, method="qgram", cache=None,
+                        workers=1, cancel=None, progress=None, stats=None, linkage=None):
+    """
+    Group similar names together, yielding each group as soon as it is found.
+    Each unprocessed item becomes the seed of a group that collects every
+    other unprocessed item similar to it. Only groups with at least two
+    items are yielded.
+
+    These greedy groups depend on the order of items. With a linkage (one of
+    graph.LINKAGES) the groups are derived from the similarity graph of the
+    items instead and do not depend on their order; each is yielded as soon
+    as its part of the graph is complete (see SimilarityGraph.iter_build).
+
+    method selects how the other items are found for each seed:
+    "qgram" only scores candidates from a q-gram index (see candidates.py),
+    "length" scores every pair inside the allowed length window plus the
+    prefix plus digits pairs, "numpy" scores each seed against all names at
+    once with array operations (see vectorized.py, needs NumPy) and
+    "exhaustive" scores every pair and is kept for verification. All of them
+    give exactly the same groups.
+
+    If a ScoreCache is given, scores of pairs seen in earlier scans are
+    reused instead of being computed again. The numpy method does not use it.
+
+    workers > 1 (or None for one per CPU) scores the pairs in a process pool
+    once there are at least PARALLEL_MIN_ITEMS items; smaller scans stay
+    serial because starting the processes would cost more than it saves.
+    The pool does not use the score cache, and it gives the same groups.
+
+    cancel is an optional threading.Event that stops the scan early, and
+    progress an optional callback called as progress(done, total) every
+    PROGRESS_INTERVAL seeds.
+
+    stats is an optional ScanStats that receives the indexing, scoring and
+    grouping times and the pair counts. The numpy method and the process
+    pool score pairs in bulk; their time is recorded as scoring and their
+    pairs are not counted.
+    """
+    if linkage is not None:
+        from .graph import SimilarityGraph
+        graph = SimilarityGraph(items, threshold)
+        yield from graph.iter_build(method, cache, workers, cancel, progress, stats, linkage)
+        return
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    bulk = None
+    if method == "numpy" and threshold > 0:
+        from .vectorized import iter_similar_groups_numpy
+        bulk = iter_similar_groups_numpy(items, threshold, cancel, progress)
+    elif workers > 1 and len(items) >= PARALLEL_MIN_ITEMS:
+        from .parallel import iter_similar_groups_parallel
+        bulk = iter_similar_groups_parallel(items, threshold, method, workers, cancel, progress)
+    if bulk is not None:
+        if stats is None:
+            yield from bulk
+            return
+        clock = PhaseClock(stats, SCORING)
+        for group in bulk:
+            clock.stop()
+            yield group
+            clock.start()
+        clock.stop()
+        return
+
+    with timed(stats, INDEXING):
+        index = make_candidate_index(items, threshold, method)
+
+    score = make_scorer(threshold, cache, stats)
+    # Time spent grouping, without the scoring inside it
+    clock = PhaseClock(stats, GROUPING, nested=(SCORING,)) if stats is not None else None
+    processed = set()
+    for i, item1 in enumerate(items):
+        if i % PROGRESS_INTERVAL == 0:
+            if cancel is not None and cancel.is_set():
+                return
+            if progress is not None:
+                progress(i, len(items))
+
+        if item1 in processed:
+            continue
+
+        others = index.candidates(i) if index else range(len(items))
+        group = [item1]
+        for j in others:
+            item2 = items[j]
+            if i != j and item2 not in processed:
+                similarity = score(item1, item2)
+                if similarity >= threshold:
+                    group.append(item2)
+                    processed.add(item2)
+
+        if len(group) > 1:  # Only add groups with multiple similar items
+            processed.add(item1)
+            if clock is not None:
+                clock.stop()
+                yield group
+                clock.start()
+            else:
+                yield group
+    if clock is not None:
+        clock.stop()
+
+
+def update_groups(groups, all_items, changed_items, threshold=DEFAULT_THRESHOLD, cache=None,
+                  stats=None):
+    """
+    Update existing groups for a set of changed item names.
+    Returns the new list of groups and whether anything changed.
+    stats is an optional ScanStats (see iter_similar_groups).
+    """
+    score = make_scorer(threshold, cache, stats)
+    clock = PhaseClock(stats, GROUPING, nested=(SCORING,)) if stats is not None else None
+
+    # Initialize group_updates to track whether the groups changed
+    group_updates = False
+
+    # Update existing similar groups if they contain any changed items
+    updated_groups = []
+    seeds = set()  # First item of every group in updated_groups
+    grouped = set()  # Every item in updated_groups
+    still_exists = set(all_items)  # Track items that still exist
+
+    # First pass: Update existing groups and identify items that no longer exist
+    for group in groups:
+        group_contains_changes = False
+        updated_group = []
+
+        for item in group:
+            if item in still_exists:
+                updated_group.append(item)
+                if item in changed_items:
+                    group_contains_changes = True
+            else:
+                # Item no longer exists
+                group_updates = True
+
+        # If the group contains changed items or lost items, recalculate similarities
+        if group_contains_changes or len(updated_group) != len(group):
+            # Group needs recalculation
+            group_updates = True
+            # Skip empty groups
+            if len(updated_group) <= 1:
+                continue
+
+            # Recalculate group similarities
+            seed_item = updated_group[0]
+            new_group = [seed_item]
+
+            for item in all_items:
+                if item != seed_item and item not in seeds:
+                    similarity = score(seed_item, item)
+                    if similarity >= threshold:
+                        new_group.append(item)
+
+            if len(new_group) > 1:
+                updated_groups.append(new_group)
+                seeds.add(seed_item)
+                grouped.update(new_group)
+        else:
+            # Group unchanged, keep as is
+            updated_groups.append(updated_group)
+            if updated_group:
+                seeds.add(updated_group[0])
+                grouped.update(updated_group)
+
+    # Second pass: Check if changed items form new groups
+    for changed_item in changed_items:
+        # Skip if item is already in a group
+        if changed_item in grouped:
+            continue
+
+        # Check if this changed item forms a new group
+        if changed_item in still_exists:
+            group = [changed_item]
+            for item in all_items:
+                if item != changed_item and item not in seeds:
+                    similarity = score(changed_item, item)
+                    if similarity >= threshold:
+                        group.append(item)
+
+            if len(group) > 1:
+                updated_groups.append(group)
+                seeds.add(changed_item)
+                grouped.update(group)
+                group_updates = True
+
+    if clock is not None:
+        clock.stop()
+    return updated_groups, group_updates
+
+
+def iter_tree_groups(root, threshold=DEFAULT_THRESHOLD, method="qgram", cache=None,
+                     workers=1, cancel=None, progress=None, stats=None, linkage=None):
+    """
+    Yield the groups of similar items of every directory in the tree under
+    root. Names are only compared within their own directory, and each
+    directory is grouped as soon as it has been listed. Items are yielded as
+    paths relative to root.
+    progress, if given, is called as progress(directories_done, None).
+    stats and linkage are passed on to iter_similar_groups.
+    """
+    directories = iter_directories(root)
+    done = 0
+    while True:
+        with timed(stats, LISTING):
+            listed = next(directories, None)
+        if listed is None:
+            return
+        relative, names = listed
+        done += 1
+        if cancel is not None and cancel.is_set():
+            return
+        for group in iter_similar_groups(names, threshold, method, cache, workers, cancel,
+                                         stats=stats, linkage=linkage):
+            yield [os.path.join(relative, name) for name in group] if relative else group
+        if progress is not None:
+            progress(done, None)
+
+
+def scan_directory(directory, threshold=DEFAULT_THRESHOLD, method="qgram", cache=None,
+                   workers=1, stats=None, linkage=None):
+    """List a directory and return its groups of similar items"""
+    with timed(stats, LISTING):
+        items = list_items(directory)
+    groups = find_similar_groups(items, threshold, method, cache, workers, stats, linkage)
+    logger.debug("Scanned %s: %d items, %d groups", directory, len(items), len(groups))
+    return groups
+
+
+def scan_tree(root, threshold=DEFAULT_THRESHOLD, method="qgram", cache=None, workers=1,
+              stats=None, linkage=None):
+    """Return the groups of similar items of every directory under root"""
+    return list(iter_tree_groups(root, threshold, method, cache, workers, stats=stats,
+                                 linkage=linkage))
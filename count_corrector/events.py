@@ -0,0 +1,117 @@
+"""
+Coalescing of file system events.
+
+File watchers report every single create, modify, delete and move, and a
+git checkout or an unzip easily produces tens of thousands of them.
+EventCoalescer collects them from the watcher thread and keeps only the net
+change of each path, so the UI can pick them up from its own thread and
+handle a whole burst as one update.
+"""
+import threading
+import time
+
+CREATED = "created"
+DELETED = "deleted"
+MODIFIED = "modified"
+
+# Wait until no event arrived for this many seconds...
+DEFAULT_DEBOUNCE = 0.5
+# ...but never hold changes back longer than this many seconds
+DEFAULT_MAX_LATENCY = 3.0
+# Distinct paths kept before giving up and asking for a full rescan
+DEFAULT_MAX_PATHS = 10000
+
+
+class EventCoalescer:
+    """
+    Thread-safe, bounded collection of file system changes.
+
+    For every path only whether it existed before the first event and
+    whether it exists after the last one is kept, so a create followed by
+    modifies and a delete cancels out. When more than max_paths distinct
+    paths changed, the individual paths are dropped and the batch is marked
+    as overflowed; the consumer should then rescan everything.
+    """
+
+    def __init__(self, debounce=DEFAULT_DEBOUNCE, max_latency=DEFAULT_MAX_LATENCY,
+                 max_paths=DEFAULT_MAX_PATHS):
+        self.debounce = debounce
+        self.max_latency = max_latency
+        self.max_paths = max_paths
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.states = {}  # path -> [existed_before, exists_now]
+        self.overflowed = False
+        self.first_event = None
+        self.last_event = None
+        self.event_count = 0
+
+    def _record(self, path, existed_before, exists_now):
+        state = self.states.get(path)
+        if state is not None:
+            state[1] = exists_now
+        elif not self.overflowed:
+            if len(self.states) >= self.max_paths:
+                self.overflowed = True
+                self.states.clear()
+            else:
+                self.states[path] = [existed_before, exists_now]
+
+    def add(self, kind, path, dest_path=None):
+        """
+        Record one event (called from the watcher thread). kind is one of
+        "created", "deleted", "modified" or "moved"; moves need dest_path.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if self.first_event is None:
+                self.first_event = now
+            self.last_event = now
+            self.event_count += 1
+
+            if kind == CREATED:
+                self._record(path, False, True)
+            elif kind == DELETED:
+                self._record(path, True, False)
+            elif kind == "moved":
+                self._record(path, True, False)
+                if dest_path is not None:
+                    self._record(dest_path, False, True)
+            else:
+                self._record(path, True, True)
+
+    def pending(self):
+        """Whether any event is waiting to be drained"""
+        with self.lock:
+            return self.first_event is not None
+
+    def due(self, now=None):
+        """Whether the pending events should be handled now"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if self.first_event is None:
+                return False
+            return (now - self.last_event >= self.debounce or
+                    now - self.first_event >= self.max_latency)
+
+    def drain(self):
+        """
+        Take the collected changes. Returns (changes, overflowed, event_count)
+        where changes maps each path to its net change ("created", "deleted"
+        or "modified"); paths that were created and deleted again are left out.
+        """
+        with self.lock:
+            states, overflowed, event_count = self.states, self.overflowed, self.event_count
+            self._reset()
+
+        changes = {}
+        for path, (existed_before, exists_now) in states.items():
+            if existed_before and exists_now:
+                changes[path] = MODIFIED
+            elif exists_now:
+                changes[path] = CREATED
+            elif existed_before:
+                changes[path] = DELETED
+        return changes, overflowed, event_count
@@ -0,0 +1,469 @@
+"""
+Sparse similarity graph of a directory listing.
+
+iter_similar_groups groups names greedily: the first unprocessed name in
+listing order collects every unprocessed name similar to it, so the groups
+depend on the order the directory happens to be listed in. A
+SimilarityGraph instead scores every candidate pair once and keeps the pairs
+that reach the threshold as weighted edges. calculate_similarity is not
+quite symmetric, so a pair is always scored with the name that comes first
+in a fixed name order as the seed (see ordered_pair). Groups are then
+derived from the graph alone:
+
+- "single": connected components, every name is similar to at least one
+  other name of its group (what ClusterIndex maintains incrementally)
+- "complete": every pair of names in a group is similar
+- "average": the average score over all pairs of names in a group (pairs
+  without an edge count as 0) reaches the threshold
+
+Names are numbered in a fixed sorted order, so the graph and the groups are
+the same whatever order the names come in and on every platform. The graph
+can be kept and reused (e.g. to build a ClusterIndex, or to group at a
+higher threshold) without scoring any pair again. While a graph is being
+built, iter_build already yields the groups of every part of it that is
+complete, so a scan can show groups long before its last pair is scored.
+
+Built at a low floor, a graph answers any higher threshold at once. Its
+edges are kept in a score-sorted list, and single and complete linkage
+merge clusters in order of decreasing score, so the merges of a full run
+at the floor are recorded once: the groups at a threshold are the merges
+that reach it, replayed with a union-find in time linear in the names.
+Average linkage counts pairs below the threshold as 0, so its merges
+depend on the threshold and it is clustered again for each one.
+"""
+import bisect
+import heapq
+import os
+
+from .candidates import NameIndex
+from .engine import (
+    DEFAULT_THRESHOLD,
+    PARALLEL_MIN_ITEMS,
+    PROGRESS_INTERVAL,
+    make_candidate_index,
+    make_scorer,
+)
+from .stats import GROUPING, INDEXING, SCORING, PhaseClock, timed
+
+# Ways groups can be derived from a SimilarityGraph
+LINKAGES = ("single", "complete", "average")
+DEFAULT_LINKAGE = "single"
+
+
+def graph_floor(threshold, floor=None):
+    """Threshold of the graph kept for grouping at threshold, optionally built down to floor"""
+    return threshold if floor is None else min(threshold, floor)
+
+
+def name_order_key(name):
+    """Sort key of the fixed name order: case-insensitive, then by code point"""
+    return (name.lower(), name)
+
+
+def ordered_pair(name1, name2):
+    """The two names in name order, which is the order a pair is scored in"""
+    return (name1, name2) if name_order_key(name1) <= name_order_key(name2) else (name2, name1)
+
+
+class SimilarityGraph:
+    """
+    Names (in name_order_key order) and the weighted edges between the pairs
+    whose score (see ordered_pair) reaches threshold. Nodes are the
+    positions of the names in self.names; adjacency[node] maps each neighbor
+    to the edge weight.
+    """
+
+    def __init__(self, names, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.names = sorted(set(names), key=name_order_key)
+        self.node_of = {name: node for node, name in enumerate(self.names)}
+        self.adjacency = [{} for _ in self.names]
+        # False if the scan building the graph was cancelled
+        self.complete = True
+        self._sorted_edges = None
+        self._merges = {}  # linkage -> (negated merge scores, merged node pairs), both sorted
+
+    @classmethod
+    def build(cls, names, threshold=DEFAULT_THRESHOLD, method="qgram", cache=None, workers=1,
+              cancel=None, progress=None, stats=None):
+        """
+        Score the candidate pairs of names (see engine.iter_similar_groups for
+        the arguments) and return the graph. If cancel is set before every
+        pair has been scored, the graph is returned with complete set to False.
+        """
+        graph = cls(names, threshold)
+        for _ in graph.iter_build(method, cache, workers, cancel, progress, stats):
+            pass
+        return graph
+
+    def iter_build(self, method="qgram", cache=None, workers=1, cancel=None, progress=None,
+                   stats=None, linkage=None, threshold=None):
+        """
+        Score the candidate pairs of the names into this graph (see build).
+        With a linkage the groups at threshold (by default the graph's own)
+        are yielded while the pairs are being scored: every name is scored
+        against the names after it in name order, so once the last name of a
+        connected component has been scored, no pair left can touch it and
+        its groups are final. Groups come out ordered by the last name of
+        their component; a cancelled scan yields only the final ones.
+        """
+        if linkage is not None and linkage not in LINKAGES:
+            raise ValueError(f"Unknown linkage: {linkage}")
+        threshold = self.threshold if threshold is None else max(threshold, self.threshold)
+        edges = self._iter_edges(method, cache, workers, cancel, progress, stats)
+        clock = PhaseClock(stats, GROUPING, nested=(SCORING, INDEXING)) if stats is not None else None
+        # Connected components at threshold: union-find parents, the nodes and
+        # the highest node of each root, and a heap of (highest node, root)
+        parent = list(range(len(self.names)))
+        members = {}
+        highest = {}
+        last = []
+        for node1, node2, weight in edges:
+            if last and last[0][0] < node1:
+                groups = self._finished_groups(members, highest, last, node1, linkage, threshold)
+                if clock is not None:
+                    clock.stop()
+                yield from groups
+                if clock is not None:
+                    clock.start()
+            self.link(node1, node2, weight)
+            if linkage is None or weight < threshold:
+                continue
+            root1, root2 = _find(parent, node1), _find(parent, node2)
+            if root1 == root2:
+                continue
+            root, other = min(root1, root2), max(root1, root2)
+            parent[other] = root
+            nodes, other_nodes = members.pop(root, [root]), members.pop(other, [other])
+            if len(nodes) < len(other_nodes):
+                nodes, other_nodes = other_nodes, nodes
+            nodes.extend(other_nodes)
+            members[root] = nodes
+            highest[root] = max(highest.get(root, root), highest.pop(other, other))
+            heapq.heappush(last, (highest[root], root))
+        if cancel is not None and cancel.is_set():
+            self.complete = False
+        groups = []
+        if self.complete:
+            groups = self._finished_groups(members, highest, last, len(self.names), linkage, threshold)
+        if clock is not None:
+            clock.stop()
+        yield from groups
+
+    def _finished_groups(self, members, highest, last, before, linkage, threshold):
+        """
+        Take the components (see iter_build) whose highest node is below
+        before off the heap and return their groups
+        """
+        names = self.names
+        groups = []
+        while last and last[0][0] < before:
+            top, root = heapq.heappop(last)
+            if highest.get(root) != top:
+                continue  # The component grew (or merged into another) since this entry was pushed
+            del highest[root]
+            component = sorted(members.pop(root))
+            if linkage == "single":
+                clusters = [component]
+            else:
+                clusters = sorted(cluster for cluster in self._agglomerate(component, threshold, linkage)
+                                  if len(cluster) > 1)
+            groups.extend([names[node] for node in cluster] for cluster in clusters)
+        return groups
+
+    @classmethod
+    def from_edges(cls, names, edges, threshold=DEFAULT_THRESHOLD):
+        """Return the graph of names with the given (name1, name2, weight) edges, without scoring"""
+        graph = cls(names, threshold)
+        node_of = graph.node_of
+        for name1, name2, weight in edges:
+            graph.link(node_of[name1], node_of[name2], weight)
+        return graph
+
+    def _iter_edges(self, method, cache, workers, cancel, progress, stats):
+        """Yield (node1, node2, weight) for every edge, node1 < node2"""
+        names = self.names
+        threshold = self.threshold
+        if workers is None:
+            workers = os.cpu_count() or 1
+        bulk = None
+        if method == "numpy" and threshold > 0:
+            from .vectorized import iter_graph_edges_numpy
+            bulk = iter_graph_edges_numpy(names, threshold, cancel, progress)
+        elif workers > 1 and len(names) >= PARALLEL_MIN_ITEMS:
+            from .parallel import iter_graph_edges_parallel
+            bulk = iter_graph_edges_parallel(names, threshold, method, workers, cancel, progress)
+        if bulk is not None:
+            # Scored in bulk, like the numpy and process pool scans
+            if stats is None:
+                yield from bulk
+                return
+            clock = PhaseClock(stats, SCORING)
+            for edge in bulk:
+                clock.stop()
+                yield edge
+                clock.start()
+            clock.stop()
+            return
+
+        with timed(stats, INDEXING):
+            index = make_candidate_index(names, threshold, method)
+        score = make_scorer(threshold, cache, stats)
+        count = len(names)
+        for node, name in enumerate(names):
+            if node % PROGRESS_INTERVAL == 0:
+                if cancel is not None and cancel.is_set():
+                    return
+                if progress is not None:
+                    progress(node, count)
+            others = index.candidates(node) if index else range(node + 1, count)
+            for other in others:
+                if other <= node:
+                    continue
+                weight = score(name, names[other])
+                if weight >= threshold:
+                    yield node, other, weight
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.node_of
+
+    def link(self, node1, node2, weight):
+        self.adjacency[node1][node2] = weight
+        self.adjacency[node2][node1] = weight
+        self._sorted_edges = None
+        self._merges.clear()
+
+    def edge_count(self):
+        return sum(len(neighbors) for neighbors in self.adjacency) // 2
+
+    def edges(self):
+        """Yield (name1, name2, weight) for every edge, in name order"""
+        names = self.names
+        for node, neighbors in enumerate(self.adjacency):
+            for other in sorted(neighbors):
+                if other > node:
+                    yield names[node], names[other], neighbors[other]
+
+    def sorted_edges(self):
+        """
+        Return [(weight, node1, node2), ...] for every edge, node1 < node2, by
+        decreasing weight (then by node). Computed once and kept.
+        """
+        if self._sorted_edges is None:
+            edges = [(weight, node, other) for node, neighbors in enumerate(self.adjacency)
+                     for other, weight in neighbors.items() if other > node]
+            edges.sort(key=lambda edge: (-edge[0], edge[1], edge[2]))
+            self._sorted_edges = edges
+        return self._sorted_edges
+
+    def weight(self, name1, name2):
+        """The edge weight between two names, or None if they are not similar"""
+        node1, node2 = self.node_of.get(name1), self.node_of.get(name2)
+        if node1 is None or node2 is None:
+            return None
+        return self.adjacency[node1].get(node2)
+
+    def neighbors(self, name):
+        """Return {neighbor name: weight} of a name"""
+        names = self.names
+        return {names[other]: weight for other, weight in self.adjacency[self.node_of[name]].items()}
+
+    def components(self, threshold=None):
+        """
+        Return the connected components with at least two nodes, using only
+        the edges that reach threshold (at least the graph's own threshold).
+        """
+        threshold = self.threshold if threshold is None else max(threshold, self.threshold)
+        adjacency = self.adjacency
+        seen = [False] * len(adjacency)
+        components = []
+        for start, neighbors in enumerate(adjacency):
+            if seen[start] or not neighbors:
+                continue
+            seen[start] = True
+            component = [start]
+            stack = [start]
+            while stack:
+                node = stack.pop()
+                for other, weight in adjacency[node].items():
+                    if not seen[other] and weight >= threshold:
+                        seen[other] = True
+                        component.append(other)
+                        stack.append(other)
+            if len(component) > 1:
+                components.append(sorted(component))
+        return components
+
+    def groups(self, linkage=DEFAULT_LINKAGE, threshold=None):
+        """
+        Return the groups of similar names (lists of at least two names) for
+        one of the LINKAGES, at threshold (by default the graph's own; lower
+        thresholds are not possible as those pairs were never kept). Groups
+        are listed in name order, and so are the names inside each group.
+        """
+        if linkage not in LINKAGES:
+            raise ValueError(f"Unknown linkage: {linkage}")
+        threshold = self.threshold if threshold is None else max(threshold, self.threshold)
+        if linkage == "average":
+            clusters = []
+            for component in self.cut("single", threshold):
+                clusters.extend(cluster for cluster in self._agglomerate(component, threshold, linkage)
+                                if len(cluster) > 1)
+        else:
+            clusters = self.cut(linkage, threshold)
+        clusters.sort()
+        names = self.names
+        return [[names[node] for node in cluster] for cluster in clusters]
+
+    def merges(self, linkage):
+        """
+        Return (scores, pairs): the merges a full single or complete linkage
+        run at the graph's threshold makes, by decreasing score. scores holds
+        the negated merge scores (ascending, for bisect) and pairs a node of
+        each of the two merged clusters. Computed once per linkage and kept.
+        """
+        found = self._merges.get(linkage)
+        if found is None:
+            if linkage == "single":
+                # Kruskal: the edges that join two components, strongest first
+                parent = list(range(len(self.names)))
+                merged = []
+                for weight, node1, node2 in self.sorted_edges():
+                    root1, root2 = _find(parent, node1), _find(parent, node2)
+                    if root1 != root2:
+                        parent[max(root1, root2)] = min(root1, root2)
+                        merged.append((weight, node1, node2))
+            elif linkage == "complete":
+                merged = []
+                for component in self.components():
+                    self._agglomerate(component, self.threshold, linkage, merged)
+                merged.sort(key=lambda merge: (-merge[0], merge[1], merge[2]))
+            else:
+                raise ValueError(f"No threshold independent merges for linkage: {linkage}")
+            found = self._merges[linkage] = ([-weight for weight, _, _ in merged],
+                                             [(node1, node2) for _, node1, node2 in merged])
+        return found
+
+    def cut(self, linkage, threshold):
+        """
+        Return the clusters (sorted node lists, at least two nodes each) of a
+        single or complete linkage run at threshold, by replaying the
+        recorded merges that reach it
+        """
+        scores, pairs = self.merges(linkage)
+        parent = list(range(len(self.names)))
+        for node1, node2 in pairs[:bisect.bisect_right(scores, -threshold)]:
+            root1, root2 = _find(parent, node1), _find(parent, node2)
+            if root1 != root2:
+                parent[max(root1, root2)] = min(root1, root2)
+        members = {}
+        for node in range(len(parent)):
+            root = _find(parent, node)
+            if root != node:
+                # Roots are the lowest node of their cluster, so the lists come out sorted
+                members.setdefault(root, [root]).append(node)
+        return list(members.values())
+
+    def _agglomerate(self, component, threshold, linkage, merged=None):
+        """
+        Agglomerative clustering of one component: starting from single
+        nodes, the two clusters with the highest linkage score merge as long
+        as it reaches threshold. Only clusters joined by an edge are ever
+        compared, so the cost follows the edges and not the squared size of
+        the component. Ties go to the clusters with the lowest nodes. Each
+        merge is appended to merged (if given) as (score, node1, node2).
+        """
+        adjacency = self.adjacency
+        members = {node: [node] for node in component}  # cluster id (lowest node) -> nodes
+        # links[a][b] = [sum of edge weights, edge count, lowest weight] between clusters a and b
+        links = {node: {} for node in component}
+        for node in component:
+            for other, weight in adjacency[node].items():
+                if weight >= threshold:
+                    links[node][other] = [weight, 1, weight]
+
+        def score(cluster1, cluster2, link):
+            total, count, lowest = link
+            pairs = len(members[cluster1]) * len(members[cluster2])
+            if linkage == "complete":
+                # Every pair must be an edge, a missing one scores below threshold
+                return lowest if count == pairs else None
+            return total / pairs
+
+        heap = []
+        for node in component:
+            for other, link in links[node].items():
+                if node < other:
+                    heap.append((-link[0], node, other))
+        heapq.heapify(heap)
+
+        while heap:
+            negative, cluster1, cluster2 = heapq.heappop(heap)
+            link = links.get(cluster1, {}).get(cluster2)
+            if link is None or score(cluster1, cluster2, link) != -negative:
+                continue  # One of the clusters merged since this entry was pushed
+            # The merged cluster keeps the lower id; cluster1 < cluster2 always
+            if merged is not None:
+                merged.append((-negative, cluster1, cluster2))
+            members[cluster1].extend(members.pop(cluster2))
+            del links[cluster1][cluster2]
+            for other, other_link in links.pop(cluster2).items():
+                if other == cluster1:
+                    continue
+                del links[other][cluster2]
+                existing = links[cluster1].get(other)
+                if existing is not None:
+                    other_link = [existing[0] + other_link[0], existing[1] + other_link[1],
+                                  min(existing[2], other_link[2])]
+                links[cluster1][other] = links[other][cluster1] = other_link
+            for other, other_link in links[cluster1].items():
+                value = score(cluster1, other, other_link)
+                if value is not None and value >= threshold:
+                    heapq.heappush(heap, (-value, min(cluster1, other), max(cluster1, other)))
+        return [sorted(nodes) for nodes in members.values()]
+
+
+def _find(parent, node):
+    """Root of node in a union-find parent list, with path halving"""
+    while parent[node] != node:
+        parent[node] = parent[parent[node]]
+        node = parent[node]
+    return node
+
+
+def update_graph(graph, names, changed, cache=None, stats=None):
+    """
+    Return the SimilarityGraph of names, reusing graph (made from an earlier
+    listing with the same threshold): edges between unchanged names are kept
+    as they are and only the changed names that still exist are scored,
+    against their candidates among names.
+    """
+    threshold = graph.threshold
+    changed = set(changed)
+    existing = set(names)
+    edges = [(name1, name2, weight) for name1, name2, weight in graph.edges()
+             if name1 not in changed and name2 not in changed
+             and name1 in existing and name2 in existing]
+
+    with timed(stats, INDEXING):
+        index = NameIndex(threshold, names)
+        for name in names:
+            index.add(name)
+    score = make_scorer(threshold, cache, stats)
+    clock = PhaseClock(stats, GROUPING, nested=(SCORING,)) if stats is not None else None
+    for name in sorted(changed & existing, key=name_order_key):
+        for other in index.candidates(name):
+            # Pairs of two changed names are scored once, from the first of them
+            if other in changed and name_order_key(other) < name_order_key(name):
+                continue
+            first, second = ordered_pair(name, other)
+            weight = score(first, second)
+            if weight >= threshold:
+                edges.append((first, second, weight))
+    updated = SimilarityGraph.from_edges(names, edges, threshold)
+    if clock is not None:
+        clock.stop()
+    return updated
@@ -0,0 +1,271 @@
+"""
+On-disk scan index.
+
+The listing of each scanned directory (every entry's type, mtime and size)
+and the groups found in it (plus the similarity graph they were derived
+from, for scans with a linkage) are kept in a small SQLite database. The
+app can show the last results as soon as it starts, and a rescan only has
+to score the entries whose metadata changed since the stored snapshot.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import closing
+
+from .cache import default_cache_dir
+from .engine import (
+    DEFAULT_THRESHOLD,
+    SIMILARITY_VERSION,
+    find_similar_groups,
+    is_item,
+    update_groups,
+)
+from .graph import SimilarityGraph, graph_floor, update_graph
+from .stats import GROUPING, LISTING, timed
+
+# Bump whenever the tables change; older databases are rebuilt
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    directory TEXT NOT NULL UNIQUE,
+    threshold REAL NOT NULL,
+    linkage TEXT,
+    floor REAL,
+    version INTEGER NOT NULL,
+    scanned_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    scan_id INTEGER NOT NULL REFERENCES scans(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (scan_id, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS group_items (
+    scan_id INTEGER NOT NULL REFERENCES scans(id) ON DELETE CASCADE,
+    group_no INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (scan_id, group_no, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS edges (
+    scan_id INTEGER NOT NULL REFERENCES scans(id) ON DELETE CASCADE,
+    name1 TEXT NOT NULL,
+    name2 TEXT NOT NULL,
+    weight REAL NOT NULL,
+    PRIMARY KEY (scan_id, name1, name2)
+) WITHOUT ROWID;
+"""
+
+# Stored state of one directory: entries maps each name to its
+# (is_dir, mtime_ns, size), groups is the list of groups found, linkage the
+# graph.LINKAGES entry they were derived with (None for greedy groups),
+# edges the (name1, name2, weight) edges of that similarity graph and floor
+# the lowest weight kept in it (the threshold unless the graph was built lower)
+Snapshot = namedtuple("Snapshot", ["entries", "groups", "threshold", "scanned_at", "linkage", "edges",
+                                   "floor"])
+
+
+def default_index_path():
+    """Return the default file the scan index is stored in"""
+    return os.path.join(default_cache_dir(), "index.sqlite3")
+
+
+def directory_key(directory):
+    """Normalized form of a directory path, used as its key in the index"""
+    return os.path.normcase(os.path.abspath(directory))
+
+
+def list_entries(directory):
+    """
+    Return {name: (is_dir, mtime_ns, size)} for the folders and files directly
+    inside directory. Entries that vanish while listing are left out.
+    """
+    entries = {}
+    with os.scandir(directory) as found:
+        for entry in found:
+            if not is_item(entry):
+                continue
+            try:
+                stat = entry.stat()
+                entries[entry.name] = (entry.is_dir(), stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                continue
+    return entries
+
+
+def changed_entries(old_entries, new_entries):
+    """Return the names that were added, removed or whose metadata changed"""
+    changed = {name for name, meta in new_entries.items() if old_entries.get(name) != meta}
+    changed.update(name for name in old_entries if name not in new_entries)
+    return changed
+
+
+class ScanIndex:
+    """
+    SQLite store of directory snapshots.
+
+    Every call opens its own short lived connection, so one ScanIndex can be
+    shared between the UI thread and the scan worker. Writes are serialized
+    with a lock and each snapshot is written in a single transaction.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_index_path()
+        self.lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self):
+        if not self._ready:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.execute("PRAGMA foreign_keys = ON")
+        if not self._ready:
+            with connection:
+                if connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                    connection.executescript(
+                        "DROP TABLE IF EXISTS edges;"
+                        "DROP TABLE IF EXISTS group_items;"
+                        "DROP TABLE IF EXISTS entries;"
+                        "DROP TABLE IF EXISTS scans;")
+                    connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                connection.executescript(SCHEMA)
+            self._ready = True
+        return connection
+
+    def load(self, directory, threshold=DEFAULT_THRESHOLD, linkage=None, floor=None):
+        """
+        Return the stored Snapshot of directory, or None if there is none. A
+        snapshot made with another threshold, linkage, floor (see save) or
+        scoring version is ignored.
+        """
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT id, threshold, linkage, floor, version, scanned_at FROM scans "
+                "WHERE directory = ?", (directory_key(directory),)).fetchone()
+            if row is None:
+                return None
+            scan_id, stored_threshold, stored_linkage, stored_floor, version, scanned_at = row
+            if (version != SIMILARITY_VERSION or stored_threshold != threshold or
+                    stored_linkage != linkage or
+                    (linkage is not None and stored_floor != graph_floor(threshold, floor))):
+                return None
+
+            entries = {name: (bool(is_dir), mtime_ns, size) for name, is_dir, mtime_ns, size in
+                       connection.execute("SELECT name, is_dir, mtime_ns, size FROM entries "
+                                          "WHERE scan_id = ?", (scan_id,))}
+            groups = []
+            current = None
+            for group_no, name in connection.execute(
+                    "SELECT group_no, name FROM group_items WHERE scan_id = ? "
+                    "ORDER BY group_no, position", (scan_id,)):
+                if group_no != current:
+                    groups.append([])
+                    current = group_no
+                groups[-1].append(name)
+            edges = connection.execute("SELECT name1, name2, weight FROM edges WHERE scan_id = ?",
+                                       (scan_id,)).fetchall()
+        return Snapshot(entries, groups, stored_threshold, scanned_at, stored_linkage, edges,
+                        stored_floor)
+
+    def save(self, directory, entries, groups, threshold=DEFAULT_THRESHOLD, previous=None,
+             linkage=None, edges=(), floor=None):
+        """
+        Store the entries and groups of directory, and for groups derived with
+        a linkage the (name1, name2, weight) edges of their similarity graph,
+        which may go down to floor (see graph_floor). If previous (the
+        snapshot the new state was computed from) is given, only the entries
+        that changed since then are written.
+        """
+        floor = graph_floor(threshold, floor) if linkage is not None else None
+        with self.lock, closing(self._connect()) as connection, connection:
+            key = directory_key(directory)
+            row = connection.execute("SELECT id FROM scans WHERE directory = ?", (key,)).fetchone()
+            if row is None:
+                previous = None
+                scan_id = connection.execute(
+                    "INSERT INTO scans (directory, threshold, linkage, floor, version, scanned_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, threshold, linkage, floor, SIMILARITY_VERSION, time.time())).lastrowid
+            else:
+                scan_id = row[0]
+                connection.execute(
+                    "UPDATE scans SET threshold = ?, linkage = ?, floor = ?, version = ?, "
+                    "scanned_at = ? WHERE id = ?",
+                    (threshold, linkage, floor, SIMILARITY_VERSION, time.time(), scan_id))
+
+            if previous is None:
+                connection.execute("DELETE FROM entries WHERE scan_id = ?", (scan_id,))
+                changed = entries.keys()
+            else:
+                changed = changed_entries(previous.entries, entries)
+                connection.executemany(
+                    "DELETE FROM entries WHERE scan_id = ? AND name = ?",
+                    ((scan_id, name) for name in changed if name not in entries))
+            connection.executemany(
+                "INSERT OR REPLACE INTO entries (scan_id, name, is_dir, mtime_ns, size) "
+                "VALUES (?, ?, ?, ?, ?)",
+                ((scan_id, name) + entries[name] for name in changed if name in entries))
+
+            # Groups are small compared to the listing, rewrite them all
+            connection.execute("DELETE FROM group_items WHERE scan_id = ?", (scan_id,))
+            connection.executemany(
+                "INSERT INTO group_items (scan_id, group_no, position, name) VALUES (?, ?, ?, ?)",
+                ((scan_id, group_no, position, name)
+                 for group_no, group in enumerate(groups)
+                 for position, name in enumerate(group)))
+            connection.execute("DELETE FROM edges WHERE scan_id = ?", (scan_id,))
+            connection.executemany(
+                "INSERT INTO edges (scan_id, name1, name2, weight) VALUES (?, ?, ?, ?)",
+                ((scan_id, name1, name2, weight) for name1, name2, weight in edges))
+
+    def forget(self, directory):
+        """Remove the stored snapshot of directory"""
+        with self.lock, closing(self._connect()) as connection, connection:
+            connection.execute("DELETE FROM scans WHERE directory = ?", (directory_key(directory),))
+
+
+def snapshot_graph(snapshot):
+    """The SimilarityGraph stored with a snapshot made with a linkage"""
+    return SimilarityGraph.from_edges(snapshot.entries, snapshot.edges, snapshot.floor)
+
+
+def scan_with_index(index, directory, threshold=DEFAULT_THRESHOLD, method="qgram", cache=None,
+                    workers=1, stats=None, linkage=None):
+    """
+    Scan directory using its stored snapshot. Without a usable snapshot every
+    name is scored; otherwise only the names whose entries changed are
+    rescored and the stored groups (or with a linkage, the stored similarity
+    graph) are updated. The new state is saved back.
+    Returns (groups, changed) where changed is the set of changed names, or
+    None if a full scan was done. stats is an optional ScanStats.
+    """
+    with timed(stats, LISTING):
+        entries = list_entries(directory)
+        snapshot = index.load(directory, threshold, linkage)
+    changed = None
+    if snapshot is None:
+        if linkage is None:
+            groups = find_similar_groups(list(entries), threshold, method, cache, workers, stats)
+            index.save(directory, entries, groups, threshold)
+            return groups, None
+        graph = SimilarityGraph.build(list(entries), threshold, method, cache, workers, stats=stats)
+    else:
+        changed = changed_entries(snapshot.entries, entries)
+        if not changed:
+            return snapshot.groups, changed
+        if linkage is None:
+            groups, _ = update_groups(snapshot.groups, list(entries), changed, threshold, cache, stats)
+            index.save(directory, entries, groups, threshold, previous=snapshot)
+            return groups, changed
+        graph = update_graph(snapshot_graph(snapshot), list(entries), changed, cache, stats)
+
+    with timed(stats, GROUPING):
+        groups = graph.groups(linkage, threshold)
+    index.save(directory, entries, groups, threshold, snapshot, linkage, list(graph.edges()))
+    return groups, changed
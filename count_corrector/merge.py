@@ -0,0 +1,398 @@
+"""
+Background merging.
+
+Moving a group of items into its merged folder can take minutes when large
+folders are moved to another volume, so MergeExecutor runs merges on worker
+threads. Each MergeJob reports its progress (items and bytes) through a
+queue that the UI polls from its own thread, can be cancelled between items,
+and several jobs can run at once as long as they touch different paths.
+
+plan_merges works out the merge of many groups at once: every directory
+involved is listed once and all folder and item names are resolved in
+memory, so the whole plan can be shown before a single job carries it out.
+"""
+import os
+import queue
+import shutil
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Merges that may run at the same time
+DEFAULT_MERGE_WORKERS = 4
+
+# Chunk size of file copies across volumes (progress is reported per chunk)
+COPY_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Numbered names tried for a new folder whose name is taken (folder_1, folder_2, ...)
+MAX_FOLDER_SUFFIX = 100
+
+
+class MergeConflict(ValueError):
+    """Raised when a merge would touch paths that another running merge uses"""
+
+
+def normalized(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def paths_overlap(path1, path2):
+    """Whether two normalized paths are the same or one contains the other"""
+    return (path1 == path2 or path1.startswith(path2.rstrip(os.sep) + os.sep) or
+            path2.startswith(path1.rstrip(os.sep) + os.sep))
+
+
+def path_size(path):
+    """Total size in bytes of a file, or of every file inside a folder"""
+    if not os.path.isdir(path) or os.path.islink(path):
+        try:
+            return os.lstat(path).st_size
+        except OSError:
+            return 0
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def unique_name(basename, taken):
+    """
+    Return basename, or basename with a _copy suffix if it is in taken (a set
+    of names normalized with os.path.normcase). The result is added to taken.
+    """
+    name = basename
+    if os.path.normcase(name) in taken:
+        counter = 1
+        base_name, ext = os.path.splitext(basename)
+        name = f"{base_name}_copy{ext}"
+        while os.path.normcase(name) in taken:
+            name = f"{base_name}_copy{counter}{ext}"
+            counter += 1
+    taken.add(os.path.normcase(name))
+    return name
+
+
+def free_folder_path(path, limit=MAX_FOLDER_SUFFIX):
+    """path, or the first of path_1 ... path_<limit> that does not exist (None if all do)"""
+    if not os.path.lexists(path):
+        return path
+    for counter in range(1, limit + 1):
+        numbered = f"{path}_{counter}"
+        if not os.path.lexists(numbered):
+            return numbered
+    return None
+
+
+def unique_destination(folder, basename):
+    """Path in folder for basename, with a _copy suffix if that name is taken"""
+    dest_path = os.path.join(folder, basename)
+    if not os.path.exists(dest_path):
+        return dest_path
+    # Add a suffix to avoid name conflicts
+    counter = 1
+    base_name, ext = os.path.splitext(basename)
+    new_item_name = f"{base_name}_copy{ext}"
+    while os.path.exists(os.path.join(folder, new_item_name)):
+        new_item_name = f"{base_name}_copy{counter}{ext}"
+        counter += 1
+    return os.path.join(folder, new_item_name)
+
+
+class MergeJob:
+    """
+    Creates folders, then moves items to their planned destination paths.
+    If a destination was taken in the meantime, a _copy suffix is added.
+
+    With new_folder=True the first folder is meant to be a new one: if its
+    name is taken, the first free numbered name (see free_folder_path) is
+    created instead and the moves into it follow. Nothing is moved if there
+    is no free name.
+
+    Messages put on the queue are (kind, value) tuples:
+    ("folder", path) with the path of the new folder if new_folder is set,
+    ("item", (index, total, basename)) before each item is moved,
+    ("bytes", (done, total)) while data is copied, ("error", message) for
+    each folder or item that could not be handled and finally
+    ("done", cancelled).
+    """
+
+    def __init__(self, moves, folders=(), new_folder=False):
+        self.moves = list(moves)  # (source, destination path)
+        self.folders = list(folders)
+        self.new_folder = new_folder
+        self.sources = [source for source, _ in self.moves]
+        self.queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.moved = []  # (source, destination) of every moved item
+        self.errors = []
+        self.paths = [normalized(path) for path in self.sources + self.folders]
+        self.bytes_done = 0
+        self.bytes_total = 0
+
+    def cancel(self):
+        """Stop after the item that is being moved now"""
+        self.cancel_event.set()
+
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def drain(self, limit=None):
+        """Return the queued messages (at most limit) without blocking"""
+        messages = []
+        while limit is None or len(messages) < limit:
+            try:
+                messages.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return messages
+
+    def _copy_file(self, src, dst):
+        """shutil.move copy function for moves across volumes, reporting the bytes copied"""
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            while True:
+                chunk = fsrc.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                fdst.write(chunk)
+                self.bytes_done += len(chunk)
+                self.queue.put(("bytes", (self.bytes_done, self.bytes_total)))
+        shutil.copystat(src, dst)
+        return dst
+
+    def _claim_new_folder(self):
+        """
+        Pick a free name for the new folder and point the moves into it there.
+        Returns False (after reporting an error) if there is none.
+        """
+        requested = self.folders[0]
+        folder = free_folder_path(requested)
+        if folder is None:
+            message = (f"Too many folders named {os.path.basename(requested)} already exist, "
+                       f"please choose a different name")
+            self.errors.append(message)
+            self.queue.put(("error", message))
+            return False
+        if folder != requested:
+            self.folders[0] = folder
+            self.paths.append(normalized(folder))
+            self.moves = [(source, os.path.join(folder, os.path.basename(dest_path)))
+                          if os.path.dirname(dest_path) == requested else (source, dest_path)
+                          for source, dest_path in self.moves]
+        self.queue.put(("folder", folder))
+        return True
+
+    def run(self):
+        """Move every item (runs on an executor thread)"""
+        try:
+            if self.new_folder and not self._claim_new_folder():
+                self.queue.put(("done", self.cancelled()))
+                return
+            sizes = [path_size(source) for source in self.sources]
+            self.bytes_total = sum(sizes)
+            for folder in self.folders:
+                try:
+                    os.makedirs(folder, exist_ok=True)
+                except OSError as e:
+                    message = f"Failed to create folder {os.path.basename(folder)}: {str(e)}"
+                    self.errors.append(message)
+                    self.queue.put(("error", message))
+            finished_bytes = 0
+            total = len(self.moves)
+            for index, (source_path, dest_path) in enumerate(self.moves):
+                if self.cancelled():
+                    break
+                basename = os.path.basename(source_path)
+                self.queue.put(("item", (index, total, basename)))
+                try:
+                    # Double-check source exists
+                    if not os.path.exists(source_path):
+                        raise OSError(f"Cannot find {basename} - path no longer exists.")
+                    if os.path.lexists(dest_path):
+                        dest_path = unique_destination(os.path.dirname(dest_path),
+                                                       os.path.basename(dest_path))
+                    shutil.move(source_path, dest_path, copy_function=self._copy_file)
+                    self.moved.append((source_path, dest_path))
+                except Exception as e:
+                    message = f"Error moving {basename}: {str(e)}"
+                    self.errors.append(message)
+                    self.queue.put(("error", message))
+                # Renames within a volume copy nothing, count the item as done
+                finished_bytes += sizes[index]
+                self.bytes_done = finished_bytes
+                self.queue.put(("bytes", (self.bytes_done, self.bytes_total)))
+        except Exception as e:
+            self.errors.append(str(e))
+            self.queue.put(("error", str(e)))
+        self.queue.put(("done", self.cancelled()))
+
+
+class MergeExecutor:
+    """
+    Runs MergeJobs on a small thread pool. Jobs whose sources or destination
+    overlap with those of a running job are refused with MergeConflict, so
+    concurrent merges never touch the same items.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MERGE_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="Merge")
+        self.lock = threading.Lock()
+        self.running = set()
+
+    def conflicts(self, paths):
+        """Whether any of these paths is in use by a running merge"""
+        wanted = [normalized(path) for path in paths]
+        with self.lock:
+            return any(paths_overlap(path, busy)
+                       for job in self.running for busy in job.paths for path in wanted)
+
+    def submit(self, sources, destination, new_folder=False):
+        """
+        Start moving sources into the destination folder and return the
+        MergeJob. With new_folder=True an existing destination is not reused
+        (see MergeJob).
+        """
+        moves = [(source, os.path.join(destination, os.path.basename(source))) for source in sources]
+        return self.start(MergeJob(moves, [destination], new_folder))
+
+    def submit_plan(self, plan):
+        """Start carrying out a MergePlan and return the MergeJob"""
+        return self.start(MergeJob(plan.moves(), plan.folders()))
+
+    def start(self, job):
+        """Run a MergeJob unless it overlaps a running one (raises MergeConflict)"""
+        with self.lock:
+            for other in self.running:
+                if any(paths_overlap(path, busy) for path in job.paths for busy in other.paths):
+                    raise MergeConflict("Some of these items are already being merged")
+            self.running.add(job)
+        self.executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        try:
+            job.run()
+        finally:
+            with self.lock:
+                self.running.discard(job)
+
+    def active_jobs(self):
+        with self.lock:
+            return list(self.running)
+
+    def cancel_all(self):
+        """Cancel every running merge after its current item"""
+        for job in self.active_jobs():
+            job.cancel()
+
+    def shutdown(self, wait=True):
+        self.cancel_all()
+        self.executor.shutdown(wait=wait)
+
+
+# One group of a MergePlan: the folder to create and the (source, destination)
+# of every item moved into it
+PlannedMerge = namedtuple("PlannedMerge", ["folder", "moves"])
+
+
+class MergePlan:
+    """
+    The folders and moves of merging several groups, resolved up front.
+    missing lists the items that were not found when the plan was made.
+    """
+
+    def __init__(self, merges, missing):
+        self.merges = merges
+        self.missing = missing
+
+    def __len__(self):
+        return len(self.merges)
+
+    def folders(self):
+        return [merge.folder for merge in self.merges]
+
+    def moves(self):
+        return [move for merge in self.merges for move in merge.moves]
+
+    def describe(self):
+        """Return the plan as text, one line per folder and per item"""
+        lines = []
+        for merge in self.merges:
+            lines.append(f"{merge.folder}{os.sep}")
+            for source, destination in merge.moves:
+                lines.append(f"    {os.path.basename(source)}  ->  {os.path.basename(destination)}")
+        for path in self.missing:
+            lines.append(f"Not found, skipped: {path}")
+        return "\n".join(lines)
+
+
+def folder_base_name(basename, is_dir):
+    """Base name of the merged folder for an item (files lose their extension)"""
+    return basename if is_dir else os.path.splitext(basename)[0]
+
+
+def plan_merges(groups):
+    """
+    Plan the merge of every group (lists of absolute paths) into a new
+    "<name>_merged" folder next to its first item, named after that item.
+
+    Each directory involved is listed once. Folder names (with _merged_1,
+    _merged_2, ... where needed) and item names inside the new folders (with
+    _copy suffixes) are resolved against those listings and against each
+    other in memory, so no name is probed on disk twice. Groups left with
+    less than two existing items are dropped. Returns a MergePlan.
+    """
+    listings = {}  # directory -> {normalized name: is_dir}
+
+    def listing(directory):
+        found = listings.get(directory)
+        if found is None:
+            found = {}
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        try:
+                            found[os.path.normcase(entry.name)] = entry.is_dir()
+                        except OSError:
+                            continue
+            except OSError:
+                pass
+            listings[directory] = found
+        return found
+
+    # Names taken in each directory, including the folders planned so far
+    taken = {}
+    merges = []
+    missing = []
+    for group in groups:
+        existing = []
+        for path in group:
+            directory, basename = os.path.split(path)
+            if os.path.normcase(basename) in listing(directory):
+                existing.append(path)
+            else:
+                missing.append(path)
+        if len(existing) < 2:
+            continue
+
+        directory, basename = os.path.split(existing[0])
+        names = taken.get(directory)
+        if names is None:
+            names = taken[directory] = set(listing(directory))
+        base = folder_base_name(basename, listing(directory)[os.path.normcase(basename)])
+        folder_name = base + "_merged"
+        counter = 1
+        while os.path.normcase(folder_name) in names:
+            folder_name = f"{base}_merged_{counter}"
+            counter += 1
+        names.add(os.path.normcase(folder_name))
+        folder = os.path.join(directory, folder_name)
+
+        inside = set()
+        moves = [(path, os.path.join(folder, unique_name(os.path.basename(path), inside)))
+                 for path in existing]
+        merges.append(PlannedMerge(folder, moves))
+    return MergePlan(merges, missing)
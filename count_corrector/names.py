@@ -0,0 +1,127 @@
+"""
+Per-name data prepared once per scan.
+
+Scoring a pair used to lowercase both names, look for a digit suffix and
+build a fresh SequenceMatcher, although every name takes part in many pairs.
+A NameTable keeps one NameRecord per name with its lowercase form, length,
+digit suffix split and (computed when first needed) character histogram, and
+lets the name keep a SequenceMatcher so the work SequenceMatcher does on its
+second sequence (indexing its characters) is only done once per name.
+
+SequenceMatcher.ratio is not symmetric, so the matcher of a name is only
+used for pairs where that name is the second one and the seed is swapped in
+with set_seq1. The scores are exactly those of calculate_similarity.
+"""
+from collections import Counter
+from difflib import SequenceMatcher
+
+from .candidates import digit_suffix_start
+from .engine import score_folded, score_folded_with_bounds
+
+# Names that get a reusable SequenceMatcher (about 2.5 KB each); pairs with
+# other names build a throwaway one, as calculate_similarity does
+DEFAULT_MAX_MATCHERS = 20000
+
+
+class NameRecord:
+    """What scoring needs to know about one name"""
+
+    __slots__ = ("name", "folded", "length", "digit_start", "_histogram", "matcher")
+
+    def __init__(self, name):
+        self.name = name
+        # lower() and not casefold(), so scores stay those of calculate_similarity
+        self.folded = name.lower()
+        self.length = len(self.folded)
+        self.digit_start = digit_suffix_start(self.folded)
+        self._histogram = None
+        self.matcher = None
+
+    @property
+    def histogram(self):
+        """Counter of the characters of the lowercase name"""
+        if self._histogram is None:
+            self._histogram = Counter(self.folded)
+        return self._histogram
+
+
+def prefix_plus_numbers(record1, record2):
+    """engine.is_prefix_plus_numbers for two records, using their digit splits"""
+    if record1.length == record2.length:
+        return False
+    shorter, longer = (record1, record2) if record1.length < record2.length else (record2, record1)
+    return longer.digit_start <= shorter.length and longer.folded.startswith(shorter.folded)
+
+
+class NameTable:
+    """
+    NameRecords of the names of a scan, created the first time a name is
+    scored. At most max_matchers names keep a SequenceMatcher; they are never
+    evicted, since scans go over the names in cycles that would make any
+    eviction order throw matchers away right before they are needed again.
+    """
+
+    def __init__(self, names=(), max_matchers=DEFAULT_MAX_MATCHERS):
+        self.records = {}
+        self.max_matchers = max_matchers
+        self.matchers = 0
+        for name in names:
+            self.record(name)
+
+    def __len__(self):
+        return len(self.records)
+
+    def record(self, name):
+        """Return the NameRecord of name, adding it if needed"""
+        record = self.records.get(name)
+        if record is None:
+            record = self.records[name] = NameRecord(name)
+        return record
+
+    def discard(self, name):
+        """Forget a name (and free its matcher)"""
+        record = self.records.pop(name, None)
+        if record is not None and record.matcher is not None:
+            self.matchers -= 1
+
+    def ratio(self, record1, record2):
+        """SequenceMatcher(None, record1.folded, record2.folded).ratio()"""
+        matcher = record2.matcher
+        if matcher is None:
+            if self.matchers >= self.max_matchers:
+                return SequenceMatcher(None, record1.folded, record2.folded).ratio()
+            matcher = record2.matcher = SequenceMatcher(None, "", record2.folded)
+            self.matchers += 1
+        matcher.set_seq1(record1.folded)
+        return matcher.ratio()
+
+    def score_records(self, record1, record2, threshold=None):
+        """score_with_path for two records"""
+        return score_folded(record1.folded, record2.folded, threshold,
+                            lambda: self.ratio(record1, record2),
+                            prefix_plus_numbers(record1, record2))
+
+    def shared(self, record1, record2):
+        """Number of characters two names have in common, from their histograms"""
+        histogram2 = record2.histogram
+        return sum(min(count, histogram2[char]) for char, count in record1.histogram.items()
+                   if char in histogram2)
+
+    def bounded_records(self, record1, record2, threshold):
+        """score_with_bounds for two records"""
+        return score_folded_with_bounds(record1.folded, record2.folded, threshold,
+                                        lambda: self.shared(record1, record2),
+                                        lambda: self.ratio(record1, record2),
+                                        prefix_plus_numbers(record1, record2))
+
+    def score_with_bounds(self, name1, name2, threshold):
+        """Same as engine.score_with_bounds(name1, name2, threshold)"""
+        return self.bounded_records(self.record(name1), self.record(name2), threshold)
+
+    def score_with_path(self, name1, name2, threshold=None):
+        """Same as engine.score_with_path(name1, name2, threshold)"""
+        return self.score_records(self.record(name1), self.record(name2), threshold)
+
+    def score(self, name1, name2, threshold=None):
+        """Same as calculate_similarity(name1, name2, threshold)"""
+        return self.score_records(self.record(name1), self.record(name2), threshold)[0]
@@ -0,0 +1,131 @@
+"""
+Process pool scoring for large scans.
+
+calculate_similarity is pure Python and CPU bound, so big directories are
+scored on several processes. The item names are sent to each worker once, by
+the pool initializer, together with a shared array of "processed" flags.
+Tasks only carry a seed index and return the indexes of the unprocessed items
+that seed is similar to.
+
+Seeds are handed out in order, a window at a time, and their results are
+merged in the same order as the serial scan would build them, so the groups
+are exactly the ones find_similar_groups returns serially. Edges of a
+SimilarityGraph do not depend on what was processed before, so
+iter_graph_edges_parallel only has to keep the seeds in order.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.sharedctypes import RawArray
+
+from .engine import make_candidate_index
+from .names import NameTable
+
+# Seeds scored ahead of the merge per worker; larger windows keep the workers
+# busier but may score seeds an earlier seed in the window has already taken
+SEEDS_PER_WORKER = 4
+
+# Per-process state set up by _init_worker
+_worker_state = {}
+
+
+def _init_worker(items, threshold, method, processed):
+    """Receive the name table once and build the candidate index for it"""
+    _worker_state["items"] = items
+    _worker_state["threshold"] = threshold
+    _worker_state["index"] = make_candidate_index(items, threshold, method)
+    _worker_state["processed"] = processed
+    _worker_state["table"] = NameTable()
+
+
+def _score_seed(i):
+    """Return the seed and the unprocessed items similar to it"""
+    items = _worker_state["items"]
+    threshold = _worker_state["threshold"]
+    index = _worker_state["index"]
+    processed = _worker_state["processed"]
+    score = _worker_state["table"].score_with_bounds
+
+    item1 = items[i]
+    others = index.candidates(i) if index else range(len(items))
+    similar = [j for j in others
+               if j != i and not processed[j]
+               and score(item1, items[j], threshold)[0] >= threshold]
+    return i, similar
+
+
+def iter_similar_groups_parallel(items, threshold, method, workers, cancel=None, progress=None):
+    """
+    Yield the same groups as engine.iter_similar_groups, scored on a process pool.
+
+    The parent only sets a processed flag after every earlier seed has been
+    merged, so a worker scoring a seed never sees flags set by later seeds.
+    Items it skips are exactly the ones the serial scan would skip, and items
+    processed while it was running are filtered out again during the merge.
+    """
+    count = len(items)
+    processed = RawArray("b", count)
+    window = workers * SEEDS_PER_WORKER
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(items, threshold, method, processed)) as executor:
+        next_seed = 0
+        while next_seed < count:
+            if cancel is not None and cancel.is_set():
+                return
+            if progress is not None:
+                progress(next_seed, count)
+
+            seeds = []
+            while next_seed < count and len(seeds) < window:
+                if not processed[next_seed]:
+                    seeds.append(next_seed)
+                next_seed += 1
+
+            # Results come back in seed order, which is the serial order
+            for i, similar in executor.map(_score_seed, seeds):
+                if processed[i]:
+                    continue
+                group = [i]
+                for j in similar:
+                    if not processed[j]:
+                        group.append(j)
+                        processed[j] = 1
+                if len(group) > 1:  # Only add groups with multiple similar items
+                    processed[i] = 1
+                    yield [items[j] for j in group]
+
+
+def _score_neighbors(i):
+    """Return a node and its later neighbors in the similarity graph, with the edge weights"""
+    items = _worker_state["items"]
+    threshold = _worker_state["threshold"]
+    index = _worker_state["index"]
+    score = _worker_state["table"].score_with_bounds
+
+    item1 = items[i]
+    others = index.candidates(i) if index else range(i + 1, len(items))
+    edges = []
+    for j in others:
+        if j > i:
+            weight = score(item1, items[j], threshold)[0]
+            if weight >= threshold:
+                edges.append((j, weight))
+    return i, edges
+
+
+def iter_graph_edges_parallel(items, threshold, method, workers, cancel=None, progress=None):
+    """Yield the (i, j, weight) edges of graph.SimilarityGraph, scored on a process pool"""
+    count = len(items)
+    # Every pair is scored for the graph, nothing is ever marked processed
+    processed = RawArray("b", count)
+    window = workers * SEEDS_PER_WORKER
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(items, threshold, method, processed)) as executor:
+        for start in range(0, count, window):
+            if cancel is not None and cancel.is_set():
+                return
+            if progress is not None:
+                progress(start, count)
+            for i, edges in executor.map(_score_neighbors, range(start, min(start + window, count))):
+                for j, weight in edges:
+                    yield i, j, weight
@@ -0,0 +1,124 @@
+"""
+Several monitored root directories.
+
+An operator may look after a dozen shares at once. Each MonitoredRoot keeps
+what a single-directory app keeps for its one directory: the groups shown,
+the incremental state (ClusterIndex and SimilarityGraph), its running scan
+and the file system events collected for it.
+
+Scans of all roots share one budget of scan slots and scoring processes.
+ScanScheduler hands the slots out fairly: a root has at most one scan queued
+or running, queued roots are served in the order they asked, and a root
+whose scan finished goes to the back of the queue if it asks again. A huge
+root therefore only ever holds one slot while the others keep being
+scanned.
+"""
+import os
+from collections import deque
+
+from .events import DEFAULT_DEBOUNCE, DEFAULT_MAX_LATENCY, EventCoalescer
+
+# Scans running at the same time; more roots wait in the queue
+DEFAULT_MAX_SCANS = 2
+
+
+class MonitoredRoot:
+    """State of one monitored root directory"""
+
+    def __init__(self, directory, debounce=DEFAULT_DEBOUNCE, max_latency=DEFAULT_MAX_LATENCY):
+        self.directory = directory
+        self.events = EventCoalescer(debounce, max_latency)
+        self.watch = None  # Handle of the file system watch, if any
+        self.groups = []
+        self.clusters = None  # ClusterIndex for incremental updates, built by the last scan
+        self.graph = None  # SimilarityGraph of the last scan, reused for regrouping (see similarity_graph)
+        self.worker = None  # Running ScanWorker
+        self.pending_changes = None  # Changed names for the next scan to apply to clusters, if any
+        self.results_stale = False  # Shown results are kept until the running scan is done
+        self.pending_groups = []  # Groups found by that scan so far
+        self.stats = None  # ScanStats of the last scan or update
+        self.scanned = False  # Whether a scan of this root has finished
+
+    def reset(self):
+        """Forget the incremental state, e.g. before a full scan"""
+        self.clusters = None
+        self.graph = None
+        self.pending_changes = None
+
+    def similarity_graph(self):
+        """
+        SimilarityGraph of the current names: the one of the last scan, or
+        after incremental updates one made from the ClusterIndex (and kept)
+        """
+        if self.graph is None and self.clusters is not None:
+            self.graph = self.clusters.graph()
+        return self.graph
+
+    def summary(self):
+        """Short state of the root, e.g. for a list of roots"""
+        if self.worker is not None:
+            return "scanning"
+        if not self.scanned and not self.groups:
+            return "waiting"
+        return f"{len(self.groups)} groups"
+
+
+class ScanScheduler:
+    """
+    Fair queue of the roots waiting for a scan (identified by any hashable
+    key, e.g. their directory), with at most max_scans running at once.
+
+    request() queues a root (a root already queued is not queued twice),
+    start() returns the roots that may start now and finished() frees the
+    slot of a root; a root whose running scan is replaced must be finished()
+    before it is requested again. Nothing runs by itself, the caller starts
+    and cancels the scans.
+    """
+
+    def __init__(self, max_scans=DEFAULT_MAX_SCANS, processes=None):
+        self.max_scans = max(1, max_scans)
+        self.processes = processes or os.cpu_count() or 1
+        self.queue = deque()
+        self.running = set()
+
+    def __contains__(self, key):
+        return key in self.running or key in self.queue
+
+    def request(self, key, urgent=False):
+        """
+        Queue a scan of key. urgent scans (e.g. asked for by the user) go to
+        the front of the queue. Returns whether the root was queued.
+        """
+        if key in self.queue:
+            if urgent:
+                self.queue.remove(key)
+                self.queue.appendleft(key)
+            return False
+        if urgent:
+            self.queue.appendleft(key)
+        else:
+            self.queue.append(key)
+        return True
+
+    def discard(self, key):
+        """Drop key from the queue and free its slot"""
+        if key in self.queue:
+            self.queue.remove(key)
+        self.running.discard(key)
+
+    def finished(self, key):
+        """Free the slot of a finished (or cancelled) scan"""
+        self.running.discard(key)
+
+    def start(self):
+        """Return the queued roots that can start now, oldest request first; they count as running"""
+        started = []
+        while self.queue and len(self.running) < self.max_scans:
+            key = self.queue.popleft()
+            self.running.add(key)
+            started.append(key)
+        return started
+
+    def workers(self):
+        """Scoring processes for one scan, so the running scans together use at most processes"""
+        return max(1, self.processes // self.max_scans)
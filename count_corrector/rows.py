@@ -0,0 +1,58 @@
+"""
+Results view model.
+
+The results view shows each group as a row with one child row per item.
+Rows have stable ids derived from the item paths, so a new list of groups
+can be compared with the rows on screen and only the differences applied.
+This module works out those differences without touching any widget.
+"""
+import os
+from collections import namedtuple
+
+# What has to change to go from the shown rows to a new list of groups:
+# children maps each wanted group row to its item rows (in display order),
+# first_items maps it to the name it is labelled with, stale_rows are item
+# rows in no group anymore, changed are new or changed group rows, removed
+# are group rows to delete and reorder_all tells whether the groups that did
+# not change moved relative to each other (so every group must be placed)
+ResultsDiff = namedtuple("ResultsDiff",
+                         ["children", "first_items", "stale_rows", "changed", "removed", "reorder_all"])
+
+
+def group_row_id(first_item_path):
+    """Stable results view id of the group shown as 'Similar to' this item"""
+    return "group:" + first_item_path
+
+
+def item_row_id(item_path):
+    """Stable results view id of an item"""
+    return "item:" + item_path
+
+
+def diff_results(old_children, groups, directory):
+    """
+    Compare the shown rows (old_children: group row -> item rows) with
+    groups, lists of names relative to directory. Groups with less than two
+    items are not shown. Returns a ResultsDiff.
+    """
+    children = {}
+    first_items = {}
+    for group in groups:
+        if len(group) < 2:
+            continue
+        group_row = group_row_id(os.path.join(directory, group[0]))
+        children[group_row] = [item_row_id(os.path.join(directory, item)) for item in group]
+        first_items[group_row] = group[0]
+
+    wanted_rows = {row for rows in children.values() for row in rows}
+    stale_rows = [row for rows in old_children.values() for row in rows if row not in wanted_rows]
+    changed = [group_row for group_row, rows in children.items()
+               if old_children.get(group_row) != rows]
+    removed = [group_row for group_row in old_children if group_row not in children]
+
+    changed_set = set(changed)
+    kept_old = [group_row for group_row in old_children
+                if group_row in children and group_row not in changed_set]
+    kept_new = [group_row for group_row in children
+                if group_row in old_children and group_row not in changed_set]
+    return ResultsDiff(children, first_items, stale_rows, changed, removed, kept_old != kept_new)
@@ -0,0 +1,137 @@
+"""
+Scan instrumentation.
+
+A ScanStats collects where the time of one scan went (listing, indexing,
+scoring, grouping, rendering) and how the pairs were decided: how many
+went through each fast path of calculate_similarity (see
+engine.SIMILARITY_PATHS) and how many of those were rejected. Scans only
+collect statistics when they are given a ScanStats, so scanning without one
+costs nothing extra.
+"""
+import json
+import time
+from contextlib import contextmanager
+
+LISTING = "listing"
+INDEXING = "indexing"
+SCORING = "scoring"
+GROUPING = "grouping"
+RENDERING = "rendering"
+PHASES = (LISTING, INDEXING, SCORING, GROUPING, RENDERING)
+
+# Pairs answered from a score cache
+CACHED = "cached"
+
+
+class ScanStats:
+    """
+    Timers and counters of one scan. A scan fills it from a single thread;
+    read it once the scan is done.
+    """
+
+    def __init__(self, label=""):
+        self.label = label
+        self.started_at = time.time()
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.pairs = {}  # path -> [considered, rejected]
+        self.counters = {}
+
+    @contextmanager
+    def phase(self, name):
+        """Add the time spent in the with block to a phase"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def count_pair(self, path, rejected):
+        """Record one scored pair, decided by path (CACHED for cache hits)"""
+        counts = self.pairs.get(path)
+        if counts is None:
+            counts = self.pairs[path] = [0, 0]
+        counts[0] += 1
+        if rejected:
+            counts[1] += 1
+
+    def pairs_considered(self):
+        return sum(counts[0] for counts in self.pairs.values())
+
+    def pairs_rejected(self):
+        return sum(counts[1] for counts in self.pairs.values())
+
+    def to_dict(self):
+        """The statistics as plain data, ready for JSON"""
+        return {
+            "label": self.label,
+            "started_at": self.started_at,
+            "phases": {name: round(seconds, 6) for name, seconds in self.phases.items()},
+            "pairs": {
+                "considered": self.pairs_considered(),
+                "rejected": self.pairs_rejected(),
+                "paths": {path: {"considered": considered, "rejected": rejected}
+                          for path, (considered, rejected) in sorted(self.pairs.items())},
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def dump(self, path):
+        """Write the statistics to a JSON file"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write("\n")
+
+    def summary(self):
+        """Return the statistics as lines of text"""
+        lines = [self.label] if self.label else []
+        lines.append("Time per phase:")
+        for name, seconds in self.phases.items():
+            lines.append(f"  {name:<16}{seconds * 1000:10.1f} ms")
+        lines.append(f"Pairs scored: {self.pairs_considered()}, "
+                     f"rejected: {self.pairs_rejected()}")
+        for path, (considered, rejected) in sorted(self.pairs.items(), key=lambda item: -item[1][0]):
+            lines.append(f"  {path:<16}{considered:10} scored {rejected:10} rejected")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name}: {value}")
+        return lines
+
+
+class PhaseClock:
+    """
+    Times a phase that is interrupted (e.g. by a generator's yield) or that
+    other phases run inside of; the time of the nested phases is left out.
+    The clock starts running when it is created.
+    """
+
+    def __init__(self, stats, name, nested=()):
+        self.stats = stats
+        self.name = name
+        self.nested = nested
+        self.start()
+
+    def _nested_time(self):
+        return sum(self.stats.phases.get(name, 0.0) for name in self.nested)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.nested_at_start = self._nested_time()
+
+    def stop(self):
+        elapsed = time.perf_counter() - self.started
+        self.stats.add_time(self.name, elapsed - (self._nested_time() - self.nested_at_start))
+
+
+@contextmanager
+def _untimed():
+    yield
+
+
+def timed(stats, name):
+    """stats.phase(name), or a context that does nothing if stats is None"""
+    return stats.phase(name) if stats is not None else _untimed()
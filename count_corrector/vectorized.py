@@ -0,0 +1,165 @@
+"""
+NumPy batch scoring of one name against all others.
+
+All names are encoded once as rows of a padded integer array, sorted by
+length. For each seed the cheap parts of calculate_similarity are computed for
+every name in its length window at once: the length rejection, the position
+matches, the equal-length and prefix boosts and upper bounds on the weighted
+ratio from the shared characters. Only the pairs those bounds cannot decide
+are scored one by one (see names.NameTable). The same pass yields the edges
+of a SimilarityGraph (iter_graph_edges_numpy).
+
+NumPy is optional; available() tells whether this module can be used.
+"""
+from .candidates import PrefixDigitLookup, length_window
+from .engine import DEFAULT_THRESHOLD, PROGRESS_INTERVAL
+from .names import NameTable
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is an optional dependency
+    np = None
+
+# Small tolerance so float rounding never rejects a pair that reaches the threshold
+EPSILON = 1e-9
+
+
+def available():
+    """Whether NumPy is installed"""
+    return np is not None
+
+
+class VectorScorer:
+    """Scores one name against all names in its length window with array operations"""
+
+    def __init__(self, items, threshold=DEFAULT_THRESHOLD):
+        if np is None:
+            raise ImportError("NumPy is required for vectorized scoring")
+        self.items = items
+        self.threshold = threshold
+        folded = [item.lower() for item in items]
+        self.prefix_lookup = PrefixDigitLookup(folded)
+        self.table = NameTable()
+
+        count = len(folded)
+        lengths = np.array([len(name) for name in folded], dtype=np.int64)
+        # Rows are sorted by length so every length window is a contiguous slice
+        self.order = np.argsort(lengths, kind="stable")
+        self.row_of = np.empty(count, dtype=np.int64)
+        self.row_of[self.order] = np.arange(count)
+        self.sorted_lengths = lengths[self.order]
+
+        # Character codes start at 1 so the padding (0) never matches
+        alphabet = {char: code for code, char in enumerate(sorted(set("".join(folded))), 1)}
+        width = int(lengths.max()) if count else 0
+        self.codes = np.zeros((count, width), dtype=np.int32)
+        # Character counts, column-major so a seed's few columns are cheap to gather
+        self.counts = np.zeros((count, len(alphabet) + 1), dtype=np.int16, order="F")
+        self.seed_chars = [None] * count
+        for row, index in enumerate(self.order):
+            name = folded[index]
+            if not name:
+                continue
+            name_codes = np.fromiter((alphabet[char] for char in name), dtype=np.int32, count=len(name))
+            self.codes[row, :len(name)] = name_codes
+            chars, char_counts = np.unique(name_codes, return_counts=True)
+            self.counts[row, chars] = char_counts
+            self.seed_chars[index] = (chars, char_counts)
+
+    def similar(self, index, processed):
+        """
+        Return the sorted indexes of the unprocessed items whose score against
+        this one (as seed) reaches the threshold.
+        """
+        threshold = self.threshold
+        row = self.row_of[index]
+        length = int(self.sorted_lengths[row])
+        lowest_len, highest_len = length_window(length)
+        start = np.searchsorted(self.sorted_lengths, lowest_len, side="left")
+        end = np.searchsorted(self.sorted_lengths, highest_len, side="right")
+
+        ids = self.order[start:end]
+        other_lengths = self.sorted_lengths[start:end]
+        alive = ~processed[ids] & (ids != index)
+
+        # Prefix plus digits pairs always score 0.9, whatever their lengths
+        partners = [j for j in self.prefix_lookup.partners(index) if j != index and not processed[j]]
+        alive[np.isin(ids, partners)] = False
+
+        # Matching characters in the same positions (padding never matches)
+        position_matches = (self.codes[start:end, :length] == self.codes[row, :length]).sum(axis=1)
+        shortest = np.minimum(other_lengths, length)
+        longest = np.maximum(other_lengths, length)
+        total = other_lengths + length
+
+        # Equal length with 1-2 differences, or a prefix with up to 5 extra characters
+        boosted = (((other_lengths == length) & (length >= 4) & (length - position_matches <= 2)) |
+                   ((other_lengths != length) & (position_matches == shortest) &
+                    (np.abs(other_lengths - length) <= 5)))
+
+        # Upper bounds from the number of shared characters
+        chars, char_counts = self.seed_chars[index]
+        common = np.minimum(self.counts[start:end][:, chars], char_counts).sum(axis=1)
+        basic_bound = 2 * common / total
+        position_ratio = position_matches / longest
+        edit_bound = np.where(longest < 10, position_ratio, common / longest)
+        bound = np.maximum(basic_bound, basic_bound * 0.3 + position_ratio * 0.3 + edit_bound * 0.4)
+
+        if threshold <= 0.7:
+            # Boosted pairs score at least 0.7
+            accepted = alive & boosted
+            undecided = alive & ~boosted & (bound >= threshold - EPSILON)
+        else:
+            accepted = np.zeros_like(alive)
+            undecided = alive & (bound >= threshold - EPSILON)
+
+        similar = set(ids[accepted].tolist())
+        if 0.9 >= threshold:
+            similar.update(partners)
+        seed = self.items[index]
+        for j in ids[undecided].tolist():
+            if self.table.score_with_bounds(seed, self.items[j], threshold)[0] >= threshold:
+                similar.add(j)
+        return sorted(similar)
+
+
+def iter_similar_groups_numpy(items, threshold=DEFAULT_THRESHOLD, cancel=None, progress=None):
+    """Yield the same groups as engine.iter_similar_groups using VectorScorer"""
+    scorer = VectorScorer(items, threshold)
+    processed = np.zeros(len(items), dtype=bool)
+
+    for i, item1 in enumerate(items):
+        if i % PROGRESS_INTERVAL == 0:
+            if cancel is not None and cancel.is_set():
+                return
+            if progress is not None:
+                progress(i, len(items))
+
+        if processed[i]:
+            continue
+
+        similar = scorer.similar(i, processed)
+        if similar:  # Only add groups with multiple similar items
+            processed[similar] = True
+            processed[i] = True
+            yield [item1] + [items[j] for j in similar]
+
+
+def iter_graph_edges_numpy(items, threshold=DEFAULT_THRESHOLD, cancel=None, progress=None):
+    """Yield the (i, j, weight) edges of graph.SimilarityGraph using VectorScorer"""
+    scorer = VectorScorer(items, threshold)
+    score = scorer.table.score_with_bounds
+    processed = np.zeros(len(items), dtype=bool)
+
+    for i, item1 in enumerate(items):
+        if i % PROGRESS_INTERVAL == 0:
+            if cancel is not None and cancel.is_set():
+                return
+            if progress is not None:
+                progress(i, len(items))
+
+        # Pairs are scored with the earlier item as seed, so once an item has
+        # been the seed it is left out of the later seeds' pairs
+        for j in scorer.similar(i, processed):
+            yield i, j, score(item1, items[j], threshold)[0]
+        processed[i] = True
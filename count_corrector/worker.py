@@ -0,0 +1,271 @@
+"""
+Background scanning.
+
+ScanWorker runs a directory scan on its own thread and streams the groups it
+finds through a queue, so a UI can show them while the scan is still running
+without ever being blocked by it. The worker never touches any UI object;
+the UI polls the queue from its own thread (e.g. with Tk's root.after).
+"""
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from .engine import (
+    DEFAULT_THRESHOLD,
+    iter_similar_groups,
+    iter_tree_groups,
+    list_items,
+    update_groups,
+)
+from .clusters import ClusterIndex
+from .duplicates import iter_duplicate_groups
+from .graph import SimilarityGraph, graph_floor, update_graph
+from .index import changed_entries, list_entries, snapshot_graph
+from .stats import GROUPING, INDEXING, LISTING, SCORING, PhaseClock, timed
+
+logger = logging.getLogger(__name__)
+
+# Groups are posted in batches of this size, or after this many seconds
+BATCH_SIZE = 50
+BATCH_INTERVAL = 0.2
+
+
+class ScanWorker:
+    """
+    Scans one directory on a background thread.
+
+    Messages put on the queue are (kind, value) tuples:
+    ("listed", item_count), ("progress", (done, total)), ("groups", [group, ...]),
+    ("done", cancelled) and ("error", message). "done" or "error" is always
+    the last message.
+
+    With recursive=True the whole tree is scanned directory by directory;
+    there is no "listed" message, progress counts directories (total is
+    None) and items are paths relative to the scanned directory.
+
+    With a ScanIndex only the entries that changed since the stored snapshot
+    are rescored (the updated groups are posted at once), and the result of
+    a scan that was not cancelled is saved back to the index. Recursive
+    scans do not use the index.
+
+    With duplicates=True files with identical content are grouped instead of
+    similar names (see iter_duplicate_groups); progress counts hashed files.
+
+    With a ScanStats the time of each phase and the pairs scored are
+    recorded in it; read it after the "done" message. Hashing files for
+    duplicates is recorded as scoring.
+
+    With a linkage (see graph.LINKAGES) the groups are derived from the
+    similarity graph of the listing, each posted as soon as the part of the
+    graph it comes from is complete (see SimilarityGraph.iter_build).
+    Unless the scan is recursive, the graph is kept in self.graph after the
+    "done" message, so it can be reused without scoring the names again,
+    and self.clusters holds a ClusterIndex of it for incremental updates
+    (built here, so the thread polling the queue never has to), with its
+    components at threshold.
+    With a floor below threshold the graph keeps every pair down to floor,
+    so the groups at any threshold above it can be derived from self.graph
+    (see SimilarityGraph.groups) without a new scan.
+
+    With changed (names created, deleted or renamed since) and a
+    ClusterIndex of the listing in clusters (e.g. self.clusters of an
+    earlier scan), the directory is not listed: only the changed names are
+    added to or removed from the index and scored, and only the groups of
+    the components they touched are derived again (see ClusterIndex.groups).
+    The groups are all posted at once and the updated index is in
+    self.clusters; nothing else may use it until the "done" message.
+    """
+
+    def __init__(self, directory, threshold=DEFAULT_THRESHOLD, method="qgram", cache=None,
+                 workers=1, recursive=False, index=None, duplicates=False, stats=None,
+                 linkage=None, floor=None, clusters=None, changed=None):
+        self.directory = directory
+        self.recursive = recursive
+        self.duplicates = duplicates
+        self.index = index
+        self.threshold = threshold
+        self.method = method
+        self.cache = cache
+        self.workers = workers
+        self.stats = stats
+        self.linkage = linkage
+        self.floor = floor
+        self.graph = None
+        self.clusters = clusters
+        self.changed = changed
+        self.queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="ScanWorker", daemon=True)
+
+    def start(self):
+        """Start scanning"""
+        self.thread.start()
+
+    def cancel(self):
+        """Ask the scan to stop; it finishes with a ("done", True) message"""
+        self.cancel_event.set()
+
+    def is_alive(self):
+        return self.thread.is_alive()
+
+    def drain(self, limit=None):
+        """Return the queued messages (at most limit) without blocking"""
+        messages = []
+        while limit is None or len(messages) < limit:
+            try:
+                messages.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return messages
+
+    def _progress(self, done, total):
+        self.queue.put(("progress", (done, total)))
+
+    def _keep_graph(self, graph):
+        """Keep a complete graph, with a ClusterIndex of it"""
+        self.graph = graph
+        with timed(self.stats, INDEXING):
+            self.clusters = ClusterIndex.from_graph(graph, self.cache, level=self.threshold)
+
+    def _update_clusters(self):
+        """Apply the changed names to self.clusters and return its groups"""
+        clusters = self.clusters
+        clusters.set_stats(self.stats)
+        clock = PhaseClock(self.stats, GROUPING, nested=(SCORING,)) if self.stats is not None else None
+        for name in self.changed:
+            path = os.path.join(self.directory, name)
+            if os.path.isdir(path) or os.path.isfile(path):
+                clusters.add(name)
+            else:
+                clusters.remove(name)
+        groups = clusters.groups(self.linkage, self.threshold)
+        if clock is not None:
+            clock.stop()
+        clusters.set_stats(None)
+        return groups
+
+    def _graph_groups(self, graph):
+        """Keep a complete graph and return its groups"""
+        if not graph.complete:
+            return []
+        self._keep_graph(graph)
+        with timed(self.stats, GROUPING):
+            groups = graph.groups(self.linkage, self.threshold)
+            self.clusters.keep_groups(groups, self.linkage, self.threshold)
+        return groups
+
+    def _scan_graph(self, names):
+        """
+        Score names into a SimilarityGraph down to the floor, yielding the
+        groups of each part of it as soon as that part is complete, and keep
+        the graph once it is
+        """
+        graph = SimilarityGraph(names, graph_floor(self.threshold, self.floor))
+        found = []
+        for group in graph.iter_build(self.method, self.cache, self.workers, self.cancel_event,
+                                      self._progress, self.stats, self.linkage, self.threshold):
+            found.append(group)
+            yield group
+        if graph.complete:
+            self._keep_graph(graph)
+            self.clusters.keep_groups(found, self.linkage, self.threshold)
+
+    def _run(self):
+        stats = self.stats
+        started = time.monotonic()
+        try:
+            entries = snapshot = None
+            if self.changed is not None:
+                groups = self._update_clusters()
+            elif self.duplicates:
+                groups = iter_duplicate_groups(self.directory, self.recursive, cancel=self.cancel_event,
+                                               progress=self._progress)
+                if stats is not None:
+                    groups = self._timed_groups(groups, SCORING)
+            elif self.recursive:
+                groups = iter_tree_groups(self.directory, self.threshold, self.method, self.cache,
+                                          self.workers, self.cancel_event, self._progress, stats,
+                                          self.linkage)
+            elif self.index is not None:
+                with timed(stats, LISTING):
+                    entries = list_entries(self.directory)
+                    self.queue.put(("listed", len(entries)))
+                    snapshot = self.index.load(self.directory, self.threshold, self.linkage,
+                                               self.floor)
+                if snapshot is None:
+                    if self.linkage is None:
+                        groups = iter_similar_groups(list(entries), self.threshold, self.method,
+                                                     self.cache, self.workers, self.cancel_event,
+                                                     self._progress, stats)
+                    else:
+                        groups = self._scan_graph(list(entries))
+                else:
+                    changed = changed_entries(snapshot.entries, entries)
+                    groups = snapshot.groups
+                    if stats is not None:
+                        stats.count("changed_entries", len(changed))
+                    if self.linkage is not None:
+                        graph = snapshot_graph(snapshot)
+                        if changed:
+                            graph = update_graph(graph, list(entries), changed, self.cache, stats)
+                            groups = self._graph_groups(graph)
+                        else:
+                            self._keep_graph(graph)
+                            self.clusters.keep_groups(groups, self.linkage, self.threshold)
+                    elif changed:
+                        groups, _ = update_groups(groups, list(entries), changed, self.threshold,
+                                                  self.cache, stats)
+            else:
+                with timed(stats, LISTING):
+                    items = list_items(self.directory)
+                self.queue.put(("listed", len(items)))
+                if self.linkage is None:
+                    groups = iter_similar_groups(items, self.threshold, self.method, self.cache,
+                                                 self.workers, self.cancel_event, self._progress,
+                                                 stats)
+                else:
+                    groups = self._scan_graph(items)
+
+            found = []
+            batch = []
+            last_post = time.monotonic()
+            for group in groups:
+                found.append(group)
+                batch.append(group)
+                if len(batch) >= BATCH_SIZE or time.monotonic() - last_post >= BATCH_INTERVAL:
+                    self.queue.put(("groups", batch))
+                    batch = []
+                    last_post = time.monotonic()
+            if batch:
+                self.queue.put(("groups", batch))
+
+            cancelled = self.cancel_event.is_set()
+            if entries is not None and not cancelled:
+                if snapshot is None or found != snapshot.groups or entries != snapshot.entries:
+                    edges = list(self.graph.edges()) if self.graph is not None else ()
+                    try:
+                        self.index.save(self.directory, entries, found, self.threshold, snapshot,
+                                        self.linkage, edges, self.floor)
+                    except (OSError, sqlite3.Error) as e:
+                        # The index only speeds up the next start, the scan itself succeeded
+                        logger.warning("Could not save the scan index: %s", e)
+            if stats is not None:
+                stats.count("groups", len(found))
+            logger.info("Scanned %s: %d groups in %.2fs%s", self.directory, len(found),
+                        time.monotonic() - started, " (cancelled)" if cancelled else "")
+            self.queue.put(("done", cancelled))
+        except Exception as e:
+            logger.exception("Scan of %s failed", self.directory)
+            self.queue.put(("error", str(e)))
+
+    def _timed_groups(self, groups, phase):
+        """Record the time spent producing groups as phase"""
+        clock = PhaseClock(self.stats, phase)
+        for group in groups:
+            clock.stop()
+            yield group
+            clock.start()
+        clock.stop()
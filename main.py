@@ -1,55 +1,94 @@
+import logging
 import os
+import sqlite3
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
-import shutil
-from difflib import SequenceMatcher
 import threading
-import time
 import random
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
+from count_corrector import engine, rows
+from count_corrector.cache import ScoreCache, default_cache_path
+from count_corrector.graph import DEFAULT_LINKAGE
+from count_corrector.index import ScanIndex
+from count_corrector.merge import MergeConflict, MergeExecutor, plan_merges
+from count_corrector.roots import MonitoredRoot, ScanScheduler
+from count_corrector.stats import GROUPING, RENDERING, ScanStats, timed
+from count_corrector.worker import ScanWorker
+
+logger = logging.getLogger("count_corrector.app")
+
+# How often the UI checks the scan worker for new groups, and how many
+# messages it handles per check so the window stays responsive
+SCAN_POLL_MS = 100
+SCAN_MESSAGES_PER_POLL = 20
+
+# File system events are collected until none arrived for WATCH_DEBOUNCE
+# seconds, but at most for WATCH_MAX_LATENCY seconds, then handled at once
+WATCH_POLL_MS = 200
+WATCH_DEBOUNCE = 0.5
+WATCH_MAX_LATENCY = 3.0
+
+# Merge dialogs poll their job's progress queue this often, taking this many messages at most
+MERGE_POLL_MS = 100
+MERGE_MESSAGES_PER_POLL = 50
+
+# How groups are formed from the similar pairs, as offered in the Grouping box
+LINKAGE_LABELS = {
+    "single": "Connected",
+    "complete": "Every pair similar",
+    "average": "Similar on average",
+}
+
+# Similarity levels offered as presets. Scans keep every pair down to the
+# lowest of them, so any level on the slider regroups without a new scan
+SIMILARITY_PRESETS = {
+    "Very similar": 0.6,
+    "Somewhat similar": engine.DEFAULT_THRESHOLD,
+    "Minimal similarity": 0.3,
+}
+SIMILARITY_MIN = min(SIMILARITY_PRESETS.values())
+SIMILARITY_MAX = 0.95
+# The groups follow the slider once it rested this long
+THRESHOLD_SETTLE_MS = 150
+
 class FileChangeHandler(FileSystemEventHandler):
-    """Watches for file system events and triggers scanning when files change"""
-    def __init__(self, parent, directory):
+    """Passes file system events on to an EventCoalescer (runs on the watchdog observer thread)"""
+    def __init__(self, directory, events):
         super().__init__()
-        self.parent = parent
         self.directory = directory
-        self.pending_scan = False
-        self.last_scan_time = 0
-        self.min_scan_interval = 3  # Reduced from 10 seconds to 3 seconds for better responsiveness
-        self.changes_detected = False
-        self.throttle_timer = None
-        self.changed_items = set()  # Track specific changed items
+        self.events = events  # Drained on the Tk thread, never touch Tk objects from here
+
+    def relative_path(self, path):
+        """Path relative to the monitored directory, or None if it is outside of it"""
+        if not path:
+            return None
+        rel_path = os.path.relpath(path, self.directory)
+        if rel_path == '.' or rel_path.startswith('..'):
+            return None
+        return rel_path
 
     def on_any_event(self, event):
-        # Ignore directory events and .tmp files
-        if event.is_directory or (hasattr(event, 'src_path') and event.src_path.endswith('.tmp')):
+        # Ignore .tmp files and folder modifications (they only mean the folder's contents changed)
+        src_path = getattr(event, 'src_path', '')
+        if src_path.endswith('.tmp') or (event.is_directory and event.event_type == "modified"):
             return
-            
-        current_time = time.time()
-        print(f"File system event: {event.event_type} {getattr(event, 'src_path', '')}")
-        
-        # Track the changed item
-        if hasattr(event, 'src_path'):
-            src_path = event.src_path
-            # Get path relative to the monitored directory
-            rel_path = os.path.relpath(src_path, self.directory)
-            if rel_path != '.' and not rel_path.startswith('..'):
-                self.changed_items.add(rel_path)
-                
-        if hasattr(event, 'dest_path'):
-            dest_path = event.dest_path
-            # Get path relative to the monitored directory
-            rel_path = os.path.relpath(dest_path, self.directory)
-            if rel_path != '.' and not rel_path.startswith('..'):
-                self.changed_items.add(rel_path)
-        
-        # Mark that changes have been detected (but don't auto-update UI)
-        self.changes_detected = True
-        
-        # Update the status to show something has changed
-        self.parent.status_var.set("Files changed - click Rescan to update the view")
+        if event.event_type not in ("created", "deleted", "modified", "moved"):
+            return
+        
+        src_rel = self.relative_path(src_path)
+        if event.event_type == "moved":
+            dest_rel = self.relative_path(getattr(event, 'dest_path', ''))
+            if src_rel and dest_rel:
+                self.events.add("moved", src_rel, dest_rel)
+            elif dest_rel:
+                # Moved in from outside the monitored directory
+                self.events.add("created", dest_rel)
+            elif src_rel:
+                self.events.add("deleted", src_rel)
+        elif src_rel:
+            self.events.add(event.event_type, src_rel)
 
 class SimilarFolderFinder:
     def __init__(self, root):
@@ -61,9 +100,19 @@ class SimilarFolderFinder:
         
         # Variables
         self.scan_directory = tk.StringVar()
-        self.similarity_threshold = 0.35  # Lowered from 0.4 to catch more similar items
+        self.similarity_threshold = engine.DEFAULT_THRESHOLD  # Lowered from 0.4 to catch more similar items
+        self.scan_workers = os.cpu_count() or 1  # Processes used to score large directories
+        self.linkage = DEFAULT_LINKAGE  # Groups do not depend on the order of the listing
+        self.linkage_var = tk.StringVar(value=LINKAGE_LABELS[self.linkage])
+        self.directory_var = tk.StringVar()  # Monitored directory shown, with its state
+        self.threshold_var = tk.DoubleVar(value=self.similarity_threshold)
+        self.threshold_text = tk.StringVar(value=f"{self.similarity_threshold:.2f}")
+        self.preset_var = tk.StringVar(value=self.preset_label(self.similarity_threshold))
+        self.threshold_timer = None  # Pending regroup after the slider moved
         self.status_var = tk.StringVar(value="Ready")
         self.auto_update_var = tk.BooleanVar(value=False)  # Auto-update disabled by default
+        self.recursive_var = tk.BooleanVar(value=False)  # Also compare names inside subfolders
+        self.duplicates_var = tk.BooleanVar(value=False)  # Group identical files instead of similar names
         
         # Files and filters
         self.all_file_types = set()  # All file types in the directory
@@ -76,16 +125,36 @@ class SimilarFolderFinder:
         self.setup_ui()
         
         # Data storage
-        self.similar_groups = []
         self.excluded_items = set()  # Store excluded items
         
-        # File system observer
+        # Monitored directories, each with its own groups, incremental state, scan and file
+        # events. Results are shown for self.current (a placeholder until one is picked)
+        self.monitored = {}  # directory -> MonitoredRoot
+        self.current = MonitoredRoot("")
+        
+        # One file system observer watches every monitored directory
         self.observer = None
-        self.event_handler = None
+        self.watch_poll_timer = self.root.after(WATCH_POLL_MS, self.poll_file_events)
         
         # Auto scan timer
         self.auto_scan_timer = None
         
+        # Scans of all directories take turns on the same scan slots and scoring processes;
+        # one timer polls the queues of the running scan workers
+        self.scheduler = ScanScheduler(processes=self.scan_workers)
+        self.scan_poll_timer = None
+        
+        # Merges run in the background, several at once when they touch different items
+        self.merge_executor = MergeExecutor()
+        
+        # Listings and groups of earlier scans, so results show right away on the next start
+        self.scan_index = ScanIndex()
+        
+        # Similarity scores from earlier scans (and earlier runs) are reused
+        self.score_cache = ScoreCache(path=default_cache_path())
+        self.score_cache.load()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
         # Define file types mapping
         self.file_types = {
             '.txt': 'Text Document',
@@ -131,11 +200,8 @@ class SimilarFolderFinder:
         directory = filedialog.askdirectory(title="Select Directory to Monitor")
         
         if directory:
-            self.scan_directory.set(directory)
-            # Start file system watcher
-            self.start_watching_directory(directory)
-            # Initial scan
-            self.scan_for_similar()
+            # Start file system watcher and show the last results
+            self.add_directory(directory)
             self.status_var.set(f"Monitoring directory: {directory}")
         else:
             # User canceled directory selection
@@ -143,214 +209,205 @@ class SimilarFolderFinder:
     
     def ensure_watcher_running(self):
         """Ensure the file system watcher is running correctly"""
-        directory = self.scan_directory.get()
-        if directory and os.path.isdir(directory):
-            if not self.observer or not self.observer.is_alive():
-                self.start_watching_directory(directory)
-                self.status_var.set(f"Restarted file monitoring for: {directory}")
-                print("Restarted file system watcher")
+        if self.monitored and (not self.observer or not self.observer.is_alive()):
+            self.start_watching()
+            self.status_var.set(f"Restarted file monitoring for {len(self.monitored)} directories")
+            logger.info("Restarted file system watcher")
     
     def browse_directory(self):
         directory = filedialog.askdirectory()
         if directory:
-            self.scan_directory.set(directory)
-            # Always start monitoring the directory
-            self.start_watching_directory(directory)
-            # Initial scan to display results
-            self.scan_for_similar()
+            # Monitor it too, the directories monitored so far keep being watched
+            self.add_directory(directory)
             # Update status
             self.status_var.set(f"Monitoring directory: {directory}")
     
-    def start_watching_directory(self, directory):
-        """Set up file system monitoring for auto-updates"""
-        # Stop existing observer if any
-        if self.observer:
-            self.observer.stop()
-            self.observer.join()
-            
-        # Create new observer
-        self.event_handler = FileChangeHandler(self, directory)
-        self.observer = Observer()
-        self.observer.schedule(self.event_handler, directory, recursive=True)
-        self.observer.start()
-        print(f"Started monitoring directory: {directory}")
+    def add_directory(self, directory):
+        """Start monitoring a directory (unless it already is) and show its results"""
+        directory = os.path.normpath(directory)
+        folder = self.monitored.get(directory)
+        if folder is None:
+            folder = self.monitored[directory] = MonitoredRoot(directory, WATCH_DEBOUNCE, WATCH_MAX_LATENCY)
+            self.start_watching(folder)
+            self.show_directory(directory)
+            # Show the last results at once, then rescan only what changed
+            self.scan_for_similar(keep_results=self.show_indexed_results(folder), folder=folder)
+        else:
+            self.show_directory(directory)
     
-    def calculate_similarity(self, str1, str2):
+    def remove_directory(self):
+        """Stop monitoring the shown directory and show the next one"""
+        folder = self.monitored.pop(self.current.directory, None)
+        if folder is None:
+            return
+        self.cancel_scan(folder)
+        self.scheduler.discard(folder.directory)
+        if folder.watch is not None and self.observer:
+            try:
+                self.observer.unschedule(folder.watch)
+            except KeyError:
+                pass  # Not watched by the current observer
+        logger.info("Stopped monitoring directory: %s", folder.directory)
+        
+        if self.monitored:
+            self.show_directory(next(iter(self.monitored)))
+        else:
+            self.current = MonitoredRoot("")
+            self.scan_directory.set("")
+            self.clear_results()
+            self.refresh_directory_list()
+            self.status_var.set("No directory monitored. Please use 'Browse' to select a directory.")
+    
+    def show_directory(self, directory):
+        """Show the results of a monitored directory; the others keep being monitored"""
+        self.current = self.monitored[directory]
+        self.scan_directory.set(directory)
+        self.clear_results()
+        self.update_ui_with_groups()
+        self.finish_results_update()
+        if directory in self.scheduler:
+            self.status_var.set(f"Scanning {directory}...")
+        else:
+            self.show_scan_summary()
+        self.refresh_directory_list()
+    
+    def choose_directory(self, event=None):
+        """Show the directory picked in the Monitored box"""
+        index = self.directory_box.current()
+        if 0 <= index < len(self.monitored):
+            self.show_directory(list(self.monitored)[index])
+    
+    def directory_label(self, folder):
+        """Text of a monitored directory in the Monitored box"""
+        if folder.worker is None and folder.directory in self.scheduler:
+            return f"{folder.directory} (queued)"
+        return f"{folder.directory} ({folder.summary()})"
+    
+    def refresh_directory_list(self):
+        """Show the state of every monitored directory in the Monitored box"""
+        self.directory_box["values"] = [self.directory_label(folder) for folder in self.monitored.values()]
+        shown = self.current.directory in self.monitored
+        self.directory_var.set(self.directory_label(self.current) if shown else "")
+    
+    def start_watching(self, folder=None):
         """
-        Calculate similarity between two strings with improved algorithm.
-        Focus on letter-by-letter similarity rather than loose pattern matching.
-        Optimized for speed and accuracy for cases like "wow" and "wow01".
+        Watch a monitored directory for auto-updates. Every directory is
+        watched by the same observer; if it is not running, a new one is
+        started and watches all of them.
         """
-        # Convert to lowercase for case-insensitive comparison
-        s1, s2 = str1.lower(), str2.lower()
-        
-        # Special case: Check if one string is a prefix of another plus numbers
-        # This handles cases like "wow" and "wow01"
-        def is_prefix_plus_numbers(a, b):
-            # Find which string might be the prefix
-            shorter, longer = (a, b) if len(a) <= len(b) else (b, a)
-            
-            # Check if longer starts with shorter
-            if longer.startswith(shorter):
-                # Check if the remaining part is just digits
-                suffix = longer[len(shorter):]
-                if suffix and suffix.isdigit():
-                    return True
-            return False
-        
-        # If one string is a prefix of another plus numbers, consider them very similar
-        if is_prefix_plus_numbers(s1, s2):
-            return 0.9  # High similarity score
-        
-        # Quick rejection for very different lengths (except for prefix+number case which we already handled)
-        if abs(len(s1) - len(s2)) > min(len(s1), len(s2)) // 2:
-            return 0.0
-        
-        # Get the basic similarity ratio
-        basic_ratio = SequenceMatcher(None, s1, s2).ratio()
-        
-        # Quick acceptance for very similar strings
-        if basic_ratio > 0.8:
-            return basic_ratio
-        
-        # Calculate letter position similarity
-        min_len = min(len(s1), len(s2))
-        max_len = max(len(s1), len(s2))
-        
-        # If lengths are very different, reduce similarity
-        length_difference = abs(len(s1) - len(s2))
-        if length_difference > min_len // 2:
-            return basic_ratio * 0.7  # Penalize significantly different lengths
-        
-        # Count matching characters in the same positions
-        position_matches = sum(1 for i in range(min_len) if i < len(s1) and i < len(s2) and s1[i] == s2[i])
-        position_ratio = position_matches / max_len if max_len > 0 else 0
-        
-        # Calculate normalized edit distance (0-1 range)
-        # Use direct comparison for short strings, otherwise use edit distance
-        if max_len < 10:  # For short strings, we can do simple comparison
-            diff_chars = sum(1 for i in range(min_len) if s1[i] != s2[i])
-            edit_ratio = 1.0 - (diff_chars + length_difference) / max(max_len, 1)
+        if self.observer and self.observer.is_alive():
+            if folder is None:
+                return
+            folders = [folder]
         else:
-            # Calculate edit distance (Levenshtein distance)
-            # This measures how many single-character edits are needed to change one string into the other
-            def levenshtein(a, b):
-                # More efficient iterative implementation
-                if a == b: return 0
-                if not a: return len(b)
-                if not b: return len(a)
-                
-                # Initialize matrix
-                matrix = [[0 for _ in range(len(b) + 1)] for _ in range(len(a) + 1)]
-                
-                # Fill first row and column
-                for i in range(len(a) + 1):
-                    matrix[i][0] = i
-                for j in range(len(b) + 1):
-                    matrix[0][j] = j
-                
-                # Fill rest of the matrix
-                for i in range(1, len(a) + 1):
-                    for j in range(1, len(b) + 1):
-                        cost = 0 if a[i-1] == b[j-1] else 1
-                        matrix[i][j] = min(
-                            matrix[i-1][j] + 1,      # deletion
-                            matrix[i][j-1] + 1,      # insertion
-                            matrix[i-1][j-1] + cost  # substitution
-                        )
-                
-                return matrix[len(a)][len(b)]
+            if self.observer:
+                self.observer.stop()
+                self.observer.join()
+            self.observer = Observer()
+            self.observer.start()
+            folders = list(self.monitored.values())
+        for folder in folders:
+            handler = FileChangeHandler(folder.directory, folder.events)
+            folder.watch = self.observer.schedule(handler, folder.directory, recursive=True)
+            logger.info("Started monitoring directory: %s", folder.directory)
+    
+    def poll_file_events(self):
+        """Handle the coalesced file system events of each directory as one update (runs on the Tk thread)"""
+        self.watch_poll_timer = self.root.after(WATCH_POLL_MS, self.poll_file_events)
+        
+        for folder in list(self.monitored.values()):
+            # Let a running or queued scan finish first, it may already include the changes
+            if folder.directory in self.scheduler or not folder.events.due():
+                continue
             
-            try:
-                edit_distance = levenshtein(s1, s2)
-                edit_ratio = 1 - (edit_distance / max(len(s1), len(s2)))
-            except Exception:  # Fall back if there's any issue
-                edit_ratio = basic_ratio
-        
-        # Special case: Exact same string with just a few characters different
-        if len(s1) == len(s2):
-            diff_chars = sum(1 for i in range(len(s1)) if s1[i] != s2[i])
-            # Only boost if just 1-2 character differences in reasonably sized strings
-            if diff_chars <= 2 and len(s1) >= 4:
-                return max(basic_ratio, 0.7)
-                
-        # Special case: One string is almost a complete substring of the other
-        # This helps with cases like "filename" and "filename1" or "file" and "file_old"
-        if len(s1) < len(s2) and s2.startswith(s1) and len(s2) - len(s1) <= 5:
-            return max(0.7, basic_ratio)
-        elif len(s2) < len(s1) and s1.startswith(s2) and len(s1) - len(s2) <= 5:
-            return max(0.7, basic_ratio)
-        
-        # Weigh the different metrics (experimentally determined)
-        # Give more weight to edit distance which catches cursor/kursor type matches better
-        final_ratio = (basic_ratio * 0.3) + (position_ratio * 0.3) + (edit_ratio * 0.4)
-        
-        # The threshold should filter out matches like "Cursor" and "Curolos"
-        return final_ratio
+            changes, overflowed, event_count = folder.events.drain()
+            if not changes and not overflowed:
+                continue
+            logger.debug("%s: %d file system events, %d net changes%s", folder.directory, event_count,
+                         len(changes), " (overflowed)" if overflowed else "")
+            
+            if not self.auto_update_var.get():
+                self.status_var.set(f"Files changed in {folder.directory} - click Rescan to update the view")
+            elif overflowed:
+                # Too many paths changed to track one by one
+                self.scan_for_similar(keep_results=True, folder=folder)
+            else:
+                self.scan_for_changes(changes, folder)
     
-    def exclude_item(self, item_path, item_frame, group_items):
-        """Exclude an item when its Exclude button is clicked"""
+    def calculate_similarity(self, str1, str2):
+        """Calculate similarity between two strings (see engine.calculate_similarity)"""
+        return engine.calculate_similarity(str1, str2)
+    
+    def exclude_item(self, row):
+        """Exclude the item shown in a results row from merging"""
+        item_path = self.row_paths.get(row)
+        if item_path is None:
+            return
         self.excluded_items.add(item_path)
         
-        # Remove from group's non-excluded items
-        if item_path in group_items:
-            group_items.remove(item_path)
-        
         # Visual indication - gray out the item
-        for widget in item_frame.winfo_children():
-            if isinstance(widget, tk.Label):
-                widget.configure(foreground="gray")
-            elif isinstance(widget, ttk.Button) and widget["text"] == "Exclude":
-                # Remove the exclude button
-                widget.destroy()
-                
-                # Add the include button
-                include_btn = ttk.Button(
-                    item_frame, 
-                    text="Include", 
-                    style="TButton",
-                    command=lambda p=item_path, f=item_frame, items=group_items: 
-                        self.include_item(p, f, items)
-                )
-                include_btn.pack(side=tk.RIGHT, padx=5)
+        self.results_tree.item(row, tags=("excluded",))
+        self.results_tree.set(row, "status", "Excluded")
         
         self.status_var.set(f"Item excluded from merging: {os.path.basename(item_path)}")
     
-    def include_item(self, item_path, item_frame, group_items):
-        """Include an item that was previously excluded"""
-        # Remove from excluded set
-        if item_path in self.excluded_items:
-            self.excluded_items.remove(item_path)
-        
-        # Add back to the non-excluded items list
-        if item_path not in group_items:
-            group_items.append(item_path)
+    def include_item(self, row):
+        """Include the item shown in a results row that was previously excluded"""
+        item_path = self.row_paths.get(row)
+        if item_path is None:
+            return
+        self.excluded_items.discard(item_path)
         
         # Restore normal appearance
-        for widget in item_frame.winfo_children():
-            if isinstance(widget, tk.Label):
-                widget.configure(foreground="black")
-            elif isinstance(widget, ttk.Button) and widget["text"] == "Include":
-                # Remove the include button
-                widget.destroy()
-                
-                # Add back the exclude button
-                exclude_btn = ttk.Button(
-                    item_frame, 
-                    text="Exclude", 
-                    style="TButton",
-                    command=lambda p=item_path, f=item_frame, items=group_items: 
-                        self.exclude_item(p, f, items)
-                )
-                exclude_btn.pack(side=tk.RIGHT, padx=5)
+        self.results_tree.item(row, tags=())
+        self.results_tree.set(row, "status", "")
         
         self.status_var.set(f"Item included for merging: {os.path.basename(item_path)}")
     
+    def exclude_selected(self):
+        """Exclude every selected item from merging"""
+        for row in self.results_tree.selection():
+            self.exclude_item(row)
+    
+    def include_selected(self):
+        """Include every selected item for merging again"""
+        for row in self.results_tree.selection():
+            self.include_item(row)
+    
+    def toggle_excluded(self, event):
+        """Exclude or include the double-clicked item"""
+        row = self.results_tree.identify_row(event.y)
+        item_path = self.row_paths.get(row)
+        if item_path is None:
+            return
+        if item_path in self.excluded_items:
+            self.include_item(row)
+        else:
+            self.exclude_item(row)
+        # Keep the double click from also collapsing the group
+        return "break"
+    
+    def merge_selected(self):
+        """Merge the group of the selected rows"""
+        group_rows = {self.results_tree.parent(row) or row for row in self.results_tree.selection()}
+        if not group_rows:
+            messagebox.showinfo("Info", "Select a group or an item in a group to merge.")
+            return
+        if len(group_rows) > 1:
+            messagebox.showinfo("Info", "Select a single group to merge.")
+            return
+        
+        # Merge every item of the group that is not excluded
+        group_row = group_rows.pop()
+        items = [self.row_paths[row] for row in self.group_children.get(group_row, ())]
+        self.merge_group([item for item in items if item not in self.excluded_items])
+    
     def merge_group(self, group_items):
-        """Merge a group when its Merge Group button is clicked"""
+        """Merge a group of items (the non-excluded items of the selected group)"""
         if len(group_items) < 2:
             messagebox.showinfo("Info", "Selected group has less than 2 non-excluded items to merge.")
             return
+        folder = self.current  # Rescanned once the merge is done, even if another one is shown then
         
         # Create merge dialog
         merge_window = tk.Toplevel(self.root)
@@ -389,7 +446,7 @@ class SimilarFolderFinder:
         # Create radio buttons for each source item
         for item in group_items:
             basename = os.path.basename(item)
-            full_path = item if os.path.isabs(item) else os.path.join(self.scan_directory.get(), basename)
+            full_path = item if os.path.isabs(item) else os.path.join(folder.directory, basename)
             
             # Track if it's a file or folder
             item_types[basename] = "file" if os.path.isfile(full_path) else "folder"
@@ -424,6 +481,8 @@ class SimilarFolderFinder:
         progress_bar = ttk.Progressbar(progress_frame, mode='determinate')
         progress_bar.pack(fill=tk.X, pady=5)
         
+        merge_jobs = []  # The MergeJob of this dialog once it started
+        
         def perform_merge():
             # Disable buttons during merge
             merge_btn.configure(state="disabled")
@@ -449,8 +508,8 @@ class SimilarFolderFinder:
                     progress_frame.pack_forget()
                     return
             
-            # Create a folder name for the destination
-            directory = self.scan_directory.get()
+            # Create the destination next to the items (they may be in a subfolder)
+            directory = os.path.dirname(group_items[0]) if os.path.isabs(group_items[0]) else folder.directory
             
             # Start with the selected name as the base folder name
             folder_name = new_name
@@ -460,295 +519,558 @@ class SimilarFolderFinder:
                 folder_name, _ = os.path.splitext(folder_name)
             
             # Make the folder name unique by adding a suffix to avoid conflicts with source items
-            original_folder_name = folder_name
-            folder_name = original_folder_name + "_merged"
+            folder_name = folder_name + "_merged"
             
-            # Create the path for the new parent folder
+            # Create the path for the new parent folder; if it exists, the merge job
+            # numbers it (_merged_1, _merged_2, ...) when it creates it
             new_folder_path = os.path.join(directory, folder_name)
             
-            # If folder with this name already exists, use sequential numbering
-            if os.path.exists(new_folder_path):
-                counter = 1
-                while True:
-                    folder_name = f"{original_folder_name}_merged_{counter}"
-                    new_folder_path = os.path.join(directory, folder_name)
-                    if not os.path.exists(new_folder_path):
-                        break
-                    counter += 1
-                    # Prevent infinite loop if too many folders exist
-                    if counter > 100:
-                        response = messagebox.askquestion("Folder Exists", 
-                            f"Too many similar folders already exist. Would you like to use a different name?")
-                        if response == 'yes':
-                            # Re-enable buttons and return to let user choose different name
-                            merge_btn.configure(state="normal")
-                            cancel_btn.configure(state="normal")
-                            progress_frame.pack_forget()
-                            return
+            # Ensure we have absolute paths; items that no longer exist are reported by the job
+            sources = [item if os.path.isabs(item) else os.path.join(directory, os.path.basename(item))
+                       for item in group_items]
             
-            # Create the new parent folder
-            try:
-                status_var.set(f"Creating parent folder: {folder_name}")
-                merge_window.update_idletasks()
-                
-                if not os.path.exists(new_folder_path):
-                    os.makedirs(new_folder_path)
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to create folder: {str(e)}")
+            # Items that another merge is still moving cannot be merged yet
+            if self.merge_executor.conflicts(sources + [new_folder_path]):
+                messagebox.showwarning("Warning", "Some of these items are still being merged. "
+                                       "Please wait until that merge is done.")
                 merge_btn.configure(state="normal")
                 cancel_btn.configure(state="normal")
                 progress_frame.pack_forget()
                 return
-                
-            # Validate all source items up front to ensure they exist
-            valid_sources = []
-            invalid_paths = []
-            
-            for item in group_items:
-                # Ensure we have absolute paths
-                if not os.path.isabs(item):
-                    full_path = os.path.join(directory, os.path.basename(item))
-                else:
-                    full_path = item
-                
-                # Check if the source item exists
-                if os.path.exists(full_path):
-                    valid_sources.append(full_path)
-                else:
-                    # Try alternative path construction for files
-                    alt_path = os.path.join(directory, os.path.basename(item))
-                    if os.path.exists(alt_path):
-                        valid_sources.append(alt_path)
-                    else:
-                        invalid_paths.append(item)
-                        print(f"Warning: Source item does not exist: {full_path}")
             
-            # If any paths are invalid, alert the user
-            if invalid_paths:
-                warning = f"Some items could not be found and will be skipped:\n"
-                for path in invalid_paths[:3]:
-                    warning += f"- {os.path.basename(path)}\n"
-                if len(invalid_paths) > 3:
-                    warning += f"- and {len(invalid_paths) - 3} more..."
-                messagebox.showwarning("Warning", warning)
-            
-            # If we have no valid sources, abort
-            if not valid_sources:
-                messagebox.showerror("Error", "No valid files or folders to move!")
+            # Create the folder and move the items on a worker thread, progress comes back through the job queue
+            try:
+                job = self.merge_executor.submit(sources, new_folder_path, new_folder=True)
+            except MergeConflict as e:
+                messagebox.showerror("Error", str(e))
                 merge_btn.configure(state="normal")
                 cancel_btn.configure(state="normal")
                 progress_frame.pack_forget()
                 return
+            merge_jobs.append(job)
             
-            # Setup progress bar
-            total_items = len(valid_sources)
-            progress_bar['maximum'] = total_items
+            # Other groups can be merged while this one runs
+            merge_window.grab_release()
+            cancel_btn.configure(state="normal", text="Stop")
+            status_var.set(f"Moving items into '{folder_name}'...")
+            progress_bar['maximum'] = 1
             progress_bar['value'] = 0
             
-            # List for tracking errors
-            errors = []
-            
-            # Move each item into the new parent folder
-            for index, source_path in enumerate(valid_sources):
-                basename = os.path.basename(source_path)
-                dest_path = os.path.join(new_folder_path, basename)
+            def poll_merge():
+                nonlocal folder_name, new_folder_path
+                if not merge_window.winfo_exists():
+                    return
+                for kind, value in job.drain(MERGE_MESSAGES_PER_POLL):
+                    if kind == "folder":
+                        new_folder_path = value
+                        folder_name = os.path.basename(value)
+                        status_var.set(f"Moving items into '{folder_name}'...")
+                    elif kind == "item":
+                        index, total_items, basename = value
+                        status_var.set(f"Moving ({index+1}/{total_items}): {basename}")
+                    elif kind == "bytes":
+                        done_bytes, total_bytes = value
+                        progress_bar['maximum'] = max(total_bytes, 1)
+                        progress_bar['value'] = done_bytes
+                    elif kind == "error":
+                        logger.error("%s", value)
+                    elif kind == "done":
+                        finish_merge(value)
+                        return
+                merge_window.after(MERGE_POLL_MS, poll_merge)
+            
+            def finish_merge(cancelled):
+                errors = list(job.errors)
+                total_items = len(sources)
+                moved = len(job.moved)
                 
-                # Update status and progress
-                status_var.set(f"Moving ({index+1}/{total_items}): {basename}")
-                progress_bar['value'] = index
-                merge_window.update_idletasks()
+                if not moved and not cancelled and errors:
+                    # Nothing could be merged (e.g. no free folder name), let the user try again
+                    messagebox.showerror("Error", "\n".join(errors[:3]) + ("..." if len(errors) > 3 else ""),
+                                         parent=merge_window)
+                    merge_jobs.clear()
+                    merge_window.grab_set()
+                    merge_btn.configure(state="normal")
+                    cancel_btn.configure(state="normal", text="Cancel")
+                    progress_frame.pack_forget()
+                    return
                 
-                try:
-                    # Double-check source exists
-                    if not os.path.exists(source_path):
-                        errors.append(f"Cannot find {basename} - path no longer exists.")
-                        continue
-                    
-                    # Check if destination already exists in the new folder
-                    if os.path.exists(dest_path):
-                        # Add a suffix to avoid name conflicts
-                        counter = 1
-                        base_name, ext = os.path.splitext(basename)
-                        new_item_name = f"{base_name}_copy{ext}"
-                        while os.path.exists(os.path.join(new_folder_path, new_item_name)):
-                            new_item_name = f"{base_name}_copy{counter}{ext}"
-                            counter += 1
-                        dest_path = os.path.join(new_folder_path, new_item_name)
-                    
-                    # Move the item to the destination
-                    print(f"Moving {source_path} to {dest_path}")
-                    shutil.move(source_path, dest_path)
-                    print(f"Successfully moved {source_path} to {dest_path}")
-                    
-                except Exception as e:
-                    error_msg = f"Error moving {basename}: {str(e)}"
-                    errors.append(error_msg)
-                    print(f"Error: {error_msg}")
+                # Create desktop shortcut if requested (COM objects belong to the Tk thread)
+                if shortcut_var.get() and moved:
+                    try:
+                        status_var.set("Creating desktop shortcut...")
+                        
+                        # Get desktop path
+                        desktop_dir = os.path.join(os.path.expanduser("~"), "Desktop")
+                        
+                        if os.path.exists(desktop_dir):
+                            if os.name == 'nt':  # Windows
+                                try:
+                                    import winshell
+                                    from win32com.client import Dispatch
+                                    
+                                    shortcut_path = os.path.join(desktop_dir, f"{folder_name}.lnk")
+                                    
+                                    # Get absolute path to the folder
+                                    abs_folder_path = os.path.abspath(new_folder_path)
+                                    
+                                    # Create shortcut that points to Explorer with the folder as argument
+                                    shell = Dispatch('WScript.Shell')
+                                    shortcut = shell.CreateShortCut(shortcut_path)
+                                    shortcut.TargetPath = "explorer.exe"
+                                    shortcut.Arguments = f'"{abs_folder_path}"'
+                                    shortcut.WorkingDirectory = os.path.dirname(abs_folder_path)
+                                    shortcut.IconLocation = "%SystemRoot%\\System32\\shell32.dll,3"
+                                    shortcut.save()
+                                    
+                                    status_var.set("Desktop shortcut created successfully!")
+                                except ImportError:
+                                    # If winshell is not available, try direct method
+                                    import win32com.client
+                                    
+                                    shortcut_path = os.path.join(desktop_dir, f"{folder_name}.lnk")
+                                    
+                                    # Get absolute path to the folder
+                                    abs_folder_path = os.path.abspath(new_folder_path)
+                                    
+                                    # Create shortcut that points to Explorer
+                                    shell = win32com.client.Dispatch("WScript.Shell")
+                                    shortcut = shell.CreateShortCut(shortcut_path)
+                                    shortcut.TargetPath = "explorer.exe"
+                                    shortcut.Arguments = f'"{abs_folder_path}"'
+                                    shortcut.WorkingDirectory = os.path.dirname(abs_folder_path)
+                                    shortcut.IconLocation = "%SystemRoot%\\System32\\shell32.dll,3"
+                                    shortcut.save()
+                            else:  # Unix-like systems
+                                # Create symbolic link
+                                shortcut_path = os.path.join(desktop_dir, folder_name)
+                                os.symlink(new_folder_path, shortcut_path)
+                    except Exception as e:
+                        errors.append(f"Error creating shortcut: {str(e)}")
+                        logger.error("Shortcut error: %s", e)
                 
-                # Update progress
-                progress_bar['value'] = index + 1
-                merge_window.update_idletasks()
-            
-            # Create desktop shortcut if requested
-            if shortcut_var.get():
-                try:
-                    status_var.set("Creating desktop shortcut...")
-                    merge_window.update_idletasks()
-                    
-                    # Get desktop path
-                    desktop_dir = os.path.join(os.path.expanduser("~"), "Desktop")
-                    
-                    if os.path.exists(desktop_dir):
-                        if os.name == 'nt':  # Windows
-                            try:
-                                import winshell
-                                from win32com.client import Dispatch
-                                
-                                shortcut_path = os.path.join(desktop_dir, f"{folder_name}.lnk")
-                                
-                                # Get absolute path to the folder
-                                abs_folder_path = os.path.abspath(new_folder_path)
-                                
-                                # Create shortcut that points to Explorer with the folder as argument
-                                shell = Dispatch('WScript.Shell')
-                                shortcut = shell.CreateShortCut(shortcut_path)
-                                shortcut.TargetPath = "explorer.exe"
-                                shortcut.Arguments = f'"{abs_folder_path}"'
-                                shortcut.WorkingDirectory = os.path.dirname(abs_folder_path)
-                                shortcut.IconLocation = "%SystemRoot%\\System32\\shell32.dll,3"
-                                shortcut.save()
-                                
-                                status_var.set("Desktop shortcut created successfully!")
-                            except ImportError:
-                                # If winshell is not available, try direct method
-                                import win32com.client
-                                
-                                shortcut_path = os.path.join(desktop_dir, f"{folder_name}.lnk")
-                                
-                                # Get absolute path to the folder
-                                abs_folder_path = os.path.abspath(new_folder_path)
-                                
-                                # Create shortcut that points to Explorer
-                                shell = win32com.client.Dispatch("WScript.Shell")
-                                shortcut = shell.CreateShortCut(shortcut_path)
-                                shortcut.TargetPath = "explorer.exe"
-                                shortcut.Arguments = f'"{abs_folder_path}"'
-                                shortcut.WorkingDirectory = os.path.dirname(abs_folder_path)
-                                shortcut.IconLocation = "%SystemRoot%\\System32\\shell32.dll,3"
-                                shortcut.save()
-                        else:  # Unix-like systems
-                            # Create symbolic link
-                            shortcut_path = os.path.join(desktop_dir, folder_name)
-                            os.symlink(new_folder_path, shortcut_path)
-                except Exception as e:
-                    errors.append(f"Error creating shortcut: {str(e)}")
-                    print(f"Shortcut error: {str(e)}")
-            
-            # Finalize progress
-            progress_bar['value'] = progress_bar['maximum']
-            
-            # Set status based on success or errors
-            if errors:
-                status_var.set(f"Completed with {len(errors)} errors.")
-            else:
-                status_var.set("DONE! Items moved successfully!")
+                # Finalize progress
+                progress_bar['value'] = progress_bar['maximum']
                 
-            merge_window.update_idletasks()
-            
-            # Report any errors
-            if errors:
-                messagebox.showwarning("Warning", f"Merged with {len(errors)} errors:\n" + "\n".join(errors[:3]) + 
-                                     ("..." if len(errors) > 3 else ""))
-            
-            # Update the results
-            self.scan_for_similar()
+                # Set status based on success or errors
+                if cancelled:
+                    status_var.set(f"Stopped after {moved} of {total_items} items.")
+                elif errors:
+                    status_var.set(f"Completed with {len(errors)} errors.")
+                else:
+                    status_var.set("DONE! Items moved successfully!")
+                
+                # Report any errors
+                if errors:
+                    messagebox.showwarning("Warning", f"Merged with {len(errors)} errors:\n" + "\n".join(errors[:3]) + 
+                                         ("..." if len(errors) > 3 else ""), parent=merge_window)
+                
+                # Update the results
+                self.scan_for_similar(keep_results=True, folder=folder)
+                
+                # Show completion message
+                if cancelled:
+                    messagebox.showinfo("Stopped", f"Moved {moved} of {total_items} items into '{folder_name}'", parent=merge_window)
+                elif errors:
+                    messagebox.showinfo("Partial Success", f"Moved {moved} of {total_items} items into '{folder_name}'", parent=merge_window)
+                else:
+                    messagebox.showinfo("Success", f"DONE! All items have been moved into '{folder_name}'", parent=merge_window)
+                
+                # Close merge window
+                merge_window.destroy()
             
-            # Show completion message
-            if errors:
-                messagebox.showinfo("Partial Success", f"Moved {total_items - len(errors)} of {total_items} items into '{folder_name}'")
+            poll_merge()
+        
+        def cancel_merge():
+            # Stop a running merge after its current item, otherwise just close
+            if merge_jobs:
+                merge_jobs[0].cancel()
+                cancel_btn.configure(state="disabled")
+                status_var.set("Stopping after the current item...")
             else:
-                messagebox.showinfo("Success", f"DONE! All items have been moved into '{folder_name}'")
-            
-            # Close merge window
-            merge_window.destroy()
+                merge_window.destroy()
         
         # Button frame
         button_frame = ttk.Frame(merge_window)
         button_frame.pack(fill=tk.X, pady=10)
         
-        cancel_btn = ttk.Button(button_frame, text="Cancel", command=merge_window.destroy)
+        cancel_btn = ttk.Button(button_frame, text="Cancel", command=cancel_merge)
         cancel_btn.pack(side=tk.RIGHT, padx=10)
         
         merge_btn = ttk.Button(button_frame, text="Merge", command=perform_merge)
         merge_btn.pack(side=tk.RIGHT, padx=5)
+        merge_window.protocol("WM_DELETE_WINDOW", cancel_merge)
     
-    def scan_for_similar(self):
-        try:
-            directory = self.scan_directory.get()
-            if not directory or not os.path.isdir(directory):
-                self.status_var.set("Please select a valid directory to scan")
+    def merge_all_groups(self):
+        """Plan the merge of every shown group, show the plan and carry it out in one pass"""
+        folder = self.current
+        groups = []
+        for group_row in self.group_children:
+            if group_row not in self.visible_groups:
+                continue
+            items = [self.row_paths[row] for row in self.group_children[group_row]]
+            items = [item for item in items if item not in self.excluded_items]
+            if len(items) >= 2:
+                groups.append([item if os.path.isabs(item) else os.path.join(folder.directory, item)
+                               for item in items])
+        if not groups:
+            messagebox.showinfo("Info", "There are no groups with at least 2 non-excluded items to merge.")
+            return
+        
+        self.status_var.set(f"Planning the merge of {len(groups)} groups...")
+        self.root.update_idletasks()
+        plan = plan_merges(groups)
+        self.status_var.set(f"Planned {len(plan)} merges")
+        if not len(plan):
+            messagebox.showinfo("Info", "None of the groups has at least 2 items left to merge.")
+            return
+        
+        # Dry run: show every folder and move before anything is touched
+        plan_window = tk.Toplevel(self.root)
+        plan_window.title("Merge All Groups")
+        plan_window.geometry("700x500")
+        plan_window.transient(self.root)
+        
+        moves = plan.moves()
+        summary = f"{len(plan)} folders will be created and {len(moves)} items moved into them."
+        if plan.missing:
+            summary += f" {len(plan.missing)} items were not found and will be skipped."
+        ttk.Label(plan_window, text=summary, font=('', 10, 'bold'), wraplength=660).pack(pady=10, padx=20, anchor=tk.W)
+        
+        text_frame = ttk.Frame(plan_window)
+        text_frame.pack(fill=tk.BOTH, expand=True, padx=20)
+        text_scrollbar = ttk.Scrollbar(text_frame)
+        text_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        plan_text = tk.Text(text_frame, wrap=tk.NONE, yscrollcommand=text_scrollbar.set)
+        plan_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        text_scrollbar.config(command=plan_text.yview)
+        # One insert for the whole plan, so thousands of groups show at once
+        plan_text.insert("1.0", plan.describe())
+        plan_text.configure(state="disabled")
+        
+        status_var = tk.StringVar(value="Nothing has been moved yet.")
+        ttk.Label(plan_window, textvariable=status_var).pack(fill=tk.X, padx=20, pady=(10, 0))
+        progress_bar = ttk.Progressbar(plan_window, mode='determinate')
+        progress_bar.pack(fill=tk.X, padx=20, pady=5)
+        
+        plan_jobs = []
+        
+        def run_plan():
+            try:
+                job = self.merge_executor.submit_plan(plan)
+            except MergeConflict as e:
+                messagebox.showerror("Error", str(e), parent=plan_window)
                 return
+            plan_jobs.append(job)
+            run_btn.configure(state="disabled")
+            cancel_btn.configure(text="Stop")
             
-            threshold = self.similarity_threshold
-            
-            # Reset our list of similar groups
-            self.similar_groups = []
-            
-            # Get all folders and files in the directory
-            items = [item for item in os.listdir(directory) 
-                   if os.path.isdir(os.path.join(directory, item)) or 
-                      os.path.isfile(os.path.join(directory, item))]
+            def poll_plan():
+                if not plan_window.winfo_exists():
+                    return
+                for kind, value in job.drain(MERGE_MESSAGES_PER_POLL):
+                    if kind == "item":
+                        index, total_items, basename = value
+                        status_var.set(f"Moving ({index+1}/{total_items}): {basename}")
+                    elif kind == "bytes":
+                        done_bytes, total_bytes = value
+                        progress_bar['maximum'] = max(total_bytes, 1)
+                        progress_bar['value'] = done_bytes
+                    elif kind == "error":
+                        logger.error("%s", value)
+                    elif kind == "done":
+                        finish_plan(value)
+                        return
+                plan_window.after(MERGE_POLL_MS, poll_plan)
+            
+            poll_plan()
+        
+        def finish_plan(cancelled):
+            errors = plan_jobs[0].errors
+            moved = len(plan_jobs[0].moved)
+            progress_bar['value'] = progress_bar['maximum']
+            if cancelled:
+                status_var.set(f"Stopped after {moved} of {len(moves)} items.")
+            elif errors:
+                status_var.set(f"Completed with {len(errors)} errors.")
+            else:
+                status_var.set("DONE! Items moved successfully!")
             
-            # Find similar items
-            processed = set()
-            for i, item1 in enumerate(items):
-                # Update status
-                self.status_var.set(f"Scanning: {i+1}/{len(items)} - {item1}")
-                
-                # Allow UI to update
-                self.root.update_idletasks()
-                
-                if item1 in processed:
-                    continue
-                    
-                group = [item1]
-                for j, item2 in enumerate(items):
-                    if i != j and item2 not in processed:
-                        similarity = self.calculate_similarity(item1, item2)
-                        if similarity >= threshold:
-                            group.append(item2)
-                            processed.add(item2)
-                
-                if len(group) > 1:  # Only add groups with multiple similar items
-                    self.similar_groups.append(group)
-                    processed.add(item1)
+            # One rescan for all the merged groups
+            self.scan_for_similar(keep_results=True, folder=folder)
             
-            # Now update the UI with the similar groups
+            if errors:
+                messagebox.showwarning("Warning", f"Merged with {len(errors)} errors:\n" + "\n".join(errors[:3]) + 
+                                     ("..." if len(errors) > 3 else ""), parent=plan_window)
+            messagebox.showinfo("Merge All Groups", f"Moved {moved} of {len(moves)} items into {len(plan)} folders",
+                                parent=plan_window)
+            plan_window.destroy()
+        
+        def cancel_plan():
+            # Stop a running merge after its current item, otherwise just close
+            if plan_jobs:
+                plan_jobs[0].cancel()
+                cancel_btn.configure(state="disabled")
+                status_var.set("Stopping after the current item...")
+            else:
+                plan_window.destroy()
+        
+        button_frame = ttk.Frame(plan_window)
+        button_frame.pack(fill=tk.X, pady=10)
+        cancel_btn = ttk.Button(button_frame, text="Cancel", command=cancel_plan)
+        cancel_btn.pack(side=tk.RIGHT, padx=10)
+        run_btn = ttk.Button(button_frame, text="Merge All", command=run_plan)
+        run_btn.pack(side=tk.RIGHT, padx=5)
+        plan_window.protocol("WM_DELETE_WINDOW", cancel_plan)
+    
+    def show_indexed_results(self, folder):
+        """Show the groups stored by the last scan of a monitored directory. Returns whether there were any."""
+        if self.recursive_var.get() or self.duplicates_var.get():
+            return False
+        try:
+            snapshot = self.scan_index.load(folder.directory, self.similarity_threshold, self.linkage,
+                                            SIMILARITY_MIN)
+        except (OSError, sqlite3.Error) as e:
+            logger.error("Error reading scan index: %s", e)
+            return False
+        if snapshot is None:
+            return False
+        
+        folder.groups = snapshot.groups
+        if folder is self.current:
             self.update_ui_with_groups()
+            self.status_var.set(f"Showing {len(snapshot.groups)} groups from the last scan - checking for changes...")
+        return True
+
+    def scan_for_similar(self, keep_results=False, folder=None):
+        """
+        Scan a monitored directory (by default the one shown) on a background
+        worker; groups appear as they are found. With keep_results the groups
+        shown now stay until the scan is done and are then updated in place,
+        keeping the scroll position and selection. Scans of the shown
+        directory go first, other directories wait for their turn.
+        """
+        try:
+            if folder is None:
+                directory = self.scan_directory.get()
+                if not directory or not os.path.isdir(directory):
+                    self.status_var.set("Please select a valid directory to scan")
+                    return
+                folder = self.monitored.get(os.path.normpath(directory))
+                if folder is None:
+                    # A directory typed in the entry, monitor it from now on
+                    self.add_directory(directory)
+                    return
+            elif self.monitored.get(folder.directory) is not folder:
+                return  # No longer monitored
+            
+            # Stop a scan that is still running, its results are outdated
+            self.cancel_scan(folder)
+            folder.reset()
             
-            if len(self.similar_groups) == 0:
-                self.status_var.set("No similar items found")
+            # Reset our list of similar groups
+            folder.pending_groups = []
+            if keep_results:
+                folder.results_stale = True
             else:
-                groups = len(self.similar_groups)
-                items = sum(len(group) for group in self.similar_groups)
-                self.status_var.set(f"Found {groups} groups with {items} similar items")
+                folder.results_stale = False
+                folder.groups = []
+                if folder is self.current:
+                    self.clear_results()
+                    self.status_var.set("Scanning...")
+            
+            self.scheduler.request(folder.directory, urgent=folder is self.current)
+            self.start_scans()
         
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred during scanning: {str(e)}")
             self.status_var.set("Error during scan")
 
-    def scan_for_changes(self, changed_items):
-        """Scan only the changed items for similarity instead of the whole directory"""
+    def rescan_all(self):
+        """Scan every monitored directory again, e.g. after the kind of scan changed"""
+        if not self.monitored:
+            self.scan_for_similar()
+            return
+        for folder in list(self.monitored.values()):
+            self.scan_for_similar(folder=folder)
+
+    def start_scans(self):
+        """Start the queued scans the scheduler has a slot for"""
+        recursive = self.recursive_var.get()
+        duplicates = self.duplicates_var.get()
+        for directory in self.scheduler.start():
+            folder = self.monitored[directory]
+            if folder.pending_changes is not None:
+                # Update the index of the last scan; it belongs to the worker until it is done
+                folder.worker = ScanWorker(directory, self.similarity_threshold, cache=self.score_cache,
+                                           stats=folder.stats, linkage=self.linkage,
+                                           clusters=folder.clusters, changed=folder.pending_changes)
+                folder.clusters = None
+                folder.pending_changes = None
+                folder.worker.start()
+                continue
+            folder.stats = ScanStats(f"Scan of {directory}")
+            folder.worker = ScanWorker(directory, self.similarity_threshold,
+                                       cache=self.score_cache, workers=self.scheduler.workers(),
+                                       recursive=recursive, duplicates=duplicates,
+                                       index=None if recursive or duplicates else self.scan_index,
+                                       stats=folder.stats, linkage=self.linkage,
+                                       floor=SIMILARITY_MIN)
+            folder.worker.start()
+        if self.scan_poll_timer is None and self.scheduler.running:
+            self.scan_poll_timer = self.root.after(SCAN_POLL_MS, self.poll_scan_queue)
+        self.refresh_directory_list()
+
+    def cancel_scan(self, folder=None):
+        """Cancel the running background scan of a directory (by default of every directory), if any"""
+        for folder in [folder] if folder is not None else list(self.monitored.values()):
+            if folder.worker:
+                folder.worker.cancel()
+                folder.worker = None
+                self.scheduler.finished(folder.directory)
+
+    def poll_scan_queue(self):
+        """Take in the groups the scan workers have found so far (runs on the Tk thread)"""
+        self.scan_poll_timer = None
+        finished = False
+        for folder in list(self.monitored.values()):
+            if folder.worker is not None:
+                finished = self.poll_folder_scan(folder) or finished
+        if finished:
+            # Freed slots go to the directories waiting longest
+            self.start_scans()
+        if self.scan_poll_timer is None and self.scheduler.running:
+            self.scan_poll_timer = self.root.after(SCAN_POLL_MS, self.poll_scan_queue)
+
+    def poll_folder_scan(self, folder):
+        """
+        Handle the messages of one directory's scan worker; only the shown
+        directory updates the results view. Returns whether the scan ended.
+        """
+        worker = folder.worker
+        shown = folder is self.current
+        for kind, value in worker.drain(SCAN_MESSAGES_PER_POLL):
+            if kind == "listed":
+                if shown:
+                    self.status_var.set(f"Scanning {value} items...")
+            elif kind == "progress":
+                if not shown:
+                    continue
+                done, total = value
+                found = len(folder.pending_groups) if folder.results_stale else len(folder.groups)
+                if total is None:
+                    # Recursive scans count folders, their total is not known up front
+                    self.status_var.set(f"Scanning: {done} folders - found {found} groups")
+                else:
+                    self.status_var.set(f"Scanning: {done}/{total} - found {found} groups")
+            elif kind == "groups":
+                if folder.results_stale:
+                    # The shown results are updated once the scan is done
+                    folder.pending_groups.extend(value)
+                    continue
+                # Show new groups right away
+                with timed(folder.stats, RENDERING):
+                    for group in value:
+                        folder.groups.append(group)
+                        if shown:
+                            self.add_group_to_ui(group)
+            elif kind == "error":
+                folder.worker = None
+                self.scheduler.finished(folder.directory)
+                folder.results_stale = False
+                folder.pending_groups = []
+                messagebox.showerror("Error", f"An error occurred while scanning {folder.directory}: {value}")
+                if shown:
+                    self.status_var.set("Error during scan")
+                return True
+            elif kind == "done":
+                folder.worker = None
+                self.scheduler.finished(folder.directory)
+                folder.graph = worker.graph
+                folder.clusters = worker.clusters
+                folder.scanned = True
+                with timed(folder.stats, RENDERING):
+                    if folder.results_stale:
+                        folder.results_stale = False
+                        if not value:
+                            # Only a finished scan replaces the shown results
+                            folder.groups = folder.pending_groups
+                            if shown:
+                                self.update_ui_with_groups()
+                        folder.pending_groups = []
+                    elif shown:
+                        self.finish_results_update()
+                if shown:
+                    self.show_scan_summary()
+                return True
+        return False
+
+    def show_scan_summary(self):
+        """Show the number of groups found in the status bar"""
+        if len(self.current.groups) == 0:
+            self.status_var.set("No similar items found")
+        else:
+            groups = len(self.current.groups)
+            items = sum(len(group) for group in self.current.groups)
+            self.status_var.set(f"Found {groups} groups with {items} similar items")
+
+    def show_stats(self):
+        """Show where the time of the last scan of the shown directory went and how its pairs were decided"""
+        stats_window = tk.Toplevel(self.root)
+        stats_window.title("Scan Statistics")
+        stats_window.geometry("520x420")
+        stats_window.transient(self.root)
+        
+        stats_text = tk.Text(stats_window, wrap=tk.NONE, font=("TkFixedFont", 10))
+        stats_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        def refresh():
+            stats_text.configure(state="normal")
+            stats_text.delete("1.0", tk.END)
+            if self.current.stats is None:
+                stats_text.insert("1.0", "No scan has run yet.")
+            else:
+                stats_text.insert("1.0", "\n".join(self.current.stats.summary()))
+            stats_text.configure(state="disabled")
+        
+        def save_json():
+            if self.current.stats is None:
+                return
+            path = filedialog.asksaveasfilename(parent=stats_window, defaultextension=".json",
+                                                filetypes=[("JSON", "*.json")])
+            if not path:
+                return
+            try:
+                self.current.stats.dump(path)
+            except OSError as e:
+                messagebox.showerror("Error", f"Could not save the statistics: {e}", parent=stats_window)
+        
+        button_frame = ttk.Frame(stats_window)
+        button_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+        ttk.Button(button_frame, text="Close", command=stats_window.destroy).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(button_frame, text="Save JSON...", command=save_json).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(button_frame, text="Refresh", command=refresh).pack(side=tk.RIGHT, padx=5)
+        refresh()
+
+    def scan_for_changes(self, changed_items, folder=None):
+        """
+        Scan only the changed items of a monitored directory (by default the
+        one shown) for similarity instead of the whole directory, on a
+        background worker like a full scan
+        """
         try:
-            directory = self.scan_directory.get()
+            folder = folder or self.current
+            directory = folder.directory
             if not directory or not os.path.isdir(directory):
                 self.status_var.set("Please select a valid directory to scan")
                 return
             
-            threshold = self.similarity_threshold
+            # Groups of a recursive or duplicate scan span many folders, rescan them all
+            if self.recursive_var.get() or self.duplicates_var.get():
+                self.scan_for_similar(keep_results=True, folder=folder)
+                return
             
-            # Initialize group_updates to track whether we need to update the UI
-            group_updates = False
+            threshold = self.similarity_threshold
             
             # Convert changed_items from paths to basenames for comparison
             changed_basenames = set()
@@ -760,196 +1082,251 @@ class SimilarFolderFinder:
                 # Add basename to our set
                 changed_basenames.add(os.path.basename(item_path))
             
-            # Get all folders and files in the directory
-            all_items = [item for item in os.listdir(directory) 
-                      if os.path.isdir(os.path.join(directory, item)) or 
-                         os.path.isfile(os.path.join(directory, item))]
-            
-            # Update existing similar groups if they contain any changed items
-            updated_groups = []
-            still_exists = set(all_items)  # Track items that still exist
-            
-            # First pass: Update existing groups and identify items that no longer exist
-            for group in self.similar_groups:
-                group_contains_changes = False
-                updated_group = []
-                
-                for item in group:
-                    if item in still_exists:
-                        updated_group.append(item)
-                        if item in changed_basenames:
-                            group_contains_changes = True
-                    else:
-                        # Item no longer exists, mark for UI update
-                        group_updates = True
-                
-                # If the group contains changed items or lost items, recalculate similarities
-                if group_contains_changes or len(updated_group) != len(group):
-                    # Group needs recalculation
-                    group_updates = True
-                    # Skip empty groups
-                    if len(updated_group) <= 1:
-                        continue
-                        
-                    # Recalculate group similarities
-                    seed_item = updated_group[0]
-                    new_group = [seed_item]
-                    
-                    for item in all_items:
-                        if item != seed_item and item not in [g[0] for g in updated_groups]:
-                            similarity = self.calculate_similarity(seed_item, item)
-                            if similarity >= threshold:
-                                new_group.append(item)
-                    
-                    if len(new_group) > 1:
-                        updated_groups.append(new_group)
-                else:
-                    # Group unchanged, keep as is
-                    updated_groups.append(updated_group)
-            
-            # Second pass: Check if changed items form new groups
-            for changed_item in changed_basenames:
-                # Skip if item is already in a group
-                if any(changed_item in group for group in updated_groups):
-                    continue
-                    
-                # Check if this changed item forms a new group
-                if changed_item in still_exists:
-                    group = [changed_item]
-                    for item in all_items:
-                        if item != changed_item and item not in [g[0] for g in updated_groups]:
-                            similarity = self.calculate_similarity(changed_item, item)
-                            if similarity >= threshold:
-                                group.append(item)
-                                
-                    if len(group) > 1:
-                        updated_groups.append(group)
-                        group_updates = True
-            
-            # If no groups changed, no need to update UI
-            if not group_updates:
-                print("No changes to similar groups detected, skipping UI update")
+            if folder.clusters is None or folder.clusters.threshold > threshold:
+                # No index from a finished scan to update (e.g. it was cancelled), scan on a worker
+                self.scan_for_similar(keep_results=True, folder=folder)
                 return
-                
-            # Update our similar groups
-            self.similar_groups = updated_groups
-            
-            # Now update the UI with the new groups
-            self.update_ui_with_groups()
             
-            if len(self.similar_groups) == 0:
-                self.status_var.set("No similar items found")
-            else:
-                groups = len(self.similar_groups)
-                items = sum(len(group) for group in self.similar_groups)
-                self.status_var.set(f"Found {groups} groups with {items} similar items")
+            folder.stats = ScanStats(f"Update of {directory}")
+            folder.stats.count("changed_entries", len(changed_basenames))
+            # A worker scores only the changed entries, against their candidates, and
+            # groups only the components they touched; the shown groups stay until then
+            folder.graph = None
+            folder.pending_changes = changed_basenames
+            folder.pending_groups = []
+            folder.results_stale = True
+            self.scheduler.request(folder.directory, urgent=folder is self.current)
+            self.start_scans()
         
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred during targeted scanning: {str(e)}")
             self.status_var.set("Error during scan")
             
+    def change_linkage(self, event=None):
+        """Regroup with the linkage picked in the Grouping box"""
+        labels = {label: linkage for linkage, label in LINKAGE_LABELS.items()}
+        linkage = labels.get(self.linkage_var.get(), DEFAULT_LINKAGE)
+        if linkage == self.linkage:
+            return
+        self.linkage = linkage
+        self.regroup()
+
+    def preset_label(self, threshold):
+        """Name of the preset with this threshold, or Custom"""
+        for label, value in SIMILARITY_PRESETS.items():
+            if abs(value - threshold) < 1e-9:
+                return label
+        return "Custom"
+
+    def choose_preset(self, event=None):
+        """Move the slider to the preset picked in the Similarity box and regroup"""
+        threshold = SIMILARITY_PRESETS.get(self.preset_var.get())
+        if threshold is None:
+            return
+        self.threshold_var.set(threshold)
+        self.threshold_text.set(f"{threshold:.2f}")
+        self.change_threshold(threshold)
+
+    def slide_threshold(self, value):
+        """Follow the slider; the groups are updated once it rests for a moment"""
+        threshold = round(float(value), 2)
+        self.threshold_text.set(f"{threshold:.2f}")
+        if self.threshold_timer:
+            self.root.after_cancel(self.threshold_timer)
+        self.threshold_timer = self.root.after(THRESHOLD_SETTLE_MS, self.settle_threshold)
+
+    def settle_threshold(self):
+        """Regroup at the threshold the slider came to rest on"""
+        self.threshold_timer = None
+        self.change_threshold(round(self.threshold_var.get(), 2))
+
+    def change_threshold(self, threshold):
+        """Group at a new similarity threshold"""
+        self.preset_var.set(self.preset_label(threshold))
+        if threshold == self.similarity_threshold:
+            return
+        self.similarity_threshold = threshold
+        self.regroup()
+
+    def regroup(self):
+        """
+        Derive the groups of every monitored directory again from the
+        similarity graph of its last scan (or update), at the current
+        threshold and linkage, without scoring any names
+        """
+        if self.duplicates_var.get():
+            return  # Identical files do not depend on the similarity settings
+        for folder in list(self.monitored.values()):
+            # A queued or running scan replaces the graph anyway
+            graph = None if folder.directory in self.scheduler else folder.similarity_graph()
+            if graph is None or graph.threshold > self.similarity_threshold:
+                # Nothing to regroup from yet (e.g. recursive scans), scan again
+                self.scan_for_similar(keep_results=True, folder=folder)
+                continue
+
+            stats = folder.stats = ScanStats(f"Regrouping of {folder.directory}")
+            with stats.phase(GROUPING):
+                folder.groups = graph.groups(self.linkage, self.similarity_threshold)
+                if folder.clusters is not None:
+                    folder.clusters.keep_groups(folder.groups, self.linkage, self.similarity_threshold)
+            if folder is self.current:
+                with stats.phase(RENDERING):
+                    self.update_ui_with_groups()
+                self.show_scan_summary()
+        self.refresh_directory_list()
+            
     def update_ui_with_groups(self):
-        """Update the UI with the current similar groups"""
-        # Clear previous results
-        for widget in self.results_frame.winfo_children():
-            widget.destroy()
+        """
+        Update the results view to show the current similar groups.
+        Rows have stable ids (derived from the item paths), so only the groups
+        that changed are touched; selection, exclusions and the scroll
+        position of everything else are kept.
+        """
+        tree = self.results_tree
+        scroll_position = tree.yview()[0]
+        
+        # Wanted rows: group row -> item rows, in the order of the shown directory's groups
+        old_children = self.group_children
+        diff = rows.diff_results(old_children, self.current.groups, self.current.directory)
+        new_children = diff.children
+        changed = diff.changed
+        
+        # Items that are no longer in any group
+        stale_rows = diff.stale_rows
+        if stale_rows:
+            tree.delete(*stale_rows)
+            for row in stale_rows:
+                del self.row_paths[row]
+                del self.row_types[row]
+        
+        # New and changed groups get their rows created, the rest is left alone
+        for group_row in changed:
+            item_rows = new_children[group_row]
+            if not tree.exists(group_row):
+                tree.insert("", tk.END, iid=group_row, open=True)
+            tree.item(group_row, text=self.group_label(diff.first_items[group_row]),
+                      values=(f"{len(item_rows)} items", ""))
+            for row in item_rows:
+                if row not in self.row_paths:
+                    self.insert_item_row(group_row, row[len("item:"):])
+        
+        # Removed groups go last, their items have been deleted or moved by now
+        removed = diff.removed
+        for group_row in removed:
+            for row in old_children[group_row]:
+                if row in self.row_paths and tree.parent(row) == group_row:
+                    tree.detach(row)
+        if removed:
+            tree.delete(*removed)
+            self.visible_groups.difference_update(removed)
+            for group_row in removed:
+                self.unindex_group(group_row)
+        self.group_children = new_children
+        for group_row in changed:
+            self.index_group(group_row)
+        
+        # File types of new items need their filter checkboxes before rows are filtered
+        file_types = set(self.row_types.values())
+        if file_types != set(self.filter_vars):
+            self.all_file_types = file_types
+            self.update_file_type_filters(file_types)
+        
+        # Unchanged groups keep their relative order, so only changed groups need placing
+        self.place_groups(None if diff.reorder_all else set(changed))
+        
+        tree.yview_moveto(scroll_position)
+
+    def group_label(self, first_item):
+        """Text of a group row"""
+        if self.duplicates_var.get():
+            return f"Identical to '{first_item}'"
+        return f"Similar to '{first_item}'"
+
+    group_row_id = staticmethod(rows.group_row_id)
+    item_row_id = staticmethod(rows.item_row_id)
+
+    def clear_results(self):
+        """Remove all groups from the results view"""
+        # Detached (filtered out) rows are not children of the root, delete them by id
+        group_rows = list(self.group_children)
+        if group_rows:
+            self.results_tree.delete(*group_rows)
+        self.group_children = {}
+        self.visible_groups = set()
+        self.group_types = {}
+        self.type_groups = {}
+        self.row_paths = {}
+        self.row_types = {}
             
         # Reset file types for filtering
         self.all_file_types = set()
         self.file_type_extensions = {}
+
+    def add_group_to_ui(self, group):
+        """Add one group row, with a row for each of its items, at the end of the results"""
+        # Only show groups with at least 2 items
+        if len(group) < 2:
+            return
         
-        # Process each group
-        for group in self.similar_groups:
-            # Only show groups with at least 2 items
-            if len(group) < 2:
-                continue
-                
-            # Create a frame for the group with a border and light gray background
-            group_frame = ttk.Frame(self.results_frame, padding=10)
-            group_frame.pack(fill=tk.X, expand=True, padx=5, pady=5)
-            
-            # Add a thin border around the group using a ttk.LabelFrame
-            border_frame = ttk.LabelFrame(group_frame, text=f"Similar to '{group[0]}'", padding=10)
-            border_frame.pack(fill=tk.X, expand=True)
-            
-            # List to keep track of non-excluded items
-            non_excluded_items = []
-            
-            # Add each item in the group
-            directory = self.scan_directory.get()
-            for item in group:
-                item_path = os.path.join(directory, item)
-                item_type = self.get_file_type(item_path)
-                item_ext = self.get_file_ext(item_path)
-                
-                # Add file type to our set (only those in similar groups)
-                self.all_file_types.add(item_type)
-                
-                # Keep track of extension for each file type
-                if item_type not in self.file_type_extensions:
-                    self.file_type_extensions[item_type] = item_ext
-                
-                # Create a frame for each item with the item and exclude button
-                item_frame = ttk.Frame(border_frame)
-                item_frame.pack(fill=tk.X, expand=True, pady=2)
-                
-                # Item name and type
-                tk.Label(item_frame, text=item, anchor=tk.W, width=20).pack(side=tk.LEFT, padx=(0, 10))
-                
-                # Show file type with extension
-                if item_ext:
-                    item_type_display = f"({item_type} {item_ext})"
-                else:
-                    item_type_display = f"({item_type})"
-                    
-                tk.Label(item_frame, text=item_type_display, anchor=tk.W, width=25).pack(side=tk.LEFT, padx=(0, 10))
-                
-                # Check if this item is already excluded and show the appropriate button
-                if item_path in self.excluded_items:
-                    # Apply gray color to text for excluded items
-                    for widget in item_frame.winfo_children():
-                        if isinstance(widget, tk.Label):
-                            widget.configure(foreground="gray")
-                            
-                    # Show Include button
-                    include_btn = ttk.Button(
-                        item_frame, 
-                        text="Include", 
-                        style="TButton",
-                        command=lambda p=item_path, f=item_frame, items=non_excluded_items: 
-                            self.include_item(p, f, items)
-                    )
-                    include_btn.pack(side=tk.RIGHT, padx=5)
-                else:
-                    # Show Exclude button
-                    exclude_btn = ttk.Button(
-                        item_frame, 
-                        text="Exclude", 
-                        style="TButton",
-                        command=lambda p=item_path, f=item_frame, items=non_excluded_items: 
-                            self.exclude_item(p, f, items)
-                    )
-                    exclude_btn.pack(side=tk.RIGHT, padx=5)
-                    
-                    # Add to list of items if not excluded
-                    non_excluded_items.append(item_path)
-            
-            # Add Merge Group button at the bottom of each group - CENTERED
-            merge_frame = ttk.Frame(border_frame)
-            merge_frame.pack(fill=tk.X, expand=True, pady=(10, 0))
-            
-            # Create Merge Group button in the center
-            merge_btn = ttk.Button(
-                merge_frame, 
-                text="Merge Group",
-                style="TButton",
-                command=lambda items=non_excluded_items.copy(): self.merge_group(items)
-            )
-            merge_btn.pack(pady=5, padx=5, anchor=tk.CENTER)
-        
-        # Update canvas scroll region
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+        directory = self.current.directory
+        group_row = self.results_tree.insert(
+            "", tk.END, iid=self.group_row_id(os.path.join(directory, group[0])),
+            text=self.group_label(group[0]),
+            values=(f"{len(group)} items", ""), open=True)
+        
+        # Add each item in the group
+        self.group_children[group_row] = [
+            self.insert_item_row(group_row, os.path.join(directory, item)) for item in group]
+        self.visible_groups.add(group_row)
+        self.index_group(group_row)
+
+    def index_group(self, group_row):
+        """Record which file types occur in a group, so filters only revisit groups they affect"""
+        self.unindex_group(group_row)
+        types = {self.row_types[row] for row in self.group_children[group_row]}
+        self.group_types[group_row] = types
+        for file_type in types:
+            self.type_groups.setdefault(file_type, set()).add(group_row)
+
+    def unindex_group(self, group_row):
+        """Remove a group from the file type index"""
+        for file_type in self.group_types.pop(group_row, ()):
+            groups = self.type_groups[file_type]
+            groups.discard(group_row)
+            if not groups:
+                del self.type_groups[file_type]
+
+    def insert_item_row(self, group_row, item_path):
+        """Add the row of one item at the end of a group and return its id"""
+        item_type = self.get_file_type(item_path)
+        item_ext = self.get_file_ext(item_path)
+        
+        # Add file type to our set (only those in similar groups)
+        self.all_file_types.add(item_type)
+        
+        # Keep track of extension for each file type
+        if item_type not in self.file_type_extensions:
+            self.file_type_extensions[item_type] = item_ext
         
+        # Show file type with extension
+        if item_ext:
+            item_type_display = f"{item_type} {item_ext}"
+        else:
+            item_type_display = item_type
+        
+        # Excluded items stay grayed out
+        excluded = item_path in self.excluded_items
+        row = self.results_tree.insert(
+            group_row, tk.END, iid=self.item_row_id(item_path),
+            text=os.path.relpath(item_path, self.current.directory),
+            values=(item_type_display, "Excluded" if excluded else ""),
+            tags=("excluded",) if excluded else ())
+        self.row_paths[row] = item_path
+        self.row_types[row] = item_type
+        return row
+
+    def finish_results_update(self):
+        """Update the filters once the groups have been added"""
         # Update filter panel with only the file types found in similar groups
         self.update_file_type_filters(self.all_file_types)
         
@@ -1003,81 +1380,67 @@ class SimilarFolderFinder:
         # Apply filters
         self.apply_filters()
     
-    def apply_filters(self):
-        """Apply file type filters to the displayed results"""
-        # Get selected file types
+    def selected_file_types(self):
+        """Return the set of file types checked in the filter panel and whether that is all of them"""
         selected_types = {file_type for file_type, var in self.filter_vars.items() if var.get()}
-        
-        # Debug information
-        print(f"Selected filters: {selected_types}")
-        
-        # If no types are selected, hide everything
-        if len(selected_types) == 0:
-            for group_frame in self.results_frame.winfo_children():
-                group_frame.pack_forget()
+        return selected_types, len(selected_types) == len(self.filter_vars)
+
+    def show_group(self, group_row, position, selected_types, all_selected):
+        """
+        Show the items of a group that pass the filters, with the group row at
+        position among the visible groups. A group with less than 2 visible
+        items is hidden. Returns whether the group is shown.
+        """
+        # Filtered out rows are detached from the tree, not deleted, so they can come back
+        tree = self.results_tree
+        children = self.group_children[group_row]
+        visible = [row for row in children if all_selected or self.row_types[row] in selected_types]
+        if len(visible) < 2:
+            tree.detach(group_row, *children)
+            self.visible_groups.discard(group_row)
+            return False
+        tree.move(group_row, "", position)
+        self.visible_groups.add(group_row)
+        if len(visible) < len(children):
+            shown = set(visible)
+            tree.detach(*[row for row in children if row not in shown])
+        for index, row in enumerate(visible):
+            tree.move(row, group_row, index)
+        return True
+
+    def place_groups(self, group_rows=None):
+        """
+        Filter the given groups (all if None) again and put the visible ones
+        in their place; every other group is left exactly as it is.
+        """
+        if group_rows is None:
+            group_rows = set(self.group_children)
+        if not group_rows:
             return
         
-        # Show all groups if all types are selected
-        all_selected = len(selected_types) == len(self.filter_vars)
-        
-        # Hide/show items based on their file type
-        for group_frame in self.results_frame.winfo_children():
-            visible_items = 0
-            merge_button_frame = None
-            
-            # Check label frames inside the group frame (which contain actual items)
-            for border_frame in group_frame.winfo_children():
-                if not isinstance(border_frame, ttk.LabelFrame):
-                    continue
-                
-                # First, find and remember the merge button frame
-                for child in border_frame.winfo_children():
-                    if isinstance(child, ttk.Frame) and len(child.winfo_children()) == 1:
-                        button = child.winfo_children()[0]
-                        if isinstance(button, ttk.Button) and button.cget("text") == "Merge Group":
-                            merge_button_frame = child
-                            # Temporarily hide the merge button frame until we decide if group is visible
-                            child.pack_forget()
-                            continue
-                
-                # Process each item in the group
-                for widget in border_frame.winfo_children():
-                    if isinstance(widget, ttk.Frame) and widget.winfo_class() == "TFrame":
-                        # Skip non-item frames (like the merge button frame we already handled)
-                        if len(widget.winfo_children()) < 2:
-                            continue
-                            
-                        # Get the file type from the second label
-                        item_type = None
-                        labels = [w for w in widget.winfo_children() if isinstance(w, tk.Label)]
-                        
-                        if len(labels) >= 2:
-                            # The second label has the file type information
-                            type_text = labels[1].cget("text")
-                            if "(" in type_text and ")" in type_text:
-                                # Extract just the file type part
-                                type_text = type_text.strip("()")
-                                for filter_type in selected_types:
-                                    if filter_type in type_text:
-                                        item_type = filter_type
-                                        break
-                        
-                        # Show if this type is selected or all types are selected
-                        if all_selected or item_type in selected_types:
-                            widget.pack(fill=tk.X, expand=True, pady=2)
-                            visible_items += 1
-                        else:
-                            widget.pack_forget()
-            
-            # If there are at least 2 visible items, show the group and the merge button
-            # Otherwise, hide the entire group
-            if visible_items >= 2:
-                group_frame.pack(fill=tk.X, expand=True, padx=5, pady=5)
-                # Add back the merge button
-                if merge_button_frame:
-                    merge_button_frame.pack(fill=tk.X, expand=True, pady=(10, 0))
-            else:
-                group_frame.pack_forget()
+        # Take the groups out first so they never sit in front of their new place
+        self.results_tree.detach(*group_rows)
+        self.visible_groups.difference_update(group_rows)
+        
+        # If there are at least 2 visible items, show the group, otherwise hide the entire group
+        selected_types, all_selected = self.selected_file_types()
+        position = 0
+        for group_row in self.group_children:
+            if group_row in group_rows:
+                self.show_group(group_row, position, selected_types, all_selected)
+            if group_row in self.visible_groups:
+                position += 1
+
+    def apply_filters(self, changed_types=None):
+        """
+        Apply file type filters to the displayed results. If changed_types is
+        given, only the groups containing one of those types are revisited.
+        """
+        if changed_types is None:
+            self.place_groups()
+        else:
+            self.place_groups(set().union(*(self.type_groups.get(file_type, ())
+                                            for file_type in changed_types)))
     
     def update_file_type_filters(self, file_types):
         """Update the file type filter checkboxes based on found extensions"""
@@ -1085,7 +1448,8 @@ class SimilarFolderFinder:
         for widget in self.filter_checkboxes_frame.winfo_children():
             widget.destroy()
             
-        # Create checkbox for each file type
+        # Create checkbox for each file type, types that were already listed keep their state
+        old_vars = self.filter_vars
         self.filter_vars = {}
         
         # Sort file types alphabetically
@@ -1100,7 +1464,7 @@ class SimilarFolderFinder:
             elif file_type.startswith("."):
                 display_name = file_type  # Show full extension name
                 
-            var = tk.BooleanVar(value=True)
+            var = tk.BooleanVar(value=old_vars[file_type].get() if file_type in old_vars else True)
             self.filter_vars[file_type] = var
             
             # Create frame for each checkbox with proper padding
@@ -1109,7 +1473,7 @@ class SimilarFolderFinder:
             
             # Create checkbox with wrapping capabilities for longer text
             cb = ttk.Checkbutton(cb_frame, text=display_name, variable=var, 
-                               command=self.apply_filters)
+                               command=lambda t=file_type: self.apply_filters({t}))
             cb.pack(side="left", fill="x", expand=True, anchor="w")
 
     def setup_ui(self):
@@ -1131,7 +1495,43 @@ class SimilarFolderFinder:
         ttk.Label(dir_selection_frame, text="Directory to scan:").pack(side=tk.LEFT)
         ttk.Entry(dir_selection_frame, textvariable=self.scan_directory, width=50).pack(side=tk.LEFT, padx=5)
         ttk.Button(dir_selection_frame, text="Browse", command=self.browse_directory).pack(side=tk.LEFT)
-        ttk.Button(dir_selection_frame, text="Rescan", command=self.scan_for_similar).pack(side=tk.LEFT, padx=5)
+        ttk.Button(dir_selection_frame, text="Rescan",
+                   command=lambda: self.scan_for_similar(keep_results=True)).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(dir_selection_frame, text="Include subfolders", variable=self.recursive_var,
+                        command=self.rescan_all).pack(side=tk.LEFT)
+        ttk.Checkbutton(dir_selection_frame, text="Identical files", variable=self.duplicates_var,
+                        command=self.rescan_all).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Checkbutton(dir_selection_frame, text="Auto-update",
+                        variable=self.auto_update_var).pack(side=tk.LEFT, padx=5)
+        ttk.Button(dir_selection_frame, text="Statistics", command=self.show_stats).pack(side=tk.LEFT, padx=5)
+        
+        # Every monitored directory with its state; the results of the picked one are shown
+        monitored_frame = ttk.Frame(dir_frame)
+        monitored_frame.pack(fill=tk.X, pady=(5, 0))
+        ttk.Label(monitored_frame, text="Monitored:").pack(side=tk.LEFT)
+        self.directory_box = ttk.Combobox(monitored_frame, textvariable=self.directory_var,
+                                          state="readonly", width=70)
+        self.directory_box.pack(side=tk.LEFT, padx=5)
+        self.directory_box.bind("<<ComboboxSelected>>", self.choose_directory)
+        ttk.Button(monitored_frame, text="Stop Monitoring", command=self.remove_directory).pack(side=tk.LEFT)
+        
+        # How similar items are grouped
+        options_frame = ttk.Frame(dir_frame)
+        options_frame.pack(fill=tk.X, pady=(5, 0))
+        ttk.Label(options_frame, text="Grouping:").pack(side=tk.LEFT)
+        linkage_box = ttk.Combobox(options_frame, textvariable=self.linkage_var, state="readonly",
+                                   values=list(LINKAGE_LABELS.values()), width=20)
+        linkage_box.pack(side=tk.LEFT, padx=5)
+        linkage_box.bind("<<ComboboxSelected>>", self.change_linkage)
+        ttk.Label(options_frame, text="Similarity:").pack(side=tk.LEFT, padx=(10, 0))
+        preset_box = ttk.Combobox(options_frame, textvariable=self.preset_var, state="readonly",
+                                  values=list(SIMILARITY_PRESETS), width=18)
+        preset_box.pack(side=tk.LEFT, padx=5)
+        preset_box.bind("<<ComboboxSelected>>", self.choose_preset)
+        ttk.Scale(options_frame, from_=SIMILARITY_MIN, to=SIMILARITY_MAX, orient=tk.HORIZONTAL,
+                  length=200, variable=self.threshold_var,
+                  command=self.slide_threshold).pack(side=tk.LEFT, padx=5)
+        ttk.Label(options_frame, textvariable=self.threshold_text, width=5).pack(side=tk.LEFT)
         
         # Create a horizontal paned window for filter and results panels
         self.paned_window = ttk.PanedWindow(main_frame, orient=tk.HORIZONTAL)
@@ -1202,57 +1602,73 @@ class SimilarFolderFinder:
         self.filter_canvas.bind("<Enter>", _on_enter_filter)
         self.filter_canvas.bind("<Leave>", _on_leave_filter)
         
-        # Results area in a scrollable canvas
+        # Results area: a tree view only draws the rows on screen, so it stays fast with
+        # tens of thousands of groups
         results_label = ttk.Label(results_panel, text="Similar Items Found")
         results_label.pack(anchor=tk.W, pady=(10, 0))
         
-        # Create a frame with canvas and scrollbar for results
-        self.canvas_frame = ttk.Frame(results_panel)
-        self.canvas_frame.pack(fill=tk.BOTH, expand=True)
-        
-        # Add scrollbar
-        self.scrollbar = ttk.Scrollbar(self.canvas_frame)
-        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        # Create canvas with scrolling capabilities
-        self.canvas = tk.Canvas(self.canvas_frame, yscrollcommand=self.scrollbar.set, 
-                              background="#F0F0F0", highlightthickness=0)
-        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        # Exclude / Include / Merge act on the selected rows
+        actions_frame = ttk.Frame(results_panel)
+        actions_frame.pack(side=tk.BOTTOM, fill=tk.X, pady=(5, 0))
+        ttk.Button(actions_frame, text="Merge All Groups", command=self.merge_all_groups).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(actions_frame, text="Merge Selected Group", command=self.merge_selected).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(actions_frame, text="Include", command=self.include_selected).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(actions_frame, text="Exclude", command=self.exclude_selected).pack(side=tk.RIGHT, padx=5)
+        ttk.Label(actions_frame, text="Double-click an item to exclude or include it").pack(side=tk.LEFT)
         
-        # Configure scrollbar
-        self.scrollbar.config(command=self.canvas.yview)
+        tree_frame = ttk.Frame(results_panel)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
         
-        # Create a frame inside canvas to hold all the group frames
-        self.results_frame = ttk.Frame(self.canvas)
-        self.canvas.create_window((0, 0), window=self.results_frame, anchor=tk.NW, width=self.canvas.winfo_width())
-        
-        # Configure canvas to resize inner frame when the canvas changes size
-        def configure_canvas(event):
-            self.canvas.itemconfig(1, width=event.width)
-        self.canvas.bind('<Configure>', configure_canvas)
-        
-        # Update scroll region when the size of the results frame changes
-        self.results_frame.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
-        
-        # Add mousewheel scrolling for results only when hovering
-        def _on_enter_results(event):
-            self.canvas.bind_all("<MouseWheel>", _on_results_mousewheel)
-            
-        def _on_leave_results(event):
-            self.canvas.unbind_all("<MouseWheel>")
-            
-        def _on_results_mousewheel(event):
-            self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
+        self.scrollbar = ttk.Scrollbar(tree_frame)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
-        # Bind hover events for the results scrolling
-        self.canvas.bind("<Enter>", _on_enter_results)
-        self.canvas.bind("<Leave>", _on_leave_results)
+        self.results_tree = ttk.Treeview(tree_frame, columns=("type", "status"),
+                                         yscrollcommand=self.scrollbar.set)
+        self.results_tree.heading("#0", text="Name", anchor=tk.W)
+        self.results_tree.heading("type", text="Type", anchor=tk.W)
+        self.results_tree.heading("status", text="", anchor=tk.W)
+        self.results_tree.column("#0", width=300)
+        self.results_tree.column("type", width=200)
+        self.results_tree.column("status", width=80, stretch=False)
+        self.results_tree.tag_configure("excluded", foreground="gray")
+        self.results_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.config(command=self.results_tree.yview)
+        
+        self.results_tree.bind("<Double-1>", self.toggle_excluded)
+        self.results_tree.bind("<Delete>", lambda e: self.exclude_selected())
+        
+        # Rows of the results view: group row -> item rows, item row -> path and file type
+        self.group_children = {}
+        self.visible_groups = set()
+        self.group_types = {}  # group row -> file types of its items
+        self.type_groups = {}  # file type -> group rows with an item of that type
+        self.row_paths = {}
+        self.row_types = {}
         
         # Status label at bottom
         status_frame = ttk.Frame(main_frame)
         status_frame.pack(fill=tk.X, pady=5)
         ttk.Label(status_frame, textvariable=self.status_var).pack(side=tk.LEFT)
 
+    def on_close(self):
+        """Save the score cache and close the application"""
+        self.cancel_scan()
+        if self.scan_poll_timer:
+            self.root.after_cancel(self.scan_poll_timer)
+            self.scan_poll_timer = None
+        self.merge_executor.shutdown(wait=False)
+        if self.threshold_timer:
+            self.root.after_cancel(self.threshold_timer)
+            self.threshold_timer = None
+        if self.watch_poll_timer:
+            self.root.after_cancel(self.watch_poll_timer)
+            self.watch_poll_timer = None
+        try:
+            self.score_cache.save()
+        except OSError as e:
+            logger.error("Error saving score cache: %s", e)
+        self.root.destroy()
+
     def __del__(self):
         """Clean up resources when the application is closed"""
         # Stop file system observer
@@ -1261,16 +1677,19 @@ class SimilarFolderFinder:
                 self.observer.stop()
                 self.observer.join(timeout=1.0)  # Wait up to 1 second for the observer to stop
             except Exception as e:
-                print(f"Error stopping observer: {e}")
+                logger.error("Error stopping observer: %s", e)
             
         # Cancel any pending auto-scan timer
         if self.auto_scan_timer:
             try:
                 self.root.after_cancel(self.auto_scan_timer)
             except Exception as e:
-                print(f"Error canceling timer: {e}")
+                logger.error("Error canceling timer: %s", e)
 
 if __name__ == "__main__":
+    # COUNT_CORRECTOR_LOG=DEBUG (or INFO) shows what the app is doing
+    logging.basicConfig(level=os.environ.get("COUNT_CORRECTOR_LOG", "WARNING").upper(),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     root = tk.Tk()
     app = SimilarFolderFinder(root)
     root.mainloop() 
\ No newline at end of file
@@ -0,0 +1,54 @@
+"""
+Shared fixtures: a small listing with the kinds of names the scans have to
+tell apart (prefix plus digits, one or two changed characters, case
+differences, long names that need the edit distance) and the exhaustive
+scores of all its pairs to compare the fast paths with.
+"""
+import random
+
+import pytest
+
+from count_corrector.engine import calculate_similarity
+
+WORDS = ["report", "holiday", "invoice", "wow", "a", "ab", "Backup", "photo",
+         "meeting notes", "quarterly summary final", "x1", "data_2020"]
+
+
+def make_names(count, seed=0):
+    """Return count distinct names: the WORDS and random variants of them"""
+    rng = random.Random(seed)
+    names = list(dict.fromkeys(WORDS))
+    seen = set(names)
+    while len(names) < count:
+        name = rng.choice(names)
+        variant = rng.randrange(6)
+        if variant == 0:
+            name += str(rng.randrange(100))
+        elif variant == 1 and name:
+            position = rng.randrange(len(name))
+            name = name[:position] + rng.choice("abcxyz 01") + name[position + 1:]
+        elif variant == 2:
+            name = name.swapcase()
+        elif variant == 3:
+            name = name + rng.choice([" copy", " (2)", ".txt", "_old"])
+        elif variant == 4 and len(name) > 2:
+            position = rng.randrange(len(name))
+            name = name[:position] + name[position + 1:]
+        else:
+            name = "".join(rng.choice("aeioulmnrst") for _ in range(rng.randint(1, 24)))
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+@pytest.fixture(scope="session")
+def names():
+    return make_names(120)
+
+
+@pytest.fixture(scope="session")
+def scores(names):
+    """(i, j) -> calculate_similarity(names[i], names[j]) for every ordered pair"""
+    return {(i, j): calculate_similarity(name1, name2)
+            for i, name1 in enumerate(names) for j, name2 in enumerate(names) if i != j}
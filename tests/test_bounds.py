@@ -0,0 +1,50 @@
+"""Threshold-aware score bounds never change which pairs reach the threshold"""
+import pytest
+
+from count_corrector.engine import BOUND_PATHS, calculate_similarity, score_with_bounds
+from count_corrector.names import NameTable
+
+THRESHOLDS = [0.3, 0.35, 0.6, 0.7, 0.8, 0.95]
+
+
+@pytest.mark.parametrize("threshold", THRESHOLDS)
+def test_bounds_keep_scores_at_threshold(names, scores, threshold):
+    rejected = 0
+    for (i, j), exact in scores.items():
+        score, path = score_with_bounds(names[i], names[j], threshold)
+        if exact >= threshold:
+            assert score == exact and path not in BOUND_PATHS
+        else:
+            # Below the threshold the score may be cut short, but stays below it
+            assert score < threshold
+        if path in BOUND_PATHS:
+            assert exact <= score + 1e-9
+            rejected += 1
+    if threshold >= 0.6:
+        assert rejected > 0
+
+
+@pytest.mark.parametrize("threshold", THRESHOLDS)
+def test_name_table_matches_engine(names, threshold):
+    table = NameTable()
+    for name1 in names[::3]:
+        for name2 in names:
+            assert table.score_with_bounds(name1, name2, threshold) == score_with_bounds(name1, name2, threshold)
+
+
+@pytest.mark.parametrize("name1, name2", [
+    ("report", "report copy"),  # Short suffix: at least 0.7
+    ("cursor", "curolo"),  # Same length with two changed characters
+    ("abcdefgh", "hgfedcba"),  # Every character shared, none in place
+    ("quarterly summary final", "quarterly summery finals"),
+    ("quarterly summary final", "_quarterly summary final"),  # Nothing in place, one edit
+    ("wow", "wow01"),
+    ("", "a"),
+])
+@pytest.mark.parametrize("threshold", THRESHOLDS)
+def test_boundary_pairs(name1, name2, threshold):
+    exact = calculate_similarity(name1, name2)
+    score, path = score_with_bounds(name1, name2, threshold)
+    assert (score >= threshold) == (exact >= threshold)
+    if exact >= threshold:
+        assert score == exact and path not in BOUND_PATHS
@@ -0,0 +1,69 @@
+"""Score cache eviction and persistence"""
+import json
+
+import pytest
+
+from count_corrector.cache import ScoreCache
+from count_corrector.engine import calculate_similarity
+
+
+def test_scores_match_and_are_reused():
+    cache = ScoreCache()
+    assert cache.score("Report", "report1") == calculate_similarity("Report", "report1")
+    # Pairs are keyed by their lowercased names, in calling order
+    assert cache.score("REPORT", "Report1") == calculate_similarity("Report", "report1")
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.get(("report1", "report")) is None
+
+
+def test_least_recently_used_entries_are_evicted():
+    keys = [(f"name{i}", f"other{i}") for i in range(4)]
+    cache = ScoreCache(max_bytes=3 * ScoreCache.entry_size(keys[0]))
+    for key in keys[:3]:
+        cache.put(key, 0.5)
+    cache.get(keys[0])
+    cache.put(keys[3], 0.5)
+    assert len(cache) == 3
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == 0.5
+    assert cache.size <= cache.max_bytes
+
+
+def test_save_and_load_keep_scores_and_order(tmp_path):
+    path = tmp_path / "cache" / "scores.json"
+    cache = ScoreCache(path=str(path))
+    cache.put(("a", "b"), 0.25)
+    cache.put(("c", "d"), 0.75)
+    cache.get(("a", "b"))
+    cache.save()
+    loaded = ScoreCache(path=str(path))
+    assert loaded.load()
+    assert list(loaded.entries.items()) == [(("c", "d"), 0.75), (("a", "b"), 0.25)]
+    assert loaded.size == cache.size
+
+
+@pytest.mark.parametrize("content", [
+    "not json",
+    json.dumps([1, 2, 3]),
+    json.dumps({"version": -1, "scores": [["a", "b", 0.5]]}),
+    json.dumps({"scores": [["a", "b", 0.5]]}),
+])
+def test_broken_or_outdated_files_are_ignored(tmp_path, content):
+    path = tmp_path / "scores.json"
+    path.write_text(content, encoding="utf-8")
+    cache = ScoreCache()
+    assert not cache.load(str(path))
+    assert len(cache) == 0
+
+
+@pytest.mark.parametrize("scores", [[["a", "b"]], [["a", "b", "x"]], [["a", "b", 0.5], 7]])
+def test_malformed_scores_load_nothing(tmp_path, scores):
+    cache = ScoreCache()
+    path = tmp_path / "scores.json"
+    path.write_text(json.dumps({"version": cache.version, "scores": scores}), encoding="utf-8")
+    assert not cache.load(str(path))
+    assert len(cache) == 0
+
+
+def test_missing_file_is_ignored(tmp_path):
+    assert not ScoreCache().load(str(tmp_path / "missing.json"))
@@ -0,0 +1,65 @@
+"""Candidate indexes must never lose a pair the exhaustive scan finds"""
+import pytest
+
+from count_corrector.candidates import LengthIndex, NameIndex, QGramIndex
+from count_corrector.engine import find_similar_groups
+
+THRESHOLDS = [0.3, 0.35, 0.6, 0.8, 0.95]
+
+
+def similar_to(scores, index, threshold):
+    """Ids of the names that reach threshold with names[index] as the seed"""
+    return {j for (i, j), score in scores.items() if i == index and score >= threshold}
+
+
+@pytest.mark.parametrize("threshold", THRESHOLDS)
+@pytest.mark.parametrize("q", [1, 2])
+def test_qgram_candidates_cover_similar_pairs(names, scores, threshold, q):
+    index = QGramIndex(names, threshold, q)
+    for i in range(len(names)):
+        assert similar_to(scores, i, threshold) <= set(index.candidates(i))
+
+
+@pytest.mark.parametrize("threshold", THRESHOLDS)
+def test_length_candidates_cover_similar_pairs(names, scores, threshold):
+    index = LengthIndex(names)
+    for i in range(len(names)):
+        assert similar_to(scores, i, threshold) <= set(index.candidates(i))
+
+
+@pytest.mark.parametrize("threshold", THRESHOLDS)
+def test_name_index_candidates_cover_similar_pairs(names, scores, threshold):
+    index = NameIndex(threshold, names[:60])
+    for name in names:
+        index.add(name)
+    # Removed names are no longer candidates, the others still are
+    removed = set(names[::7])
+    for name in removed:
+        index.remove(name)
+    for i, name in enumerate(names):
+        if name in removed:
+            continue
+        found = index.candidates(name)
+        assert not found & removed
+        expected = {names[j] for j in similar_to(scores, i, threshold)} - removed
+        assert expected <= found
+
+
+@pytest.mark.parametrize("threshold", THRESHOLDS)
+def test_vector_scorer_matches_exhaustive(names, scores, threshold):
+    np = pytest.importorskip("numpy")
+    from count_corrector.vectorized import VectorScorer
+
+    scorer = VectorScorer(names, threshold)
+    processed = np.zeros(len(names), dtype=bool)
+    for i in range(len(names)):
+        assert set(scorer.similar(i, processed)) == similar_to(scores, i, threshold)
+
+
+@pytest.mark.parametrize("threshold", [0.35, 0.6])
+@pytest.mark.parametrize("method", ["qgram", "length", "numpy"])
+def test_scan_methods_find_exhaustive_groups(names, threshold, method):
+    if method == "numpy":
+        pytest.importorskip("numpy")
+    expected = find_similar_groups(names, threshold, "exhaustive")
+    assert find_similar_groups(names, threshold, method) == expected
@@ -0,0 +1,85 @@
+"""Incremental ClusterIndex updates against an index and a graph built from scratch"""
+import random
+
+import pytest
+
+from count_corrector.clusters import ClusterIndex
+from count_corrector.graph import LINKAGES, SimilarityGraph
+
+THRESHOLD = 0.35
+FLOOR = 0.3
+
+
+def components(clusters):
+    return {frozenset(group) for group in clusters.groups()}
+
+
+def random_updates(clusters, pool, present, rng, steps):
+    """Add or remove random names of pool, yielding after each change"""
+    for _ in range(steps):
+        name = rng.choice(pool)
+        if name in present:
+            clusters.remove(name)
+            present.discard(name)
+        else:
+            clusters.add(name)
+            present.add(name)
+        yield
+
+
+def test_updates_match_rebuild(names):
+    rng = random.Random(4)
+    present = set(names[:80])
+    clusters = ClusterIndex(THRESHOLD, names=names[:80])
+    for _ in random_updates(clusters, names, present, rng, 40):
+        rebuilt = ClusterIndex(THRESHOLD, names=sorted(present))
+        assert components(clusters) == components(rebuilt)
+        assert set(clusters.neighbors) == present
+        assert clusters.neighbors == rebuilt.neighbors
+
+
+def test_components_at_level_match_rebuild(names):
+    # Edges are kept down to the floor, components only link at the level
+    rng = random.Random(6)
+    present = set(names[:80])
+    clusters = ClusterIndex(FLOOR, names=names[:80], level=THRESHOLD)
+    for _ in random_updates(clusters, names, present, rng, 40):
+        assert components(clusters) == components(ClusterIndex(THRESHOLD, names=sorted(present)))
+        assert clusters.neighbors == ClusterIndex(FLOOR, names=sorted(present)).neighbors
+
+
+def test_relink_at_other_levels(names):
+    clusters = ClusterIndex(FLOOR, names=names)
+    for threshold in [0.6, THRESHOLD, FLOOR, 0.8]:
+        expected = components(ClusterIndex(threshold, names=names))
+        assert {frozenset(group) for group in clusters.groups(threshold=threshold)} == expected
+        assert clusters.level == threshold
+
+
+def test_remove_splits_component(names):
+    clusters = ClusterIndex(THRESHOLD, names=names)
+    largest = max(clusters.groups(), key=len)
+    roots = clusters.remove(largest[0])
+    remaining = set(largest[1:])
+    assert {name for root in roots for name in clusters.members[root]} == remaining
+    assert components(clusters) == components(ClusterIndex(THRESHOLD, names=set(names) - {largest[0]}))
+
+
+@pytest.mark.parametrize("threshold", [THRESHOLD, 0.6])
+@pytest.mark.parametrize("linkage", LINKAGES)
+def test_linkage_groups_match_graph(names, linkage, threshold):
+    # The groups of untouched components are kept from one call to the next
+    rng = random.Random(5)
+    present = set(names[:80])
+    clusters = ClusterIndex.from_graph(SimilarityGraph.build(names[:80], FLOOR))
+    clusters.keep_groups(clusters.graph().groups(linkage, threshold), linkage, threshold)
+    for _ in random_updates(clusters, names, present, rng, 25):
+        graph = SimilarityGraph.build(sorted(present), FLOOR)
+        assert clusters.groups(linkage, threshold) == graph.groups(linkage, threshold)
+
+
+def test_from_graph_matches_added_names(names):
+    graph = SimilarityGraph.build(names, THRESHOLD)
+    clusters = ClusterIndex.from_graph(graph)
+    assert clusters.neighbors == ClusterIndex(THRESHOLD, names=names).neighbors
+    assert clusters.graph().groups("single") == graph.groups("single")
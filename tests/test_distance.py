@@ -0,0 +1,78 @@
+"""The bit-parallel edit distance against a plain DP table and SequenceMatcher bounds"""
+import random
+from difflib import SequenceMatcher
+
+import pytest
+
+from count_corrector.candidates import max_edit_distance
+from count_corrector.distance import levenshtein
+
+
+def reference_distance(a, b):
+    """Levenshtein distance with the full dynamic programming table"""
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def prefix_plus_digits(a, b):
+    """Whether one name is the other with digits appended (scored 0.9 by calculate_similarity)"""
+    shorter, longer = sorted((a, b), key=len)
+    return longer.startswith(shorter) and longer[len(shorter):].isdigit()
+
+
+def random_pairs(count, seed=0):
+    rng = random.Random(seed)
+    pairs = [("", ""), ("", "abc"), ("abc", ""), ("a", "a"), ("kitten", "sitting"),
+             ("ab" * 40, "ba" * 40), ("x" * 70, "x" * 69 + "y")]
+    for _ in range(count):
+        a = "".join(rng.choice("abcd é") for _ in range(rng.randint(0, 80)))
+        b = list(a)
+        for _ in range(rng.randint(0, 10)):
+            position = rng.randint(0, len(b))
+            edit = rng.randrange(3)
+            if edit == 0:
+                b.insert(position, rng.choice("abcdz"))
+            elif b and position < len(b):
+                if edit == 1:
+                    del b[position]
+                else:
+                    b[position] = rng.choice("abcdz")
+        pairs.append((a, "".join(b)))
+    return pairs
+
+
+@pytest.mark.parametrize("a, b", random_pairs(150))
+def test_matches_reference(a, b):
+    assert levenshtein(a, b) == reference_distance(a, b)
+    assert levenshtein(b, a) == reference_distance(a, b)
+
+
+@pytest.mark.parametrize("a, b", random_pairs(60, seed=1))
+def test_max_distance_cutoff(a, b):
+    distance = reference_distance(a, b)
+    for limit in range(0, distance + 2):
+        assert levenshtein(a, b, limit) == min(distance, limit + 1)
+
+
+@pytest.mark.parametrize("a, b", random_pairs(150, seed=2))
+def test_within_sequence_matcher_bounds(a, b):
+    # The matching blocks are a common subsequence: deleting and inserting
+    # everything else is an upper bound, the length difference a lower one
+    matched = sum(block.size for block in SequenceMatcher(None, a, b, autojunk=False).get_matching_blocks())
+    distance = levenshtein(a, b)
+    assert abs(len(a) - len(b)) <= distance <= len(a) + len(b) - 2 * matched
+
+
+@pytest.mark.parametrize("threshold", [0.3, 0.35, 0.6, 0.8])
+def test_similar_pairs_within_max_edit_distance(names, scores, threshold):
+    # Prefix plus digits pairs score 0.9 at any distance, candidates look them up separately
+    for (i, j), score in scores.items():
+        a, b = names[i].lower(), names[j].lower()
+        if score >= threshold and not prefix_plus_digits(a, b):
+            assert levenshtein(a, b) <= max_edit_distance(len(a), len(b), threshold)
@@ -0,0 +1,83 @@
+"""Exact duplicates: the groups found and how little is read to find them"""
+import os
+
+import pytest
+
+from count_corrector import duplicates
+from count_corrector.duplicates import edge_hash, find_duplicate_groups, full_hash
+
+BLOCK = 16
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    """Use small edge blocks and record the files each hashing stage reads"""
+    monkeypatch.setattr(duplicates, "EDGE_BLOCK_SIZE", BLOCK)
+    calls = {"edge": [], "full": []}
+
+    def recording_edge_hash(path, size):
+        calls["edge"].append(os.path.basename(path))
+        return edge_hash(path, size)
+
+    def recording_full_hash(path):
+        calls["full"].append(os.path.basename(path))
+        return full_hash(path)
+
+    monkeypatch.setattr(duplicates, "edge_hash", recording_edge_hash)
+    monkeypatch.setattr(duplicates, "full_hash", recording_full_hash)
+    return calls
+
+
+def write(directory, name, content):
+    path = directory / name
+    path.write_bytes(content)
+    return path
+
+
+def test_identical_files_are_grouped(tmp_path, hashed):
+    write(tmp_path, "a", b"same content")
+    write(tmp_path, "b", b"same content")
+    write(tmp_path, "c", b"other conten")  # Same size, other content
+    write(tmp_path, "unique", b"no other file is this long")
+    write(tmp_path, "empty1", b"")
+    write(tmp_path, "empty2", b"")
+    assert find_duplicate_groups(str(tmp_path)) == [["a", "b"]]
+    # Files with a size of their own are never read, small files only once
+    assert sorted(hashed["edge"]) == ["a", "b", "c"]
+    assert hashed["full"] == []
+
+
+def test_large_files_are_hashed_completely(tmp_path, hashed):
+    head, tail = b"h" * BLOCK, b"t" * BLOCK
+    write(tmp_path, "big1", head + b"middle" + tail)
+    write(tmp_path, "big2", head + b"middle" + tail)
+    write(tmp_path, "big3", head + b"MIDDLE" + tail)  # Same edges, other middle
+    write(tmp_path, "big4", b"x" * (2 * BLOCK + 6))  # Told apart by its edges
+    assert edge_hash(str(tmp_path / "big1"), 2 * BLOCK + 6) == edge_hash(str(tmp_path / "big3"), 2 * BLOCK + 6)
+    assert find_duplicate_groups(str(tmp_path)) == [["big1", "big2"]]
+    assert sorted(hashed["full"]) == ["big1", "big2", "big3"]
+
+
+def test_larger_files_come_first(tmp_path, hashed):
+    for name in ["s1", "s2"]:
+        write(tmp_path, name, b"small")
+    for name in ["l1", "l2"]:
+        write(tmp_path, name, b"larger file")
+    assert find_duplicate_groups(str(tmp_path)) == [["l1", "l2"], ["s1", "s2"]]
+
+
+def test_recursive_groups_use_relative_paths(tmp_path, hashed):
+    (tmp_path / "sub").mkdir()
+    write(tmp_path, "a", b"content")
+    write(tmp_path / "sub", "b", b"content")
+    assert find_duplicate_groups(str(tmp_path)) == []
+    assert find_duplicate_groups(str(tmp_path), recursive=True) == [["a", os.path.join("sub", "b")]]
+
+
+def test_hard_links_are_not_duplicates(tmp_path, hashed):
+    write(tmp_path, "a", b"content")
+    try:
+        os.link(tmp_path / "a", tmp_path / "link")
+    except OSError:
+        pytest.skip("hard links not supported")
+    assert find_duplicate_groups(str(tmp_path)) == []
@@ -0,0 +1,64 @@
+"""Netting and timing of coalesced file system events"""
+from count_corrector.events import CREATED, DELETED, MODIFIED, EventCoalescer
+
+
+def drained(*events, max_paths=100):
+    coalescer = EventCoalescer(max_paths=max_paths)
+    for event in events:
+        coalescer.add(*event)
+    return coalescer.drain()
+
+
+def test_create_then_delete_cancels_out():
+    changes, overflowed, count = drained((CREATED, "a"), (MODIFIED, "a"), (DELETED, "a"))
+    assert changes == {}
+    assert not overflowed
+    assert count == 3
+
+
+def test_delete_then_create_is_a_modification():
+    changes, _, _ = drained((DELETED, "a"), (CREATED, "a"))
+    assert changes == {"a": MODIFIED}
+
+
+def test_net_change_per_path():
+    changes, _, _ = drained((CREATED, "new"), (MODIFIED, "new"), (DELETED, "old"), (MODIFIED, "kept"))
+    assert changes == {"new": CREATED, "old": DELETED, "kept": MODIFIED}
+
+
+def test_moves():
+    changes, _, _ = drained(("moved", "a", "b"))
+    assert changes == {"a": DELETED, "b": CREATED}
+    # Moving a new file around and back out leaves nothing behind
+    changes, _, _ = drained((CREATED, "tmp"), ("moved", "tmp", "final"), ("moved", "final", "tmp"),
+                            (DELETED, "tmp"))
+    assert changes == {}
+
+
+def test_overflow_drops_paths():
+    changes, overflowed, count = drained(*[(CREATED, str(i)) for i in range(5)], max_paths=3)
+    assert changes == {}
+    assert overflowed
+    assert count == 5
+
+
+def test_drain_resets():
+    coalescer = EventCoalescer()
+    coalescer.add(CREATED, "a")
+    assert coalescer.pending()
+    coalescer.drain()
+    assert not coalescer.pending()
+    assert coalescer.drain() == ({}, False, 0)
+
+
+def test_due_after_debounce_or_max_latency():
+    coalescer = EventCoalescer(debounce=0.5, max_latency=3.0)
+    assert not coalescer.due()
+    coalescer.add(CREATED, "a")
+    first = coalescer.first_event
+    assert not coalescer.due(first + 0.1)
+    assert coalescer.due(first + 0.5)
+    # A steady stream of events is still handled once max_latency has passed
+    coalescer.last_event = first + 2.9
+    assert not coalescer.due(first + 2.95)
+    assert coalescer.due(first + 3.0)
@@ -0,0 +1,34 @@
+"""Groups derived from a SimilarityGraph, streamed while it is built"""
+import random
+
+import pytest
+
+from count_corrector.graph import LINKAGES, SimilarityGraph
+
+FLOOR = 0.3
+
+
+@pytest.mark.parametrize("threshold", [0.35, 0.6])
+@pytest.mark.parametrize("linkage", LINKAGES)
+def test_streamed_groups_match_graph_groups(names, linkage, threshold):
+    graph = SimilarityGraph(names, FLOOR)
+    streamed = list(graph.iter_build(linkage=linkage, threshold=threshold))
+    assert graph.complete
+    assert sorted(streamed, key=lambda group: graph.node_of[group[0]]) == graph.groups(linkage, threshold)
+
+
+def test_groups_streamed_before_graph_is_complete(names):
+    graph = SimilarityGraph(names, FLOOR)
+    edges_at_first_group = None
+    for _ in graph.iter_build(linkage="single", threshold=0.6):
+        if edges_at_first_group is None:
+            edges_at_first_group = graph.edge_count()
+    assert edges_at_first_group < graph.edge_count()
+
+
+@pytest.mark.parametrize("linkage", LINKAGES)
+def test_groups_do_not_depend_on_name_order(names, linkage):
+    shuffled = list(names)
+    random.Random(3).shuffle(shuffled)
+    streamed = list(SimilarityGraph(shuffled, FLOOR).iter_build(linkage=linkage, threshold=0.35))
+    assert streamed == list(SimilarityGraph(names, FLOOR).iter_build(linkage=linkage, threshold=0.35))
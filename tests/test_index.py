@@ -0,0 +1,112 @@
+"""Scan index snapshots: round trips, schema upgrades and changed entries"""
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from count_corrector import index as index_module
+from count_corrector.graph import SimilarityGraph
+from count_corrector.index import (
+    SCHEMA_VERSION,
+    ScanIndex,
+    changed_entries,
+    list_entries,
+    scan_with_index,
+    snapshot_graph,
+)
+
+ENTRIES = {"report": (False, 10, 1), "report1": (False, 20, 2), "photos": (True, 30, 0)}
+GROUPS = [["report", "report1"]]
+
+
+@pytest.fixture
+def index(tmp_path):
+    return ScanIndex(str(tmp_path / "index" / "scans.sqlite"))
+
+
+def test_changed_entries():
+    new = dict(ENTRIES, report1=(False, 21, 2), added=(False, 1, 1))
+    del new["photos"]
+    assert changed_entries(ENTRIES, new) == {"report1", "added", "photos"}
+    assert changed_entries(ENTRIES, dict(ENTRIES)) == set()
+
+
+def test_round_trip(index, tmp_path):
+    edges = [("report", "report1", 0.9)]
+    index.save(str(tmp_path), ENTRIES, GROUPS, 0.35, linkage="single", edges=edges, floor=0.3)
+    snapshot = index.load(str(tmp_path), 0.35, "single", 0.3)
+    assert snapshot.entries == ENTRIES
+    assert snapshot.groups == GROUPS
+    assert (snapshot.threshold, snapshot.linkage, snapshot.floor) == (0.35, "single", 0.3)
+    assert snapshot.edges == edges
+    graph = snapshot_graph(snapshot)
+    assert graph.threshold == 0.3 and graph.weight("report", "report1") == 0.9
+
+
+@pytest.mark.parametrize("threshold, linkage, floor", [(0.6, "single", 0.3), (0.35, "complete", 0.3),
+                                                       (0.35, "single", None), (0.35, None, None)])
+def test_snapshots_of_other_settings_are_ignored(index, tmp_path, threshold, linkage, floor):
+    index.save(str(tmp_path), ENTRIES, GROUPS, 0.35, linkage="single", floor=0.3)
+    assert index.load(str(tmp_path), threshold, linkage, floor) is None
+
+
+def test_other_scoring_version_is_ignored(index, tmp_path, monkeypatch):
+    index.save(str(tmp_path), ENTRIES, GROUPS, 0.35)
+    monkeypatch.setattr(index_module, "SIMILARITY_VERSION", -1)
+    assert index.load(str(tmp_path), 0.35) is None
+
+
+def test_save_with_previous_writes_changes(index, tmp_path):
+    index.save(str(tmp_path), ENTRIES, GROUPS, 0.35)
+    previous = index.load(str(tmp_path), 0.35)
+    entries = dict(ENTRIES, added=(False, 1, 1))
+    del entries["report1"]
+    index.save(str(tmp_path), entries, [], 0.35, previous)
+    snapshot = index.load(str(tmp_path), 0.35)
+    assert snapshot.entries == entries
+    assert snapshot.groups == []
+
+
+def test_forget(index, tmp_path):
+    index.save(str(tmp_path), ENTRIES, GROUPS, 0.35)
+    index.forget(str(tmp_path))
+    assert index.load(str(tmp_path), 0.35) is None
+
+
+def test_older_schema_is_rebuilt(index, tmp_path):
+    (tmp_path / "index").mkdir()
+    with closing(sqlite3.connect(index.path)) as connection, connection:
+        connection.execute("CREATE TABLE scans (id INTEGER PRIMARY KEY, directory TEXT)")
+        connection.execute("INSERT INTO scans (directory) VALUES ('old')")
+        connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION - 1}")
+    index.save(str(tmp_path), ENTRIES, GROUPS, 0.35)
+    assert index.load(str(tmp_path), 0.35).groups == GROUPS
+    with closing(sqlite3.connect(index.path)) as connection:
+        assert connection.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert connection.execute("SELECT COUNT(*) FROM scans").fetchone()[0] == 1
+
+
+def test_list_entries(tmp_path):
+    (tmp_path / "folder").mkdir()
+    (tmp_path / "file").write_text("abc")
+    entries = list_entries(str(tmp_path))
+    assert set(entries) == {"folder", "file"}
+    assert entries["folder"][0] is True
+    assert entries["file"][0] is False and entries["file"][2] == 3
+
+
+@pytest.mark.parametrize("linkage", [None, "single"])
+def test_scan_with_index_rescans_changed_entries(index, tmp_path, names, linkage):
+    listing = tmp_path / "listing"
+    listing.mkdir()
+    for name in names:
+        (listing / name).write_text("")
+    groups, changed = scan_with_index(index, str(listing), 0.35, linkage=linkage)
+    assert changed is None
+    assert scan_with_index(index, str(listing), 0.35, linkage=linkage) == (groups, set())
+    (listing / names[0]).unlink()
+    (listing / "report 7").write_text("")
+    groups, changed = scan_with_index(index, str(listing), 0.35, linkage=linkage)
+    assert changed == {names[0], "report 7"}
+    if linkage is not None:
+        assert groups == SimilarityGraph.build(names[1:] + ["report 7"], 0.35).groups(linkage)
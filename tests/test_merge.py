@@ -0,0 +1,189 @@
+"""Background merge jobs: the moves, the messages they post and conflicts between them"""
+import os
+import threading
+
+import pytest
+
+from count_corrector import merge
+from count_corrector.merge import MergeConflict, MergeExecutor, MergeJob, unique_destination
+
+
+def make_items(directory, *names):
+    paths = []
+    for name in names:
+        path = directory / name
+        path.write_text(name)
+        paths.append(str(path))
+    return paths
+
+
+def moves_into(folder, sources):
+    return [(source, os.path.join(folder, os.path.basename(source))) for source in sources]
+
+
+def kinds(messages):
+    return [kind for kind, _ in messages]
+
+
+def test_job_moves_items(tmp_path):
+    sources = make_items(tmp_path, "a.txt", "b.txt")
+    folder = str(tmp_path / "a_merged")
+    job = MergeJob(moves_into(folder, sources), [folder])
+    job.run()
+    messages = job.drain()
+    assert sorted(os.listdir(folder)) == ["a.txt", "b.txt"]
+    assert not any(os.path.exists(source) for source in sources)
+    assert job.moved == moves_into(folder, sources)
+    assert job.errors == []
+    assert [value for kind, value in messages if kind == "item"] == [(0, 2, "a.txt"), (1, 2, "b.txt")]
+    assert ("bytes", (10, 10)) in messages
+    assert messages[-1] == ("done", False)
+
+
+def test_taken_destination_gets_copy_suffix(tmp_path):
+    (tmp_path / "folder").mkdir()
+    make_items(tmp_path / "folder", "a.txt", "a_copy.txt")
+    assert unique_destination(str(tmp_path / "folder"), "a.txt") == str(tmp_path / "folder" / "a_copy1.txt")
+    assert unique_destination(str(tmp_path / "folder"), "b.txt") == str(tmp_path / "folder" / "b.txt")
+    (tmp_path / "source").mkdir()
+    sources = make_items(tmp_path / "source", "a.txt")
+    job = MergeJob(moves_into(str(tmp_path / "folder"), sources), [str(tmp_path / "folder")])
+    job.run()
+    assert sorted(os.listdir(tmp_path / "folder")) == ["a.txt", "a_copy.txt", "a_copy1.txt"]
+    assert (tmp_path / "folder" / "a_copy1.txt").read_text() == "a.txt"
+
+
+def test_missing_item_is_reported(tmp_path):
+    sources = make_items(tmp_path, "a.txt") + [str(tmp_path / "gone.txt")]
+    folder = str(tmp_path / "merged")
+    job = MergeJob(moves_into(folder, sources), [folder])
+    job.run()
+    assert os.listdir(folder) == ["a.txt"]
+    assert len(job.errors) == 1 and "gone.txt" in job.errors[0]
+    assert ("error", job.errors[0]) in job.drain()
+
+
+def test_new_folder_takes_a_numbered_name(tmp_path):
+    sources = make_items(tmp_path, "a.txt", "b.txt")
+    (tmp_path / "a").mkdir()
+    folder = str(tmp_path / "a")
+    job = MergeJob(moves_into(folder, sources), [folder], new_folder=True)
+    job.run()
+    assert job.drain()[0] == ("folder", folder + "_1")
+    assert os.listdir(folder) == []
+    assert sorted(os.listdir(folder + "_1")) == ["a.txt", "b.txt"]
+    assert job.moved == moves_into(folder + "_1", sources)
+
+
+def test_new_folder_without_free_name_moves_nothing(tmp_path):
+    sources = make_items(tmp_path, "a.txt")
+    (tmp_path / "a").mkdir()
+    for counter in range(1, merge.MAX_FOLDER_SUFFIX + 1):
+        (tmp_path / f"a_{counter}").mkdir()
+    folder = str(tmp_path / "a")
+    job = MergeJob(moves_into(folder, sources), [folder], new_folder=True)
+    job.run()
+    assert kinds(job.drain()) == ["error", "done"]
+    assert job.moved == []
+    assert os.path.exists(sources[0])
+
+
+def test_cancelled_job_stops_before_next_item(tmp_path):
+    sources = make_items(tmp_path, "a.txt", "b.txt", "c.txt")
+    folder = str(tmp_path / "merged")
+    job = MergeJob(moves_into(folder, sources), [folder])
+    job.cancel()
+    job.run()
+    assert job.moved == []
+    assert job.drain()[-1] == ("done", True)
+
+
+def wait_done(job):
+    messages = []
+    while not messages or messages[-1][0] != "done":
+        messages.extend(job.drain())
+        threading.Event().wait(0.01)
+    return messages
+
+
+def test_executor_refuses_overlapping_jobs(tmp_path, monkeypatch):
+    sources = make_items(tmp_path, "a.txt", "b.txt", "c.txt")
+    started, release = threading.Event(), threading.Event()
+    path_size = merge.path_size
+
+    def blocking_size(path):
+        started.set()
+        release.wait(10)
+        return path_size(path)
+
+    monkeypatch.setattr(merge, "path_size", blocking_size)
+    executor = MergeExecutor(max_workers=2)
+    try:
+        job = executor.submit(sources[:2], str(tmp_path / "merged"))
+        assert started.wait(10)
+        assert executor.conflicts([sources[1]])
+        assert not executor.conflicts([sources[2]])
+        with pytest.raises(MergeConflict):
+            executor.submit([sources[1], sources[2]], str(tmp_path / "other"))
+        with pytest.raises(MergeConflict):
+            executor.submit([sources[2]], str(tmp_path / "merged"))
+        release.set()
+        assert wait_done(job)[-1] == ("done", False)
+        # Once the job is finished its paths are free again
+        while executor.active_jobs():
+            threading.Event().wait(0.01)
+        other = executor.submit([sources[2]], str(tmp_path / "merged"))
+        wait_done(other)
+        assert sorted(os.listdir(tmp_path / "merged")) == ["a.txt", "b.txt", "c.txt"]
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_plan_resolves_names_without_touching_disk(tmp_path):
+    make_items(tmp_path, "a.txt", "a2.txt", "b.txt", "b1.txt", "c.txt")
+    (tmp_path / "sub").mkdir()
+    make_items(tmp_path / "sub", "a.txt")
+    (tmp_path / "a_merged").mkdir()
+    before = sorted(os.listdir(tmp_path))
+    groups = [[str(tmp_path / "a.txt"), str(tmp_path / "sub" / "a.txt"), str(tmp_path / "a2.txt")],
+              [str(tmp_path / "b1.txt"), str(tmp_path / "c.txt")],
+              [str(tmp_path / "b.txt"), str(tmp_path / "gone.txt")]]
+    plan = merge.plan_merges(groups)
+    # A dry run: nothing is created or moved
+    assert sorted(os.listdir(tmp_path)) == before
+    assert len(plan) == 2
+    first, second = plan.merges
+    # a_merged is taken on disk
+    assert first.folder == str(tmp_path / "a_merged_1")
+    assert second.folder == str(tmp_path / "b1_merged")
+    assert [os.path.basename(dest) for _, dest in first.moves] == ["a.txt", "a_copy.txt", "a2.txt"]
+    assert plan.missing == [str(tmp_path / "gone.txt")]
+    assert plan.folders() == [first.folder, second.folder]
+    assert plan.moves() == first.moves + second.moves
+    lines = plan.describe().splitlines()
+    assert lines[0] == first.folder + os.sep
+    assert "    a.txt  ->  a_copy.txt" in lines
+    assert lines[-1] == f"Not found, skipped: {tmp_path / 'gone.txt'}"
+
+
+def test_plan_folder_names_avoid_each_other(tmp_path):
+    make_items(tmp_path, "x.txt", "x.md", "y.txt", "y.md")
+    (tmp_path / "x").mkdir()
+    plan = merge.plan_merges([[str(tmp_path / "x.txt"), str(tmp_path / "y.txt")],
+                              [str(tmp_path / "x.md"), str(tmp_path / "y.md")],
+                              [str(tmp_path / "x"), str(tmp_path / "y.md")]])
+    assert [os.path.basename(folder) for folder in plan.folders()] == ["x_merged", "x_merged_1", "x_merged_2"]
+
+
+def test_executor_carries_out_plan(tmp_path):
+    sources = make_items(tmp_path, "a.txt", "a1.txt", "b.txt", "b1.txt")
+    plan = merge.plan_merges([sources[:2], sources[2:]])
+    executor = MergeExecutor()
+    try:
+        assert wait_done(executor.submit_plan(plan))[-1] == ("done", False)
+    finally:
+        executor.shutdown()
+    assert sorted(os.listdir(tmp_path)) == ["a_merged", "b_merged"]
+    assert sorted(os.listdir(tmp_path / "a_merged")) == ["a.txt", "a1.txt"]
+    assert sorted(os.listdir(tmp_path / "b_merged")) == ["b.txt", "b1.txt"]
@@ -0,0 +1,46 @@
+"""The process pool must find exactly what the serial scan finds"""
+import threading
+
+import pytest
+
+from count_corrector import engine, graph, parallel
+from count_corrector.engine import find_similar_groups
+from count_corrector.graph import SimilarityGraph
+from count_corrector.parallel import iter_graph_edges_parallel, iter_similar_groups_parallel
+
+
+@pytest.fixture
+def small_pool(monkeypatch):
+    """Send even the small test listing to the process pool"""
+    monkeypatch.setattr(engine, "PARALLEL_MIN_ITEMS", 1)
+    monkeypatch.setattr(graph, "PARALLEL_MIN_ITEMS", 1)
+
+
+@pytest.mark.parametrize("method", ["qgram", "exhaustive"])
+def test_pool_groups_match_serial(names, method):
+    serial = find_similar_groups(names, 0.35, method)
+    assert list(iter_similar_groups_parallel(names, 0.35, method, workers=2)) == serial
+
+
+def test_pool_graph_edges_match_serial(names, small_pool):
+    serial = SimilarityGraph.build(names, 0.35)
+    pooled = SimilarityGraph.build(names, 0.35, workers=2)
+    assert list(pooled.edges()) == list(serial.edges())
+
+
+def test_scans_use_the_pool_with_workers(names, small_pool, monkeypatch):
+    calls = []
+
+    def spy(*args, **kwargs):
+        calls.append(args)
+        return iter_similar_groups_parallel(*args, **kwargs)
+
+    monkeypatch.setattr(parallel, "iter_similar_groups_parallel", spy)
+    assert find_similar_groups(names, 0.6, workers=2) == find_similar_groups(names, 0.6)
+    assert len(calls) == 1
+
+
+def test_cancelled_pool_stops(names):
+    cancel = threading.Event()
+    cancel.set()
+    assert list(iter_graph_edges_parallel(names, 0.35, "qgram", 2, cancel)) == []
@@ -0,0 +1,91 @@
+"""Fair scheduling of the scans of several roots and the state kept per root"""
+from count_corrector.clusters import ClusterIndex
+from count_corrector.roots import MonitoredRoot, ScanScheduler
+
+
+def test_slots_are_handed_out_in_request_order():
+    scheduler = ScanScheduler(max_scans=2)
+    for key in "abcd":
+        assert scheduler.request(key)
+    assert scheduler.start() == ["a", "b"]
+    assert scheduler.start() == []
+    assert "c" in scheduler and "a" in scheduler
+    scheduler.finished("a")
+    assert scheduler.start() == ["c"]
+    scheduler.finished("b")
+    scheduler.finished("c")
+    assert scheduler.start() == ["d"]
+    assert "a" not in scheduler
+
+
+def test_root_is_queued_once():
+    scheduler = ScanScheduler(max_scans=1)
+    assert scheduler.request("a")
+    assert not scheduler.request("a")
+    assert scheduler.request("b")
+    assert list(scheduler.queue) == ["a", "b"]
+
+
+def test_urgent_requests_go_first():
+    scheduler = ScanScheduler(max_scans=1)
+    for key in "abc":
+        scheduler.request(key)
+    assert not scheduler.request("c", urgent=True)
+    assert scheduler.request("d", urgent=True)
+    assert scheduler.start() == ["d"]
+    scheduler.finished("d")
+    assert scheduler.start() == ["c"]
+
+
+def test_busy_root_does_not_take_every_slot():
+    # A root asking again while it is scanned waits behind the roots that asked before
+    scheduler = ScanScheduler(max_scans=1)
+    scheduler.request("big")
+    assert scheduler.start() == ["big"]
+    scheduler.request("small1")
+    assert scheduler.request("big")
+    scheduler.request("small2")
+    scheduler.finished("big")
+    order = []
+    while scheduler.queue:
+        started = scheduler.start()
+        order.extend(started)
+        for key in started:
+            scheduler.finished(key)
+    assert order == ["small1", "big", "small2"]
+
+
+def test_discard_frees_slot_and_queue():
+    scheduler = ScanScheduler(max_scans=1)
+    scheduler.request("a")
+    scheduler.request("b")
+    scheduler.start()
+    scheduler.discard("a")
+    scheduler.discard("b")
+    assert "a" not in scheduler and "b" not in scheduler
+    assert scheduler.start() == []
+
+
+def test_workers_share_processes():
+    assert ScanScheduler(max_scans=2, processes=8).workers() == 4
+    assert ScanScheduler(max_scans=3, processes=2).workers() == 1
+    assert ScanScheduler(max_scans=0, processes=4).max_scans == 1
+
+
+def test_monitored_root_state(names):
+    root = MonitoredRoot("/data")
+    assert root.summary() == "waiting"
+    assert root.similarity_graph() is None
+    root.clusters = ClusterIndex(0.35, names=names)
+    graph = root.similarity_graph()
+    assert graph.groups("single") == root.clusters.graph().groups("single")
+    # The graph is made once and kept
+    assert root.similarity_graph() is graph
+    root.groups = [["a", "b"]]
+    root.scanned = True
+    assert root.summary() == "1 groups"
+    root.worker = object()
+    assert root.summary() == "scanning"
+    root.pending_changes = {"a"}
+    root.reset()
+    assert root.clusters is None and root.graph is None and root.pending_changes is None
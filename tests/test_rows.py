@@ -0,0 +1,74 @@
+"""Patching the results view: the differences between the shown rows and new groups"""
+import os
+import random
+
+from count_corrector.rows import diff_results, group_row_id, item_row_id
+
+DIRECTORY = os.path.join("root", "folder")
+
+
+def rows_of(groups):
+    """group row -> item rows of groups, as the results view shows them"""
+    return diff_results({}, groups, DIRECTORY).children
+
+
+def patched(old_children, diff):
+    """The rows after applying only what diff lists, like the results view does"""
+    rows = {group_row: list(items) for group_row, items in old_children.items()
+            if group_row not in diff.removed}
+    stale = set(diff.stale_rows)
+    for group_row, items in rows.items():
+        rows[group_row] = [item for item in items if item not in stale]
+    for group_row in diff.changed:
+        rows[group_row] = list(diff.children[group_row])
+    if not diff.reorder_all:
+        # Only the changed groups are placed, the others must already be in order
+        kept = [group_row for group_row in rows if group_row not in diff.changed]
+        assert kept == [group_row for group_row in diff.children if group_row in kept]
+    return {group_row: rows[group_row] for group_row in diff.children}
+
+
+def test_row_ids_are_stable_paths():
+    diff = diff_results({}, [["a", "a1"], ["single"]], DIRECTORY)
+    group_row = group_row_id(os.path.join(DIRECTORY, "a"))
+    assert diff.children == {group_row: [item_row_id(os.path.join(DIRECTORY, "a")),
+                                         item_row_id(os.path.join(DIRECTORY, "a1"))]}
+    assert diff.first_items == {group_row: "a"}
+    assert diff.changed == [group_row]
+
+
+def test_unchanged_groups_are_not_touched():
+    groups = [["a", "a1"], ["b", "b2", "b3"]]
+    diff = diff_results(rows_of(groups), groups, DIRECTORY)
+    assert (diff.stale_rows, diff.changed, diff.removed, diff.reorder_all) == ([], [], [], False)
+
+
+def test_only_changed_groups_are_listed():
+    old = [["a", "a1"], ["b", "b2", "b3"], ["c", "c1"]]
+    new = [["a", "a1"], ["b", "b2"], ["d", "d1"]]
+    diff = diff_results(rows_of(old), new, DIRECTORY)
+    b, c, d = (group_row_id(os.path.join(DIRECTORY, name)) for name in "bcd")
+    assert diff.changed == [b, d]
+    assert diff.removed == [c]
+    assert sorted(diff.stale_rows) == sorted(item_row_id(os.path.join(DIRECTORY, name))
+                                             for name in ["b3", "c", "c1"])
+    assert not diff.reorder_all
+
+
+def test_moved_groups_reorder_everything():
+    old = [["a", "a1"], ["b", "b1"]]
+    diff = diff_results(rows_of(old), list(reversed(old)), DIRECTORY)
+    assert diff.changed == [] and diff.reorder_all
+
+
+def test_patching_gives_the_new_rows():
+    rng = random.Random(7)
+    pool = [f"name{i}" for i in range(40)]
+    groups = []
+    for _ in range(30):
+        names = rng.sample(pool, rng.randint(0, 30))
+        new = [names[i:i + size] for i, size in zip(range(0, len(names), 3), [2, 3, 1] * 10)]
+        old_children = rows_of(groups)
+        diff = diff_results(old_children, new, DIRECTORY)
+        assert patched(old_children, diff) == rows_of(new)
+        groups = new
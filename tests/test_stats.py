@@ -0,0 +1,124 @@
+"""Scan statistics: phase timers, pair counters and what the scorer records in them"""
+import json
+
+import pytest
+
+from count_corrector import stats as stats_module
+from count_corrector.cache import ScoreCache
+from count_corrector.engine import BOUND_PATHS, SIMILARITY_PATHS, find_similar_groups, make_scorer
+from count_corrector.stats import CACHED, GROUPING, PHASES, SCORING, PhaseClock, ScanStats, timed
+
+
+class FakeClock:
+    """Stands in for the time module: perf_counter only moves when told to"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def perf_counter(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(stats_module, "time", fake)
+    return fake
+
+
+def test_phases_add_up(clock):
+    stats = ScanStats()
+    with stats.phase(SCORING):
+        clock.now += 2.0
+    with pytest.raises(RuntimeError):
+        with stats.phase(SCORING):
+            clock.now += 1.0
+            raise RuntimeError
+    assert stats.phases[SCORING] == 3.0
+    assert set(stats.phases) == set(PHASES)
+
+
+def test_phase_clock_leaves_out_nested_phases(clock):
+    stats = ScanStats()
+    grouping = PhaseClock(stats, GROUPING, nested=(SCORING,))
+    clock.now += 1.0
+    with stats.phase(SCORING):
+        clock.now += 4.0
+    grouping.stop()
+    # Time between stop and start (e.g. while a generator is suspended) is not counted
+    clock.now += 10.0
+    grouping.start()
+    clock.now += 0.5
+    grouping.stop()
+    assert stats.phases[GROUPING] == 1.5
+    assert stats.phases[SCORING] == 4.0
+
+
+def test_timed_without_stats_does_nothing():
+    with timed(None, SCORING):
+        pass
+    stats = ScanStats()
+    with timed(stats, SCORING):
+        pass
+    assert stats.phases[SCORING] >= 0.0
+
+
+def test_counters_and_dict(tmp_path):
+    stats = ScanStats("label")
+    stats.count_pair("ratio", rejected=False)
+    stats.count_pair("ratio", rejected=True)
+    stats.count_pair(CACHED, rejected=True)
+    stats.count("names", 5)
+    stats.count("names")
+    assert stats.pairs_considered() == 3
+    assert stats.pairs_rejected() == 2
+    data = stats.to_dict()
+    assert data["label"] == "label"
+    assert data["pairs"] == {"considered": 3, "rejected": 2,
+                             "paths": {CACHED: {"considered": 1, "rejected": 1},
+                                       "ratio": {"considered": 2, "rejected": 1}}}
+    assert data["counters"] == {"names": 6}
+    stats.dump(tmp_path / "stats.json")
+    assert json.loads((tmp_path / "stats.json").read_text()) == data
+    summary = stats.summary()
+    assert summary[0] == "label"
+    assert "Pairs scored: 3, rejected: 2" in summary
+    assert "names: 6" in summary
+
+
+@pytest.mark.parametrize("threshold", [0.35, 0.8])
+def test_scorer_counts_every_pair(names, scores, threshold):
+    stats = ScanStats()
+    score = make_scorer(threshold, stats=stats)
+    pairs = [(i, j) for i in range(len(names)) for j in range(i + 1, len(names))]
+    below = sum(scores[pair] < threshold for pair in pairs)
+    for i, j in pairs:
+        score(names[i], names[j])
+    assert stats.pairs_considered() == len(pairs)
+    assert stats.pairs_rejected() == below
+    assert set(stats.pairs) <= set(SIMILARITY_PATHS + BOUND_PATHS)
+    # Pairs decided by a bound are always rejected
+    assert all(considered == rejected for path, (considered, rejected) in stats.pairs.items()
+               if path in BOUND_PATHS)
+    # Once the cache is filled every pair is answered from it
+    cache = ScoreCache()
+    score = make_scorer(threshold, cache)
+    for i, j in pairs:
+        score(names[i], names[j])
+    again = ScanStats()
+    score = make_scorer(threshold, cache, again)
+    for i, j in pairs:
+        score(names[i], names[j])
+    assert again.pairs == {CACHED: [len(pairs), below]}
+
+
+def test_scan_records_phases(names):
+    stats = ScanStats()
+    expected = find_similar_groups(names, 0.6)
+    assert find_similar_groups(names, 0.6, stats=stats) == expected
+    assert stats.pairs_considered() > 0
+    assert stats.phases[SCORING] > 0.0
+    assert stats.phases[GROUPING] > 0.0
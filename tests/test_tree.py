@@ -0,0 +1,72 @@
+"""Recursive scans: walking the tree and grouping each directory on its own"""
+import os
+
+import pytest
+
+from count_corrector.engine import iter_directories, iter_tree_groups
+from count_corrector.graph import SimilarityGraph
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """
+    root: report, report1, photos/
+    root/photos: holiday, holiday2, raw/
+    root/photos/raw: report, report1 (same names as root, not grouped with it)
+    """
+    (tmp_path / "photos" / "raw").mkdir(parents=True)
+    for relative in ["report", "report1", "photos/holiday", "photos/holiday2",
+                     "photos/raw/report", "photos/raw/report1"]:
+        (tmp_path / relative).write_text("")
+    return tmp_path
+
+
+def test_every_directory_is_listed_once(tree):
+    listed = dict(iter_directories(str(tree)))
+    raw = os.path.join("photos", "raw")
+    assert set(listed) == {"", "photos", raw}
+    assert sorted(listed[""]) == ["photos", "report", "report1"]
+    assert sorted(listed["photos"]) == ["holiday", "holiday2", "raw"]
+    assert sorted(listed[raw]) == ["report", "report1"]
+
+
+def test_unreadable_root_raises(tmp_path):
+    with pytest.raises(OSError):
+        list(iter_directories(str(tmp_path / "missing")))
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="needs symlinks")
+def test_symlinked_folders_are_not_followed(tree):
+    try:
+        os.symlink(tree / "photos", tree / "link", target_is_directory=True)
+    except OSError:
+        pytest.skip("symlinks not permitted")
+    listed = dict(iter_directories(str(tree)))
+    assert "link" in listed[""]
+    assert not any(relative.startswith("link") for relative in listed)
+
+
+@pytest.mark.parametrize("linkage", [None, "single"])
+def test_tree_groups_stay_within_their_directory(tree, linkage):
+    groups = sorted(sorted(group) for group in iter_tree_groups(str(tree), linkage=linkage))
+    raw = os.path.join("photos", "raw")
+    assert groups == [[os.path.join("photos", "holiday"), os.path.join("photos", "holiday2")],
+                      [os.path.join(raw, "report"), os.path.join(raw, "report1")],
+                      ["report", "report1"]]
+
+
+def test_tree_groups_match_each_directory(tmp_path, names):
+    half = len(names) // 2
+    (tmp_path / "sub").mkdir()
+    for name in names[:half]:
+        (tmp_path / name).write_text("")
+    for name in names[half:]:
+        (tmp_path / "sub" / name).write_text("")
+    progress = []
+    groups = list(iter_tree_groups(str(tmp_path), 0.35, linkage="single",
+                                   progress=lambda done, total: progress.append((done, total))))
+    expected = SimilarityGraph.build(names[:half] + ["sub"], 0.35).groups("single")
+    expected += [[os.path.join("sub", name) for name in group]
+                 for group in SimilarityGraph.build(names[half:], 0.35).groups("single")]
+    assert sorted(groups) == sorted(expected)
+    assert progress == [(1, None), (2, None)]
@@ -0,0 +1,92 @@
+"""Messages of background scans: order, cancellation, errors and incremental updates"""
+import pytest
+
+from count_corrector.engine import find_similar_groups, list_items
+from count_corrector.graph import SimilarityGraph
+from count_corrector.index import ScanIndex
+from count_corrector.stats import ScanStats
+from count_corrector.worker import ScanWorker
+
+TIMEOUT = 60
+
+
+def make_listing(directory, names):
+    for name in names:
+        (directory / name).write_text("")
+    return directory
+
+
+def run(worker):
+    """Run a worker to the end and return all its messages"""
+    worker.start()
+    worker.thread.join(TIMEOUT)
+    assert not worker.is_alive()
+    return worker.drain()
+
+
+def posted_groups(messages):
+    return [group for kind, value in messages if kind == "groups" for group in value]
+
+
+@pytest.fixture
+def listing(tmp_path, names):
+    return make_listing(tmp_path, names)
+
+
+def test_message_order(listing, names):
+    messages = run(ScanWorker(str(listing)))
+    kinds = [kind for kind, _ in messages]
+    assert kinds[0] == "listed" and messages[0][1] == len(names)
+    assert kinds[-1] == "done" and messages[-1][1] is False
+    assert set(kinds[1:-1]) <= {"progress", "groups"}
+    # Greedy groups follow the order the directory is listed in
+    assert posted_groups(messages) == find_similar_groups(list_items(str(listing)))
+
+
+@pytest.mark.parametrize("linkage", ["single", "complete"])
+def test_linkage_scan_keeps_graph_and_clusters(listing, names, linkage):
+    worker = ScanWorker(str(listing), 0.6, linkage=linkage, floor=0.35)
+    messages = run(worker)
+    expected = SimilarityGraph.build(names, 0.35).groups(linkage, 0.6)
+    assert sorted(posted_groups(messages)) == sorted(expected)
+    assert worker.graph.threshold == 0.35
+    assert worker.clusters.groups(linkage, 0.6) == expected
+
+
+def test_cancelled_scan_ends_with_done(listing):
+    worker = ScanWorker(str(listing), linkage="single")
+    worker.cancel()
+    messages = run(worker)
+    assert messages[-1] == ("done", True)
+    assert worker.graph is None
+
+
+def test_missing_directory_ends_with_error(tmp_path):
+    messages = run(ScanWorker(str(tmp_path / "missing")))
+    assert [kind for kind, _ in messages] == ["error"]
+
+
+def test_update_applies_changed_names(listing, names):
+    worker = ScanWorker(str(listing), 0.35, linkage="single", floor=0.3)
+    run(worker)
+    (listing / names[0]).unlink()
+    make_listing(listing, ["report 7", "holiday copy"])
+    changed = {names[0], "report 7", "holiday copy"}
+    update = ScanWorker(str(listing), 0.35, linkage="single", clusters=worker.clusters, changed=changed)
+    messages = run(update)
+    current = [path.name for path in listing.iterdir()]
+    assert messages[-1] == ("done", False)
+    assert posted_groups(messages) == SimilarityGraph.build(current, 0.3).groups("single", 0.35)
+
+
+def test_index_scan_rescores_changed_entries(listing, names, tmp_path_factory):
+    index = ScanIndex(str(tmp_path_factory.mktemp("index") / "scans.sqlite"))
+    run(ScanWorker(str(listing), 0.35, index=index, linkage="single", floor=0.3))
+    (listing / "report 7").write_text("")
+    stats = ScanStats()
+    worker = ScanWorker(str(listing), 0.35, index=index, stats=stats, linkage="single", floor=0.3)
+    messages = run(worker)
+    assert messages[0] == ("listed", len(names) + 1)
+    assert stats.counters["changed_entries"] == 1
+    assert posted_groups(messages) == SimilarityGraph.build(names + ["report 7"], 0.3).groups("single", 0.35)
+    assert worker.graph.threshold == 0.3